@@ -0,0 +1,73 @@
+"""
+Every square each side attacks, worked out once per position and shared by everything that needs it.
+
+An AttackMap holds, for both colours (index 0 white, 1 black):
+    by_piece       - squares attacked by each piece type, 12 bitboards in PIECES order (squares attacked by more than one
+                     piece of a type are set once)
+    attacked       - squares attacked by any piece of the side
+    attacked_twice - squares attacked by two or more pieces of the side
+and the piece bitboards as ints, so its users don't convert them again.
+
+Sliders stop at the first piece in each direction, kings included. Board.GetAttackMap builds the map of the current
+position on first use and keeps it until the position changes. GenerateMoves uses it for check detection and the
+squares the king can go to, staticExchange to skip exchanges on squares nobody defends, and evaluation for mobility and
+attacks next to the kings.
+"""
+from attackTables import KNIGHT_ATTACKS, KING_ATTACKS
+from bitOperations import Squares
+from magicBitboards import BishopAttacks, RookAttacks
+
+NOT_A_FILE = 0x7F7F7F7F7F7F7F7F
+NOT_H_FILE = 0xFEFEFEFEFEFEFEFE
+
+
+class AttackMap:
+    __slots__ = ('bitboards', 'pieces', 'occupied', 'by_piece', 'attacked', 'attacked_twice')
+
+    def __init__(self, bitboards):
+        """
+        bitboards is the twelve piece bitboards in PIECES order, as python ints
+        """
+        self.bitboards = bitboards
+        self.pieces = [bitboards[0] | bitboards[1] | bitboards[2] | bitboards[3] | bitboards[4] | bitboards[5],
+                       bitboards[6] | bitboards[7] | bitboards[8] | bitboards[9] | bitboards[10] | bitboards[11]]
+        self.occupied = occupied = self.pieces[0] | self.pieces[1]
+
+        self.by_piece = by_piece = [0] * 12
+        self.attacked = [0, 0]
+        self.attacked_twice = [0, 0]
+
+        for side, offset in ((0, 0), (1, 6)):
+            pawns, knights, bishops, rooks, queens, king = bitboards[offset:offset + 6]
+
+            if side == 0:
+                left, right = (pawns << 9) & NOT_H_FILE, (pawns << 7) & NOT_A_FILE
+            else:
+                left, right = (pawns >> 7) & NOT_H_FILE, (pawns >> 9) & NOT_A_FILE
+
+            attacked = by_piece[offset] = left | right
+            twice = left & right
+
+            for index, squares in ((1, knights), (2, bishops), (3, rooks), (4, queens), (5, king)):
+                piece_attacks = 0
+
+                for sq in Squares(squares):
+                    if index == 1:
+                        attacks = KNIGHT_ATTACKS[sq]
+                    elif index == 2:
+                        attacks = BishopAttacks(sq, occupied)
+                    elif index == 3:
+                        attacks = RookAttacks(sq, occupied)
+                    elif index == 4:
+                        attacks = BishopAttacks(sq, occupied) | RookAttacks(sq, occupied)
+                    else:
+                        attacks = KING_ATTACKS[sq]
+
+                    twice |= attacked & attacks
+                    attacked |= attacks
+                    piece_attacks |= attacks
+
+                by_piece[offset + index] = piece_attacks
+
+            self.attacked[side] = attacked
+            self.attacked_twice[side] = twice
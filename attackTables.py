@@ -0,0 +1,93 @@
+"""
+Knight, king, pawn attack and ray lookup tables, built once per process when this module is first imported and shared
+by every Board and GenerateMoves. They are loaded from the table cache (see tableCache) when a valid one exists.
+
+Squares are numbered as on Board: square 0 is a8 and is the most significant bit, square 63 is h1 and is bit 0.
+All tables hold python ints.
+"""
+from tableCache import CacheKey, LoadTable
+
+# (file step, rank step), rank step is +1 towards rank 1, same as square numbers
+KNIGHT_STEPS = ((1, -2), (2, -1), (-1, -2), (-2, -1), (1, 2), (2, 1), (-1, 2), (-2, 1))
+KING_STEPS = ((0, -1), (1, 0), (-1, 0), (0, 1), (1, -1), (-1, -1), (1, 1), (-1, 1))
+PAWN_STEPS = {'w' : ((1, -1), (-1, -1)), 'b' : ((1, 1), (-1, 1))}
+
+RAY_DIRECTIONS = {'N' : (0, -1), 'E' : (1, 0), 'W' : (-1, 0), 'S' : (0, 1),
+                  'NE' : (1, -1), 'NW' : (-1, -1), 'SE' : (1, 1), 'SW' : (-1, 1)}
+
+
+def SquareBB(square):
+    return 1 << (63 - square)
+
+
+def StepAttacks(square, steps):
+    # squares one step away in each direction, for pieces that don't slide
+    attacks = 0
+    file, rank = square % 8, square // 8
+
+    for file_step, rank_step in steps:
+        f, r = file + file_step, rank + rank_step
+
+        if 0 <= f < 8 and 0 <= r < 8:
+            attacks |= SquareBB(8 * r + f)
+
+    return attacks
+
+
+def Ray(square, direction):
+    # every square from square (not included) to the edge of the board in direction
+    ray = 0
+    file_step, rank_step = RAY_DIRECTIONS[direction]
+    f, r = square % 8 + file_step, square // 8 + rank_step
+
+    while 0 <= f < 8 and 0 <= r < 8:
+        ray |= SquareBB(8 * r + f)
+        f, r = f + file_step, r + rank_step
+
+    return ray
+
+
+def BuildTables():
+    # flat list: knight attacks, king attacks, the rays for each direction in RAY_DIRECTIONS order, then white and black
+    # pawn attacks
+    values = [StepAttacks(sq, KNIGHT_STEPS) for sq in range(64)]
+    values += [StepAttacks(sq, KING_STEPS) for sq in range(64)]
+
+    for direction in RAY_DIRECTIONS:
+        values += [Ray(sq, direction) for sq in range(64)]
+
+    for colour in 'wb':
+        values += [StepAttacks(sq, PAWN_STEPS[colour]) for sq in range(64)]
+
+    return values
+
+
+_values = LoadTable('attacks', CacheKey('attacks', KNIGHT_STEPS, KING_STEPS, RAY_DIRECTIONS, PAWN_STEPS), BuildTables)
+
+KNIGHT_ATTACKS = _values[0:64]
+KING_ATTACKS = _values[64:128]
+RAYS = {direction : _values[128 + 64 * i:192 + 64 * i] for i, direction in enumerate(RAY_DIRECTIONS)}
+
+# squares a pawn of each colour on a square attacks
+PAWN_ATTACKS = {'w' : _values[640:704], 'b' : _values[704:768]}
+
+del _values
+
+# squares a bishop or rook on a square attacks on an empty board
+BISHOP_RAYS = [RAYS['NE'][sq] | RAYS['NW'][sq] | RAYS['SE'][sq] | RAYS['SW'][sq] for sq in range(64)]
+ROOK_RAYS = [RAYS['N'][sq] | RAYS['E'][sq] | RAYS['W'][sq] | RAYS['S'][sq] for sq in range(64)]
+
+# BETWEEN[a][b] is the squares strictly between a and b when they share a rank, file or diagonal, otherwise 0
+BETWEEN = [[0] * 64 for _ in range(64)]
+
+for _ray in RAYS.values():
+    for _sq in range(64):
+        _targets = _ray[_sq]
+
+        while _targets:
+            # the ray from _sq less the part of it from _target onwards
+            _target = 64 - _targets.bit_length()
+            BETWEEN[_sq][_target] = _ray[_sq] & ~_ray[_target] & ~SquareBB(_target)
+            _targets ^= SquareBB(_target)
+
+del _ray, _sq, _targets, _target
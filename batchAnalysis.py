@@ -0,0 +1,222 @@
+"""
+Analyse files of FENs (one per line, like fens.txt) with a search per position, writing one JSON object per line:
+
+    {"line": 1, "fen": "...", "legal_moves": 20, "best_move": "g1f3", "score": 36, "mate": null, "depth": 3,
+     "pv": ["g1f3", "g8f6", "d2d4"], "nodes": 881, "time_ms": 90}
+
+    python batchAnalysis.py fens.txt --depth 3 --jobs 0 -o results.jsonl
+
+Input is read lazily and handed out to a pool of worker processes in chunks of lines. Each worker keeps one Board,
+GenerateMoves, TranspositionTable and Search and sets the board up for each FEN in turn. Only a few chunks per worker are
+ever in flight (and waiting to be written, when results are kept in input order), so memory stays the same whatever the
+size of the input. Lines that aren't valid positions get an "error" instead of a result.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+from classicalBitboard import Board
+from moveEncoding import MoveToUci
+from moveGeneration import GenerateMoves
+from search import Search
+from transpositionTable import TranspositionTable
+
+CHUNK_SIZE = 32 # positions sent to a worker at a time
+CHUNKS_PER_WORKER = 2 # chunks in flight for each worker, so a worker never waits for its next chunk
+
+PROGRESS_EVERY = 1000 # positions between progress reports
+
+
+class Analyser:
+    """
+    One per worker process, reused for every position the worker is given
+    """
+    def __init__(self, backend, hash_mb, depth, nodes, movetime, keep_hash=False):
+        self.board = Board(backend)
+        self.moveGen = GenerateMoves(self.board)
+        self.tt = TranspositionTable(hash_mb)
+        self.search = Search(self.board, self.tt, self.moveGen)
+
+        self.limits = (depth, nodes, movetime)
+
+        # by default the tables are cleared for every position, so its result doesn't depend on which positions the
+        # worker happened to analyse before it
+        self.keep_hash = keep_hash
+
+    def Analyse(self, line_number, fen):
+        try:
+            self.board.LoadFen(fen)
+        except (ValueError, KeyError, IndexError) as error:
+            return {'line' : line_number, 'fen' : fen, 'error' : f'invalid FEN: {error}'}
+
+        kings = [piece for piece, _ in self.board.pieces if piece in 'Kk']
+
+        if sorted(kings) != ['K', 'k']:
+            return {'line' : line_number, 'fen' : fen, 'error' : 'invalid FEN: each side needs one king'}
+
+        if not self.keep_hash:
+            self.tt.Clear()
+            self.search.orderer.Clear()
+
+        self.moveGen.board = self.board
+        legal_moves = len(self.moveGen.GenerateAllPossibleMoves())
+
+        result = self.search.Think(*self.limits)
+
+        return {'line' : line_number, 'fen' : fen, 'legal_moves' : legal_moves,
+                'best_move' : MoveToUci(result.best_move) if result.best_move else None,
+                'score' : result.score, 'mate' : result.MateIn(), 'depth' : result.depth,
+                'pv' : [MoveToUci(move) for move in result.pv], 'nodes' : result.nodes,
+                'time_ms' : int(result.seconds * 1000)}
+
+
+# the worker process's Analyser
+_analyser = None
+
+
+def InitWorker(*args):
+    global _analyser
+    _analyser = Analyser(*args)
+
+
+def AnalyseChunk(chunk):
+    return [_analyser.Analyse(line_number, fen) for line_number, fen in chunk]
+
+
+def ReadPositions(lines):
+    """
+    (line number, FEN) for each position in lines, skipping blank lines and '#' comments. Anything after a ';' (EPD
+    operations, as in perft_counts.txt) is dropped
+    """
+    for line_number, line in enumerate(lines, 1):
+        fen = line.split(';')[0].strip()
+
+        if fen and not fen.startswith('#'):
+            yield line_number, fen
+
+
+def Chunks(iterable, size):
+    iterator = iter(iterable)
+
+    while True:
+        chunk = list(islice(iterator, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def AnalysePositions(positions, worker_args, jobs=1, chunk_size=CHUNK_SIZE, ordered=True):
+    """
+    Yields the result of each (line number, FEN) in positions, in the same order if ordered is set, otherwise as soon
+    as they are ready. worker_args are the Analyser arguments. jobs is the number of worker processes, None for one per
+    core, 1 to analyse in this process
+    """
+    chunks = Chunks(positions, chunk_size)
+
+    if jobs == 1:
+        InitWorker(*worker_args)
+
+        for chunk in chunks:
+            yield from AnalyseChunk(chunk)
+
+        return
+
+    jobs = jobs or os.cpu_count()
+    max_chunks = CHUNKS_PER_WORKER * jobs
+
+    with ProcessPoolExecutor(jobs, initializer=InitWorker, initargs=worker_args) as executor:
+        pending = {} # future : chunk index
+        finished = {} # chunk index : results, waiting for the chunks before them
+        next_chunk = 0 # next chunk to submit
+        next_to_write = 0
+        exhausted = False
+
+        while True:
+            # chunks waiting to be written count too, or one slow chunk would let the finished ones pile up
+            while not exhausted and len(pending) + len(finished) < max_chunks:
+                chunk = next(chunks, None)
+
+                if chunk is None:
+                    exhausted = True
+                else:
+                    pending[executor.submit(AnalyseChunk, chunk)] = next_chunk
+                    next_chunk += 1
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = pending.pop(future)
+
+                if ordered:
+                    finished[index] = future.result()
+                else:
+                    yield from future.result()
+
+            while next_to_write in finished:
+                yield from finished.pop(next_to_write)
+                next_to_write += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search every position in a file of FENs, writing JSON lines')
+    parser.add_argument('input', nargs='?', default='-', help='file with one FEN per line, - for stdin (default)')
+    parser.add_argument('-o', '--output', default='-', help='file to write results to, - for stdout (default)')
+    parser.add_argument('-d', '--depth', type=int, help='maximum depth in plies')
+    parser.add_argument('-n', '--nodes', type=int, help='maximum number of nodes per position')
+    parser.add_argument('-t', '--movetime', type=int, help='maximum time per position in milliseconds')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes, 0 for one per core')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='positions sent to a worker at a time')
+    parser.add_argument('--unordered', action='store_true', help='write results as they finish, not in input order')
+    parser.add_argument('--hash', type=int, default=4, help='transposition table size per worker in MB')
+    parser.add_argument('--keep-hash', action='store_true', help='keep the transposition table and move ordering '
+                        'between positions, quicker for shallow searches but results depend on the order of the input')
+    parser.add_argument('--backend', choices=['int', 'numpy'], default='int', help='bitboard backend used by Board')
+    args = parser.parse_args(argv)
+
+    if args.depth is None and args.nodes is None and args.movetime is None:
+        args.depth = 3
+
+    input_file = sys.stdin if args.input == '-' else open(args.input)
+    output_file = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    worker_args = (args.backend, args.hash, args.depth, args.nodes, args.movetime, args.keep_hash)
+
+    start = time.perf_counter()
+    analysed = 0
+    errors = 0
+
+    try:
+        for result in AnalysePositions(ReadPositions(input_file), worker_args, args.jobs or None, args.chunk_size,
+                                       not args.unordered):
+            output_file.write(json.dumps(result) + '\n')
+            analysed += 1
+            errors += 'error' in result
+
+            if analysed % PROGRESS_EVERY == 0:
+                output_file.flush()
+                seconds = time.perf_counter() - start
+                print(f'analysed {analysed} positions  {analysed / seconds:.1f}/s', file=sys.stderr)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    seconds = time.perf_counter() - start
+    print(f'analysed {analysed} positions  errors {errors}  time {seconds:.3f}s  {analysed / seconds:.1f}/s',
+          file=sys.stderr)
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
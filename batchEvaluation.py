@@ -0,0 +1,345 @@
+"""
+Evaluation of many positions at once with numpy, for scoring large sets of positions offline.
+
+Positions are given as an (N, 12) uint64 array holding the piece bitboards in the order Board.GetAllBitboards returns
+them (BATCH_PIECES, leaving out all_whites, all_blacks and empty). Squares are numbered as on Board: square 0 is a8 and
+is the most significant bit.
+
+The score has the same terms as evaluation.Evaluate:
+    material and piece-square scores, tapered by the game phase
+    mobility - squares attacked by each side's knights, bishops, rooks and queens that aren't its own pieces, a proxy
+               for how many moves they have (squares attacked by more than one piece of a type only count once)
+    king zone - squares next to each king that the other side attacks
+    pawn structure - doubled, isolated, backward and passed pawns and king shields
+
+Every term is worked out for the whole batch at a time. Material and piece-square scores are looked up a rank at a time
+in tables of the summed scores of every pattern of bits on a rank (built once with matrix products), attacks and pawn
+structure are worked out with shifts on the uint64 arrays, and bits are counted a byte at a time.
+"""
+import numpy as np
+
+from evaluation import (MG_SCORES, EG_SCORES, PIECE_PHASES, MAX_PHASE, MOBILITY_WEIGHTS, KING_ZONE_ATTACK, DOUBLED_PAWN,
+                        ISOLATED_PAWN, BACKWARD_PAWN, PASSED_PAWN_MG, PASSED_PAWN_EG, SHIELD_PAWN, SHIELD_RANKS,
+                        WING_OF_FILE)
+
+# Board.GetAllBitboards order
+BATCH_PIECES = 'PNBRKQrnbkqp'
+
+CHUNK_SIZE = 16384 # positions evaluated at a time, bounds the memory used by temporary arrays
+
+# passed pawn bonus by byte of the bitboard, most significant (rank 8) first, so white's count up and black's down
+WHITE_PASSED = np.array([PASSED_PAWN_MG[::-1], PASSED_PAWN_EG[::-1]], dtype=np.int32).T
+BLACK_PASSED = np.array([PASSED_PAWN_MG, PASSED_PAWN_EG], dtype=np.int32).T
+
+FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+NOT_A_FILE = np.uint64(0x7F7F7F7F7F7F7F7F)
+NOT_H_FILE = np.uint64(0xFEFEFEFEFEFEFEFE)
+NOT_AB_FILE = np.uint64(0x3F3F3F3F3F3F3F3F)
+NOT_GH_FILE = np.uint64(0xFCFCFCFCFCFCFCFC)
+
+# (shift, mask of squares a shifted bit can land on without wrapping round the board). A positive shift is towards
+# the most significant bit, which is towards rank 8 (or one file left)
+SLIDER_SHIFTS = {
+    'B' : ((7, NOT_A_FILE), (9, NOT_H_FILE), (-7, NOT_H_FILE), (-9, NOT_A_FILE)),
+    'R' : ((8, FULL), (-8, FULL), (-1, NOT_A_FILE), (1, NOT_H_FILE)),
+}
+
+KNIGHT_SHIFTS = ((15, NOT_A_FILE), (17, NOT_H_FILE), (-17, NOT_A_FILE), (-15, NOT_H_FILE),
+                 (6, NOT_AB_FILE), (10, NOT_GH_FILE), (-10, NOT_AB_FILE), (-6, NOT_GH_FILE))
+
+KING_SHIFTS = SLIDER_SHIFTS['B'] + SLIDER_SHIFTS['R']
+
+# pawn captures by colour, white pawns move towards the most significant bit
+PAWN_SHIFTS = {'w' : ((9, NOT_H_FILE), (7, NOT_A_FILE)), 'b' : ((-7, NOT_H_FILE), (-9, NOT_A_FILE))}
+
+RANK_1 = np.uint64(0xFF)
+
+BYTE_POPCOUNTS = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.int32)
+
+# wing (as in evaluation.WING_OF_FILE, -1 for none) of the file of a single bit rank byte, the a file is the top bit
+BYTE_WINGS = np.full(256, -1, dtype=np.int32)
+
+for file, wing in enumerate(WING_OF_FILE):
+    if wing is not None:
+        BYTE_WINGS[0x80 >> file] = wing
+
+# shield squares of evaluation.SHIELD_RANKS, by side and wing (second rank, third rank)
+SHIELD_MASKS = [[(np.uint64(ranks[2 * wing]), np.uint64(ranks[2 * wing + 1])) for wing in range(2)]
+                for ranks in SHIELD_RANKS]
+BACK_RANKS = (np.uint64(0xFFFF), np.uint64(0xFFFF << 48))
+
+
+# middlegame score, endgame score and phase packed into one int64 in fields of PACK_BITS bits, so a single lookup and
+# sum adds up all three. Each field is signed and far smaller than 2 ** (PACK_BITS - 1) for any position
+PACK_BITS = 20
+PACK_MASK = (1 << PACK_BITS) - 1
+PACK_HALF = 1 << (PACK_BITS - 1)
+
+
+def Pack(mg, eg, phase):
+    return mg + (eg << PACK_BITS) + (phase << (2 * PACK_BITS))
+
+
+def Unpack(packed):
+    mg = ((packed + PACK_HALF) & PACK_MASK) - PACK_HALF
+    packed = (packed - mg) >> PACK_BITS
+    eg = ((packed + PACK_HALF) & PACK_MASK) - PACK_HALF
+
+    return mg, eg, (packed - eg) >> PACK_BITS
+
+
+def BuildRankTable():
+    """
+    Packed scores indexed by 256 * (8 * piece + rank) + byte, where piece is the index in BATCH_PIECES, rank counts
+    from rank 8 and byte is the bits of that rank of the piece's bitboard (the a file is the most significant). Each
+    entry is the sum over the pieces on the set bits, from white's point of view. Built as (byte, file) bit matrix
+    times the per square scores
+    """
+    # byte_bits[byte][file] is 1 when that file's bit is set in byte
+    byte_bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.int64)
+
+    tables = []
+
+    for scores in (MG_SCORES, EG_SCORES, {piece : [PIECE_PHASES[piece]] * 64 for piece in BATCH_PIECES}):
+        square_scores = np.array([scores[piece] for piece in BATCH_PIECES], dtype=np.int64).reshape(12, 8, 8)
+        tables.append(np.einsum('bf,prf->prb', byte_bits, square_scores).reshape(-1))
+
+    return Pack(*tables)
+
+
+RANK_TABLE = BuildRankTable()
+RANK_OFFSETS = 256 * np.arange(96, dtype=np.intp)
+
+
+def Shift(bbs, shift):
+    if shift > 0:
+        return bbs << np.uint64(shift)
+
+    return bbs >> np.uint64(-shift)
+
+
+def PopCounts(bbs):
+    # number of set bits in each bitboard of a uint64 array
+    return BYTE_POPCOUNTS[bbs.view(np.uint8)].reshape(bbs.shape + (8,)).sum(axis=-1, dtype=np.int32)
+
+
+def StepAttacks(pieces, shifts):
+    # squares attacked by pieces that don't slide, one shift for each direction
+    attacks = np.zeros_like(pieces)
+
+    for shift, mask in shifts:
+        attacks |= Shift(pieces, shift) & mask
+
+    return attacks
+
+
+def KnightAttacks(knights):
+    return StepAttacks(knights, KNIGHT_SHIFTS)
+
+
+def SlidingAttacks(sliders, empty, shifts):
+    """
+    Squares attacked by any of sliders moving along the directions in shifts, stopping at the first occupied square
+    (Kogge-Stone fill, three doubling steps reach the far side of the board)
+    """
+    attacks = np.zeros_like(sliders)
+
+    for shift, mask in shifts:
+        fill = sliders
+        open_squares = empty & mask
+
+        for step in (shift, 2 * shift, 4 * shift):
+            fill = fill | (open_squares & Shift(fill, step))
+            open_squares = open_squares & Shift(open_squares, step)
+
+        attacks |= Shift(fill, shift) & mask
+
+    return attacks
+
+
+def Mobility(piece_bbs, colour, own, empty):
+    """
+    (middlegame, endgame, attacks) of one side, colour is 'w' or 'b': the mobility scores of its pieces and every
+    square it attacks, with its pawns and king. piece_bbs is the (12, N) transpose of the positions' bitboards
+    """
+    pieces = {piece : piece_bbs[BATCH_PIECES.index(piece if colour == 'w' else piece.lower())] for piece in 'PNBRQK'}
+
+    attacks = {
+        'N' : KnightAttacks(pieces['N']),
+        'B' : SlidingAttacks(pieces['B'], empty, SLIDER_SHIFTS['B']),
+        'R' : SlidingAttacks(pieces['R'], empty, SLIDER_SHIFTS['R']),
+        'Q' : (SlidingAttacks(pieces['Q'], empty, SLIDER_SHIFTS['B']) |
+               SlidingAttacks(pieces['Q'], empty, SLIDER_SHIFTS['R'])),
+    }
+
+    mg = np.zeros(len(own), dtype=np.int32)
+    eg = np.zeros(len(own), dtype=np.int32)
+    all_attacks = StepAttacks(pieces['P'], PAWN_SHIFTS[colour]) | StepAttacks(pieces['K'], KING_SHIFTS)
+
+    for piece, piece_attacks in attacks.items():
+        count = PopCounts(piece_attacks & (own ^ FULL))
+        mg += MOBILITY_WEIGHTS[piece][0] * count
+        eg += MOBILITY_WEIGHTS[piece][1] * count
+        all_attacks |= piece_attacks
+
+    return mg, eg, all_attacks
+
+
+def KingZoneAttacks(king, enemy_attacks):
+    # (N, 2) middlegame and endgame scores of the squares next to king (an (N,) array) that enemy_attacks covers
+    return np.outer(PopCounts(StepAttacks(king, KING_SHIFTS) & enemy_attacks), KING_ZONE_ATTACK)
+
+
+def SquareScores(bitboards):
+    """
+    (middlegame, endgame, phase) arrays of the material and piece-square scores from white's point of view, and the
+    phase. Each (piece, rank) byte of the bitboards is looked up in RANK_TABLE
+    """
+    ranks = bitboards.astype('>u8').view(np.uint8).reshape(len(bitboards), 96) + RANK_OFFSETS
+
+    return Unpack(np.take(RANK_TABLE, ranks).sum(axis=1))
+
+
+def FileFill(bbs):
+    # every square on a file with a set bit in bbs
+    for shift in (8, 16, 32):
+        bbs = bbs | (bbs << np.uint64(shift)) | (bbs >> np.uint64(shift))
+
+    return bbs
+
+
+def Fill(bbs, shift):
+    # bbs and every square they reach moving by shift (8 towards rank 8, -8 towards rank 1)
+    for step in (shift, 2 * shift, 4 * shift):
+        bbs = bbs | Shift(bbs, step)
+
+    return bbs
+
+
+def Neighbours(bbs):
+    # squares one file either side of bbs
+    return (Shift(bbs, 1) & NOT_H_FILE) | (Shift(bbs, -1) & NOT_A_FILE)
+
+
+def FrontSpan(pawns, shift):
+    # squares in front of pawns (moving by shift, 8 for white and -8 for black) and on the files next to them, the
+    # squares these pawns can stop an enemy pawn on or attack it from
+    span = Fill(Shift(pawns, shift), shift)
+
+    return span | Neighbours(span)
+
+
+def KingShields(piece_bbs, pawns, side):
+    """
+    (N,) middlegame shield scores of one side (0 white, 1 black) for its king, as evaluation.KingShields
+    """
+    king = piece_bbs[BATCH_PIECES.index('Kk'[side])]
+    wings = BYTE_WINGS[(FileFill(king) & RANK_1).astype(np.intp)]
+    wings[(king & BACK_RANKS[side]) == 0] = -1
+
+    scores = np.zeros(len(king), dtype=np.int32)
+
+    for wing, (second_rank, third_rank) in enumerate(SHIELD_MASKS[side]):
+        shield = PopCounts(pawns & second_rank) * SHIELD_PAWN[0] + PopCounts(pawns & third_rank) * SHIELD_PAWN[1]
+        scores += np.where(wings == wing, shield, 0)
+
+    return scores
+
+
+def PawnStructure(piece_bbs):
+    """
+    (N, 2) array of the middlegame and endgame pawn structure scores from white's point of view
+    """
+    white_pawns = piece_bbs[BATCH_PIECES.index('P')]
+    black_pawns = piece_bbs[BATCH_PIECES.index('p')]
+
+    white_attacks = (Shift(white_pawns, 9) & NOT_H_FILE) | (Shift(white_pawns, 7) & NOT_A_FILE)
+    black_attacks = (Shift(black_pawns, -7) & NOT_H_FILE) | (Shift(black_pawns, -9) & NOT_A_FILE)
+
+    scores = np.zeros((len(white_pawns), 2), dtype=np.int32)
+
+    for side, pawns, enemy_span, stop_attacks, forward, passed_bonus, sign in (
+            (0, white_pawns, FrontSpan(black_pawns, -8), Shift(black_attacks, -8), 8, WHITE_PASSED, 1),
+            (1, black_pawns, FrontSpan(white_pawns, 8), Shift(white_attacks, 8), -8, BLACK_PASSED, -1)):
+        files = FileFill(pawns)
+        doubled = PopCounts(pawns) - PopCounts(files & RANK_1)
+
+        isolated = pawns & (Neighbours(files) ^ FULL)
+
+        # no pawn beside or behind on the next files to come up in support, and the square in front is attacked
+        backward = pawns & (Fill(Neighbours(pawns), forward) ^ FULL) & (isolated ^ FULL) & stop_attacks
+
+        # passed pawns counted by rank, then weighted by rank
+        passed = pawns & (enemy_span ^ FULL)
+        passed_by_rank = BYTE_POPCOUNTS[passed.astype('>u8').view(np.uint8)].reshape(len(pawns), 8)
+
+        scores += sign * (np.outer(doubled, DOUBLED_PAWN) + np.outer(PopCounts(isolated), ISOLATED_PAWN) +
+                          np.outer(PopCounts(backward), BACKWARD_PAWN) + passed_by_rank @ passed_bonus)
+        scores[:, 0] += sign * KingShields(piece_bbs, pawns, side)
+
+    return scores
+
+
+def EvaluateChunk(bitboards, white_to_move):
+    mg, eg, phase = SquareScores(bitboards)
+    phase = np.minimum(phase, MAX_PHASE)
+
+    # one contiguous array per piece type, the shifts and byte views below work on whole arrays
+    piece_bbs = np.ascontiguousarray(bitboards.T)
+
+    whites = np.bitwise_or.reduce(piece_bbs[:6])
+    blacks = np.bitwise_or.reduce(piece_bbs[6:])
+    empty = (whites | blacks) ^ FULL
+
+    white_mg, white_eg, white_attacks = Mobility(piece_bbs, 'w', whites, empty)
+    black_mg, black_eg, black_attacks = Mobility(piece_bbs, 'b', blacks, empty)
+
+    king_mg, king_eg = (KingZoneAttacks(piece_bbs[BATCH_PIECES.index('K')], black_attacks) -
+                        KingZoneAttacks(piece_bbs[BATCH_PIECES.index('k')], white_attacks)).T
+
+    pawn_mg, pawn_eg = PawnStructure(piece_bbs).T
+
+    mg = mg + white_mg - black_mg + king_mg + pawn_mg
+    eg = eg + white_eg - black_eg + king_eg + pawn_eg
+
+    scores = mg * phase + eg * (MAX_PHASE - phase)
+
+    if white_to_move is not None:
+        # turned round before dividing, as in evaluation.Evaluate
+        scores = np.where(white_to_move, scores, -scores)
+
+    return scores // MAX_PHASE
+
+
+def EvaluateBatch(bitboards, white_to_move=None, chunk_size=CHUNK_SIZE):
+    """
+    Scores in centipawns of N positions given as an (N, 12) uint64 array of piece bitboards in BATCH_PIECES order.
+    Returns an (N,) int32 array, from white's point of view, or from the side to move's if white_to_move (an (N,)
+    array of bools) is given
+    """
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+
+    if bitboards.ndim != 2 or bitboards.shape[1] != 12:
+        raise ValueError(f'Expected an (N, 12) array of piece bitboards, got shape {bitboards.shape}')
+
+    if white_to_move is not None:
+        white_to_move = np.asarray(white_to_move, dtype=bool)
+
+        if white_to_move.shape != (len(bitboards),):
+            raise ValueError(f'Expected {len(bitboards)} sides to move, got shape {white_to_move.shape}')
+
+    scores = np.empty(len(bitboards), dtype=np.int32)
+
+    for start in range(0, len(bitboards), chunk_size):
+        end = start + chunk_size
+        scores[start:end] = EvaluateChunk(bitboards[start:end],
+                                          white_to_move[start:end] if white_to_move is not None else None)
+
+    return scores
+
+
+def BoardsToArray(boards):
+    """
+    (N, 12) uint64 array of the piece bitboards of each Board in boards, for EvaluateBatch
+    """
+    return np.array([[int(bb) for bb in board.GetAllBitboards()[2:14]] for board in boards], dtype=np.uint64)
@@ -0,0 +1,312 @@
+"""
+Microbenchmarks for the hot helpers used by Board and GenerateMoves. Each benchmark prints the cost per call of the
+current implementation next to the one it replaced, which is kept here for comparison.
+"""
+import argparse
+import sys
+import timeit
+
+import numpy as np
+
+import bitOperations
+from evaluation import ComputeEvaluation
+
+
+class LegacyBitOperations:
+    # the string and numpy array based versions Board and GenerateMoves used before bitOperations
+    @staticmethod
+    def BBToSquares(bb):
+        bb = np.binary_repr(bb, width=64)
+        squares = []
+
+        for rank_ind, line in enumerate([bb[i:i + 8] for i in range(0, 64, 8)]):
+            for file_ind, c in enumerate(line):
+                if c == '1':
+                    squares.append(8*rank_ind + file_ind)
+
+        return squares
+
+    @staticmethod
+    def SquareToBB(square):
+        binary = ['0']*64
+        bb = ''
+
+        binary[square] = '1'
+
+        for rank in [binary[i:i+8] for i in range(0, 64, 8)]:
+            bb += ''.join(rank)
+
+        return np.uint64(int(bb, 2))
+
+    @staticmethod
+    def BitscanForward(number):
+        a = (2**np.arange(64, dtype = np.uint64) & np.uint64(number))
+
+        return int((a==0).argmin())
+
+    @staticmethod
+    def BitscanReverse(number):
+        a = (np.uint64(2)**np.arange(64, dtype=np.uint64) & np.uint64(number))
+
+        return int(64-a.argmax()-1)
+
+    @staticmethod
+    def PopCount(bb):
+        return len(LegacyBitOperations.BBToSquares(bb))
+
+
+class LegacyFen:
+    # the FEN loading Board did before ParsePlacement: a '0'/'1' string per piece type read with int(binary, 2), and a
+    # new console board and piece list built from a dict keyed by bitboard
+    @staticmethod
+    def FenToBitboards(board):
+        bbs = {piece : ['0'] * 64 for piece in 'PNBRQKpnbrqk'}
+        sq = 0
+
+        for rank in board.position_fen.split('/'):
+            for file in rank:
+                if file.isdigit():
+                    sq += int(file)
+                else:
+                    bbs[file][sq] = '1'
+                    sq += 1
+
+        for piece, bb in bbs.items():
+            board.SetBitboard(piece, board.U64(int(''.join(bb), 2)))
+
+    @staticmethod
+    def SetBoard(board):
+        board.pieces = []
+        board.console_board = ['.'] * 64
+        piece_str = {board.white_pawns: 'P', board.white_knights: 'N', board.white_bishops: 'B', board.white_rooks: 'R',
+                     board.white_queen: 'Q', board.white_king: 'K', board.black_pawns: 'p', board.black_knights: 'n',
+                     board.black_bishops: 'b', board.black_rooks: 'r', board.black_queen: 'q', board.black_king: 'k'}
+
+        for bb, string in piece_str.items():
+            for sq in board.BBToSquares(bb):
+                board.console_board[sq] = string
+                board.pieces.append((string, sq))
+
+        board.piece_list_index = [None] * 64
+
+        for index, (_, sq) in enumerate(board.pieces):
+            board.piece_list_index[sq] = index
+
+        board.hash_key = board.ComputeHash()
+        board.mg_score, board.eg_score, board.phase = ComputeEvaluation(board)
+
+    @staticmethod
+    def LoadFen(board, fen):
+        board.ParseFen(fen)
+        LegacyFen.FenToBitboards(board)
+        board.SetUpBitboards()
+        LegacyFen.SetBoard(board)
+
+
+def TimePerCall(function, args, number):
+    # best of 3 runs, in nanoseconds
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=3)) / number * 1e9
+
+
+def BenchBitOperations(number=20000):
+    bitboards = {
+        'single bit' : 1 << 35,
+        'start position' : 0xFFFF00000000FFFF,
+        'dense' : 0xF7DE_B5AD_6B5A_D6B5,
+    }
+
+    legacy = LegacyBitOperations
+
+    cases = [
+        ('squares of bitboard', legacy.BBToSquares, bitOperations.Squares, None),
+        ('popcount', legacy.PopCount, bitOperations.PopCount, None),
+        ('lsb', legacy.BitscanForward, bitOperations.LSB, None),
+        ('msb', legacy.BitscanReverse, lambda bb: 63 - bitOperations.MSB(bb), None),
+        ('pop lsb', None, bitOperations.PopLSB, None),
+        ('square to bitboard', legacy.SquareToBB, bitOperations.SQUARE_BBS.__getitem__, 35),
+    ]
+
+    print(f'{"operation":<22}{"bitboard":<18}{"before (ns)":>14}{"after (ns)":>14}{"speedup":>10}')
+
+    for name, before, after, square in cases:
+        for bb_name, bb in bitboards.items():
+            args = (square,) if square is not None else (bb,)
+
+            after_ns = TimePerCall(after, args, number)
+
+            if before is None:
+                print(f'{name:<22}{bb_name:<18}{"-":>14}{after_ns:>14.0f}{"-":>10}')
+            else:
+                before_ns = TimePerCall(before, args, number // 10)
+                print(f'{name:<22}{bb_name:<18}{before_ns:>14.0f}{after_ns:>14.0f}{before_ns / after_ns:>9.1f}x')
+
+            if square is not None:
+                break
+
+
+def BenchBatchEvaluation(positions=50000):
+    from batchEvaluation import BoardsToArray, EvaluateBatch, SquareScores
+    from classicalBitboard import Board
+    from evaluation import ComputeEvaluation
+
+    boards = []
+
+    with open('fens.txt') as f:
+        for fen in f:
+            board = Board('int')
+            board.LoadFen(fen)
+            boards.append(board)
+
+    bitboards = np.tile(BoardsToArray(boards), (positions // len(boards) + 1, 1))[:positions]
+    single = [bitboards[i:i + 1] for i in range(len(boards))]
+
+    cases = [
+        # material and piece-square scores of one Board at a time in python, against the whole batch
+        ('material + pst', lambda: [ComputeEvaluation(board) for board in boards], lambda: SquareScores(bitboards)),
+        # every term, one position per call against the whole batch
+        ('all terms', lambda: [EvaluateBatch(bbs) for bbs in single], lambda: EvaluateBatch(bitboards)),
+    ]
+
+    print(f'{"evaluation":<22}{"positions":>10}{"before (ns)":>14}{"after (ns)":>14}{"speedup":>10}')
+
+    for name, before, after in cases:
+        before_ns = TimePerCall(before, (), 20) / len(boards)
+        after_ns = TimePerCall(after, (), 1) / positions
+        print(f'{name:<22}{positions:>10}{before_ns:>14.0f}{after_ns:>14.0f}{before_ns / after_ns:>9.1f}x')
+
+
+def BenchFen(number=200):
+    from classicalBitboard import Board
+
+    with open('fens.txt') as f:
+        fens = [fen.strip() for fen in f if fen.strip()]
+
+    board = Board('int')
+
+    for fen in fens:
+        board.LoadFen(fen)
+
+        if board.ToFen() != fen:
+            raise RuntimeError(f'{fen} comes back from ToFen as {board.ToFen()}')
+
+    def LoadAll(load):
+        for fen in fens:
+            load(board, fen)
+
+    def ToFenAll():
+        for fen in fens:
+            board.LoadFen(fen)
+            board.ToFen()
+
+    # ToFen is timed with a load before it, so it is the difference from loading alone
+    load_ns = TimePerCall(LoadAll, (Board.LoadFen,), number) / len(fens)
+    legacy_load_ns = TimePerCall(LoadAll, (LegacyFen.LoadFen,), number) / len(fens)
+    to_fen_ns = TimePerCall(ToFenAll, (), number) / len(fens) - load_ns
+
+    print(f'{"fen":<22}{"positions":>10}{"before (ns)":>14}{"after (ns)":>14}{"speedup":>10}')
+    print(f'{"load":<22}{len(fens):>10}{legacy_load_ns:>14.0f}{load_ns:>14.0f}{legacy_load_ns / load_ns:>9.1f}x')
+    print(f'{"to fen":<22}{len(fens):>10}{"-":>14}{to_fen_ns:>14.0f}{"-":>10}')
+
+
+def BenchPositionDB(number=200):
+    import os
+    import tempfile
+
+    from classicalBitboard import Board
+    from positionDatabase import FensToRecords, PositionDB, PositionWriter, RECORD_SIZE
+
+    with open('fens.txt') as f:
+        fens = [fen.strip() for fen in f if fen.strip()]
+
+    board = Board('int')
+    path = os.path.join(tempfile.mkdtemp(), 'positions.bin')
+
+    with PositionWriter(path) as writer:
+        writer.AddRecord(FensToRecords(fens))
+
+    db = PositionDB(path)
+
+    def LoadFens():
+        for fen in fens:
+            board.LoadFen(fen)
+
+    def LoadRecords():
+        for index in range(len(db)):
+            db.Load(index, board)
+
+    fen_ns = TimePerCall(LoadFens, (), number) / len(fens)
+    record_ns = TimePerCall(LoadRecords, (), number) / len(fens)
+
+    db.Close()
+    os.remove(path)
+
+    print(f'{"load into board":<22}{"positions":>10}{"fen (ns)":>14}{"record (ns)":>14}{"speedup":>10}')
+    print(f'{"":<22}{len(fens):>10}{fen_ns:>14.0f}{record_ns:>14.0f}{fen_ns / record_ns:>9.1f}x')
+    print(f'bytes per position  fen {sum(len(fen) + 1 for fen in fens) / len(fens):.0f}  record {RECORD_SIZE}')
+
+
+def BenchPawnHash(number=200):
+    from classicalBitboard import Board
+    from evaluation import PawnStructure
+    from pawnHashTable import PawnHashTable
+    from search import Search
+
+    pawns = []
+
+    with open('fens.txt') as f:
+        for fen in f:
+            board = Board('int')
+            board.LoadFen(fen)
+            pawns.append((int(board.white_pawns), int(board.black_pawns)))
+
+    table = PawnHashTable()
+
+    def Compute():
+        for white_pawns, black_pawns in pawns:
+            PawnStructure(white_pawns, black_pawns)
+
+    def Probe():
+        for white_pawns, black_pawns in pawns:
+            table.Probe(white_pawns, black_pawns)
+
+    compute_ns = TimePerCall(Compute, (), number) / len(pawns)
+    probe_ns = TimePerCall(Probe, (), number) / len(pawns)
+
+    print(f'{"pawn structure":<22}{"positions":>10}{"compute (ns)":>14}{"hit (ns)":>14}{"speedup":>10}')
+    print(f'{"":<22}{len(pawns):>10}{compute_ns:>14.0f}{probe_ns:>14.0f}{compute_ns / probe_ns:>9.1f}x')
+
+    # how often a real search finds its pawns in the table
+    board = Board('int')
+    board.LoadFen('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3')
+    search = Search(board)
+    search.Think(depth=4)
+    print(f'search to depth 4: {search.pawn_table}')
+
+
+BENCHMARKS = {
+    'bitops' : BenchBitOperations,
+    'evaluation' : BenchBatchEvaluation,
+    'fen' : BenchFen,
+    'positions' : BenchPositionDB,
+    'pawns' : BenchPawnHash,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run microbenchmarks')
+    parser.add_argument('benchmarks', nargs='*', help=f'benchmarks to run, any of {", ".join(BENCHMARKS)} (default: all)')
+    args = parser.parse_args(argv)
+
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark '{name}'")
+
+    for name in args.benchmarks or list(BENCHMARKS):
+        print(f'== {name} ==')
+        BENCHMARKS[name]()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Bit twiddling on 64 bit bitboards held in python ints.
+
+Bit indices count from the least significant bit. Board numbers squares the other way round (square 0 is a8, the most
+significant bit), so square = 63 - bit index, and walking bits from the most significant one gives squares in
+ascending order.
+
+numpy backend bitboards must be passed through int() first.
+"""
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+SQUARE_BBS = [1 << (63 - sq) for sq in range(64)]
+
+if hasattr(int, 'bit_count'):
+    # python 3.10+
+    PopCount = int.bit_count
+else:
+    def PopCount(bb):
+        return bin(bb).count('1')
+
+
+def LSB(bb):
+    # index of the least significant set bit, -1 for an empty bitboard
+    return (bb & -bb).bit_length() - 1
+
+
+def MSB(bb):
+    # index of the most significant set bit, -1 for an empty bitboard
+    return bb.bit_length() - 1
+
+
+def PopLSB(bb):
+    """
+    Returns (index of the least significant set bit, bb with that bit cleared). bb must not be empty
+    """
+    lsb = bb & -bb
+
+    return lsb.bit_length() - 1, bb ^ lsb
+
+
+def FirstSquare(bb):
+    # lowest numbered square in bb, the most significant bit
+    return 64 - bb.bit_length()
+
+
+def LastSquare(bb):
+    # highest numbered square in bb, the least significant bit
+    return 64 - (bb & -bb).bit_length()
+
+
+# BYTE_SQUARES[k][byte] is the squares of the bits set in byte, when byte is the k-th byte from the least significant end
+BYTE_SQUARES = [[tuple(8 * (7 - k) + (7 - bit) for bit in range(7, -1, -1) if byte >> bit & 1) for byte in range(256)]
+                for k in range(8)]
+
+
+def Squares(bb):
+    """
+    List of the squares in bb, in ascending order
+    """
+    squares = []
+
+    if PopCount(bb) <= 5:
+        # clearing one bit at a time is cheapest for sparse bitboards, such as most attack sets
+        while bb:
+            length = bb.bit_length()
+            squares.append(64 - length)
+            bb ^= 1 << (length - 1)
+    else:
+        for k in (7, 6, 5, 4, 3, 2, 1, 0):
+            byte = (bb >> (8 * k)) & 255
+
+            if byte:
+                squares += BYTE_SQUARES[k][byte]
+
+    return squares
+
+
+def IterSquares(bb):
+    # lazy version of Squares
+    while bb:
+        length = bb.bit_length()
+        yield 64 - length
+        bb ^= 1 << (length - 1)
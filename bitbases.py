@@ -0,0 +1,757 @@
+"""
+Endgame bitbases: the result (win, draw or loss for the side to move, and optionally the distance to mate) of every
+position of a small material signature such as KPK, KRK, KQK or KRKP, solved offline by retrograde analysis and probed
+at run time from a memory mapped file.
+
+    python bitbases.py KPK KRK KQK           # solve, along with the smaller tables they convert into
+    python bitbases.py KRKP --dtm
+    python bitbases.py --probe "8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"
+
+A signature lists white's pieces then black's, each starting with the king. Tables are only kept for one colour
+orientation, the side with more material as white (see Canonical), and positions with the colours the other way round
+are mirrored top to bottom before probing.
+
+A table has an entry for every placement of its pieces on the 64 squares with either side to move:
+
+    index = side * 64 ** n + square of piece 0 * 64 ** (n - 1) + ... + square of piece n - 1
+
+with side 0 for white to move, squares numbered as on Board (0 is a8) and pieces in the order of the signature. Entries
+are 2 bit WDL codes (DRAW, WIN, LOSS or INVALID for placements that can't happen), packed 4 to a byte, followed by a
+byte of distance to mate in plies for each entry when the table is made with DTM. So a probe is one index calculation
+and one or two byte reads. Castling and en-passant are ignored.
+
+Solving works on whole arrays of positions with numpy, using the attack tables and BETWEEN masks for moves and checks:
+
+    1. every placement is checked for being legal, and every legal move counted. Moves out of the table (captures
+       and promotions) are looked up in the smaller tables, which are solved first
+    2. from the checkmates (and positions decided by captures and promotions), each level of results is taken back one
+       move with un-moves: a position with a move to a lost position is won, one whose last move to a position that
+       isn't won has been used up is lost
+    3. whatever is left is a draw
+"""
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+from attackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, BETWEEN as BETWEEN_SQUARES
+from bitOperations import SQUARE_BBS, Squares
+from classicalBitboard import Board
+from moveEncoding import MoveToUci
+from moveGeneration import GenerateMoves
+
+DRAW, WIN, LOSS, INVALID = 0, 1, 2, 3
+UNKNOWN = 4 # only while solving
+
+RESULTS = {DRAW : 0, WIN : 1, LOSS : -1}
+
+MAGIC = b'BITBASE1'
+HEADER = struct.Struct('<8s8sBB6x') # magic, pieces, number of pieces, flags
+HEADER_SIZE = HEADER.size
+DTM_FLAG = 1
+
+BITBASE_DIRECTORY = 'bitbases'
+
+PIECE_ORDER = 'KQRBNP' # order of a side's pieces in a signature
+PIECE_VALUES = {'K' : 0, 'Q' : 9, 'R' : 5, 'B' : 3, 'N' : 3, 'P' : 1}
+PROMOTIONS = 'QRBN'
+
+MAX_LEVEL = 32000 # stands for no level yet in the solver's level arrays
+
+SQUARE_BB = np.array(SQUARE_BBS, dtype=np.uint64)
+
+# squares strictly between two squares on a line, 0 for squares not on a line
+BETWEEN = np.array(BETWEEN_SQUARES, dtype=np.uint64)
+
+# whether a rook or bishop on the first square, on an empty board, attacks the second
+ROOK_LINES = np.zeros((64, 64), dtype=bool)
+BISHOP_LINES = np.zeros((64, 64), dtype=bool)
+
+for _direction, _rays in RAYS.items():
+    _lines = ROOK_LINES if len(_direction) == 1 else BISHOP_LINES
+
+    for _sq in range(64):
+        for _target in Squares(_rays[_sq]):
+            _lines[_sq, _target] = True
+
+
+def RayTargets(directions):
+    # (slots, 64) target squares, -1 off the board. Slot 7 * d + k - 1 is k squares along direction d
+    targets = np.full((7 * len(directions), 64), -1, dtype=np.int64)
+
+    for d, direction in enumerate(directions):
+        for sq in range(64):
+            for k, target in enumerate(sorted(Squares(RAYS[direction][sq]), key=lambda target: abs(target - sq))):
+                targets[7 * d + k, sq] = target
+
+    return targets
+
+
+def StepTargets(attacks):
+    # (8, 64) target squares of a piece that steps, -1 for unused slots
+    targets = np.full((8, 64), -1, dtype=np.int64)
+
+    for sq in range(64):
+        for slot, target in enumerate(Squares(attacks[sq])):
+            targets[slot, sq] = target
+
+    return targets
+
+
+TARGETS = {'K' : StepTargets(KING_ATTACKS), 'N' : StepTargets(KNIGHT_ATTACKS),
+           'B' : RayTargets(('NE', 'NW', 'SE', 'SW')), 'R' : RayTargets(('N', 'E', 'W', 'S')),
+           'Q' : RayTargets(tuple(RAYS))}
+SLIDERS = 'BRQ'
+
+PAWN_CAPTURE_TARGETS = {colour : StepTargets(PAWN_ATTACKS[colour]) for colour in 'wb'}
+
+KING_BB = np.array(KING_ATTACKS, dtype=np.uint64)
+KNIGHT_BB = np.array(KNIGHT_ATTACKS, dtype=np.uint64)
+PAWN_BB = {colour : np.array(PAWN_ATTACKS[colour], dtype=np.uint64) for colour in 'wb'}
+
+del _direction, _rays, _lines, _sq, _target
+
+
+def Colour(piece):
+    return 'w' if piece.isupper() else 'b'
+
+
+def SideKey(side_pieces):
+    # which side counts as stronger: more material, then better pieces
+    return (sum(PIECE_VALUES[piece.upper()] for piece in side_pieces),
+            sorted((PIECE_VALUES[piece.upper()], -PIECE_ORDER.index(piece.upper())) for piece in side_pieces))
+
+
+def Canonical(pieces):
+    """
+    (canonical pieces, swapped, order) for a string of pieces like 'KRkp' in any order. The canonical string has white's
+    pieces then black's, each in PIECE_ORDER, with the stronger side as white. swapped says the colours were swapped
+    (so squares are mirrored and the side to move flips), order[i] is the index in pieces of canonical piece i
+    """
+    white = [i for i, piece in enumerate(pieces) if piece.isupper()]
+    black = [i for i, piece in enumerate(pieces) if piece.islower()]
+
+    swapped = SideKey([pieces[i] for i in black]) > SideKey([pieces[i] for i in white])
+
+    if swapped:
+        white, black = black, white
+
+    by_kind = lambda i: PIECE_ORDER.index(pieces[i].upper())
+    order = sorted(white, key=by_kind) + sorted(black, key=by_kind)
+
+    canonical = ''.join(pieces[i].upper() for i in sorted(white, key=by_kind))
+    canonical += ''.join(pieces[i].lower() for i in sorted(black, key=by_kind))
+
+    return canonical, swapped, order
+
+
+def ParseSignature(signature):
+    # 'KRKP' -> 'KRkp'
+    signature = signature.upper()
+    second_king = signature.find('K', 1)
+
+    if not signature.startswith('K') or second_king == -1 or signature.count('K') != 2 or \
+            any(piece not in PIECE_ORDER for piece in signature):
+        raise ValueError(f"'{signature}' is not a signature like KRKP, with each side's pieces starting with its king")
+
+    return Canonical(signature[:second_king] + signature[second_king:].lower())[0]
+
+
+def TablePath(directory, pieces):
+    return os.path.join(directory, f'{pieces.upper()}.bitbase')
+
+
+def Conversions(pieces):
+    """
+    Canonical pieces of every table a capture or promotion can lead to from a table of pieces
+    """
+    results = set()
+
+    for m, piece in enumerate(pieces):
+        if piece not in 'Kk':
+            results.add(pieces[:m] + pieces[m + 1:])
+
+        if piece in 'Pp':
+            for promotion in PROMOTIONS:
+                promoted = pieces[:m] + (promotion if piece == 'P' else promotion.lower()) + pieces[m + 1:]
+                results.add(promoted)
+
+                # promoting with a capture
+                for c, captured in enumerate(promoted):
+                    if captured not in 'Kk' and Colour(captured) != Colour(piece):
+                        results.add(promoted[:c] + promoted[c + 1:])
+
+    return sorted(Canonical(result)[0] for result in results)
+
+
+def Attacks(piece, from_sq, target, occupied):
+    # whether piece on from_sq attacks target, all arrays (or scalars) of the same shape
+    kind = piece.upper()
+    target_bb = SQUARE_BB[target]
+
+    if kind == 'K':
+        return (KING_BB[from_sq] & target_bb) != 0
+    elif kind == 'N':
+        return (KNIGHT_BB[from_sq] & target_bb) != 0
+    elif kind == 'P':
+        return (PAWN_BB[Colour(piece)][from_sq] & target_bb) != 0
+
+    if kind == 'R':
+        on_line = ROOK_LINES[from_sq, target]
+    elif kind == 'B':
+        on_line = BISHOP_LINES[from_sq, target]
+    else:
+        on_line = ROOK_LINES[from_sq, target] | BISHOP_LINES[from_sq, target]
+
+    return on_line & ((BETWEEN[from_sq, target] & occupied) == 0)
+
+
+class Bitbase:
+    """
+    A solved table, memory mapped. Probe with Index and Lookup, or through Bitbases with a Board
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            magic, pieces, self.n, flags = HEADER.unpack(file.read(HEADER_SIZE))
+
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a bitbase')
+
+        self.path = path
+        self.pieces = pieces.rstrip(b'\0').decode()
+        self.size = 2 * 64 ** self.n
+        self.has_dtm = bool(flags & DTM_FLAG)
+
+        self.STRIDES = [64 ** (self.n - 1 - i) for i in range(self.n)]
+
+        wdl_bytes = self.size // 4
+        self.wdl = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE, shape=(wdl_bytes,))
+        self.dtm = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER_SIZE + wdl_bytes,
+                             shape=(self.size,)) if self.has_dtm else None
+
+    def Index(self, squares, side):
+        # squares in the order of self.pieces, side 0 for white to move
+        index = side * 64 ** self.n
+
+        for sq, stride in zip(squares, self.STRIDES):
+            index += sq * stride
+
+        return index
+
+    def Lookup(self, index):
+        """
+        (WDL code, distance to mate in plies, 0 without DTM) of one index or an array of them
+        """
+        codes = (self.wdl[index >> 2] >> ((index & 3) << 1)) & 3
+
+        if self.dtm is None:
+            return codes, np.zeros_like(codes) if isinstance(codes, np.ndarray) else 0
+
+        return codes, self.dtm[index]
+
+
+class BitbaseSolver:
+    """
+    Solves the table of pieces (canonical, see Canonical), using the Bitbase of every table it converts into
+    """
+    def __init__(self, pieces, subtables):
+        self.pieces = pieces
+        self.n = len(pieces)
+        self.size = 2 * 64 ** self.n
+        self.half = 64 ** self.n # entries per side to move
+        self.STRIDES = [64 ** (self.n - 1 - i) for i in range(self.n)]
+
+        self.subtables = subtables
+
+        self.KINGS = {'w' : pieces.index('K'), 'b' : pieces.index('k')}
+        self.OWN = {colour : [i for i, piece in enumerate(pieces) if Colour(piece) == colour] for colour in 'wb'}
+
+        # squares of pieces 1 to n - 1 for every entry of a chunk, the same for every chunk
+        chunk = np.arange(64 ** (self.n - 1), dtype=np.int64)
+        self.chunk_squares = [(chunk // stride) % 64 for stride in self.STRIDES[1:]]
+
+        self.value = np.full(self.size, UNKNOWN, dtype=np.uint8)
+        self.dtm = np.zeros(self.size, dtype=np.int16)
+
+        # legal moves staying in the table that haven't been found to lose yet, +100 when a draw is certain
+        self.counter = np.zeros(self.size, dtype=np.uint8)
+
+        # levels set by captures and promotions: the earliest win, the latest loss
+        self.win_seed = np.full(self.size, MAX_LEVEL, dtype=np.int16)
+        self.conversion_loss = np.zeros(self.size, dtype=np.int16)
+
+        # level at which a position whose moves all lose is lost
+        self.loss_level = np.full(self.size, MAX_LEVEL, dtype=np.int16)
+
+    def Chunks(self):
+        # (side, square of piece 0, first index, squares of every piece) for each block of entries
+        for side in (0, 1):
+            for sq in range(64):
+                start = side * self.half + sq * self.STRIDES[0]
+                yield side, start, [np.full(len(self.chunk_squares[0]), sq, dtype=np.int64)] + self.chunk_squares
+
+    @staticmethod
+    def Occupied(squares):
+        occupied = SQUARE_BB[squares[0]]
+
+        for sq in squares[1:]:
+            occupied = occupied | SQUARE_BB[sq]
+
+        return occupied
+
+    def InCheck(self, colour, squares, occupied):
+        # whether colour's king is attacked
+        king = squares[self.KINGS[colour]]
+        check = np.zeros(len(king), dtype=bool)
+
+        for i in self.OWN['b' if colour == 'w' else 'w']:
+            check |= Attacks(self.pieces[i], squares[i], king, occupied)
+
+        return check
+
+    def FindLegal(self):
+        # placements with no two pieces on a square, no pawns on the first or last rank and the side not to move not
+        # in check
+        for side, start, squares in self.Chunks():
+            legal = np.ones(len(squares[0]), dtype=bool)
+
+            for i in range(self.n):
+                for j in range(i + 1, self.n):
+                    legal &= squares[i] != squares[j]
+
+                if self.pieces[i] in 'Pp':
+                    legal &= (squares[i] >= 8) & (squares[i] < 56)
+
+            occupied = self.Occupied(squares)
+            legal &= ~self.InCheck('b' if side == 0 else 'w', squares, occupied)
+
+            block = self.value[start:start + len(legal)]
+            block[~legal] = INVALID
+
+    def PieceMoves(self, i, colour, squares, occupied):
+        """
+        (target squares, possible) for each move slot of piece i: moves to empty squares and to enemy pieces other
+        than the king
+        """
+        piece = self.pieces[i]
+        from_sq = squares[i]
+        own = [squares[j] for j in self.OWN[colour]]
+        enemy_king = squares[self.KINGS['b' if colour == 'w' else 'w']]
+
+        if piece in 'Pp':
+            step = -8 if colour == 'w' else 8
+            start_rank = (from_sq >= 48) if colour == 'w' else (from_sq < 16)
+
+            empty = lambda target: (occupied & SQUARE_BB[target]) == 0
+
+            one = from_sq + step
+            one_ok = empty(one)
+
+            yield one, one_ok
+
+            two = np.clip(from_sq + 2 * step, 0, 63)
+            yield two, one_ok & start_rank & empty(two)
+
+            for targets in PAWN_CAPTURE_TARGETS[colour]:
+                target = targets[from_sq]
+                ok = target >= 0
+                target = np.where(ok, target, 0)
+                ok &= ~empty(target) & (target != enemy_king)
+
+                for sq in own:
+                    ok &= target != sq
+
+                yield target, ok
+
+            return
+
+        sliding = piece.upper() in SLIDERS
+
+        for targets in TARGETS[piece.upper()]:
+            target = targets[from_sq]
+            ok = target >= 0
+            target = np.where(ok, target, 0)
+
+            if sliding:
+                ok &= (BETWEEN[from_sq, target] & occupied) == 0
+
+            for sq in own:
+                ok &= target != sq
+
+            ok &= target != enemy_king
+
+            yield target, ok
+
+    def ConversionChild(self, squares, side, removed, promoted, promotion):
+        # (subtable, index) after removing piece removed and/or promoting piece promoted, with the other side to move
+        pieces = list(self.pieces)
+        child_squares = list(squares)
+
+        if promoted is not None:
+            pieces[promoted] = promotion if pieces[promoted].isupper() else promotion.lower()
+
+        if removed is not None:
+            del pieces[removed]
+            del child_squares[removed]
+
+        canonical, swapped, order = Canonical(''.join(pieces))
+        table = self.subtables[canonical]
+
+        child_side = side if swapped else 1 - side
+        index = child_side * 64 ** table.n
+
+        for stride, i in zip(table.STRIDES, order):
+            index = index + ((child_squares[i] ^ 56) if swapped else child_squares[i]) * stride
+
+        return table, index
+
+    def LookUpConversion(self, index, table, child_index):
+        # a capture or promotion from the positions at index to child_index in table. Returns which are legal
+        codes, dtm = table.Lookup(child_index)
+        dtm = dtm.astype(np.int16) + 1
+
+        wins = codes == LOSS
+        np.minimum.at(self.win_seed, index[wins], dtm[wins])
+
+        self.counter[index[codes == DRAW]] = 100
+
+        losses = codes == WIN
+        np.maximum.at(self.conversion_loss, index[losses], dtm[losses])
+
+        return codes != INVALID
+
+    def AddConversions(self, index, squares, side, i, target, moves, removed, promotes, has_move):
+        # the moves of piece i to target that capture piece removed (None for none) or promote
+        if promotes is None:
+            groups = [(None, moves)]
+        else:
+            groups = [(None, moves & ~promotes)] + [(promotion, moves & promotes) for promotion in PROMOTIONS]
+
+        for promotion, selected in groups:
+            if (removed is None and promotion is None) or not selected.any():
+                continue
+
+            moved = [sq[selected] for sq in squares]
+            moved[i] = target[selected]
+
+            table, child_index = self.ConversionChild(moved, side, removed, None if promotion is None else i, promotion)
+            legal = self.LookUpConversion(index[selected], table, child_index)
+            has_move[np.nonzero(selected)[0][legal]] = True
+
+    def CountMoves(self):
+        # counts and conversions for every legal position, then checkmates and stalemates
+        for side, start, squares in self.Chunks():
+            colour = 'w' if side == 0 else 'b'
+            enemy = 'b' if side == 0 else 'w'
+
+            selected = np.nonzero(self.value[start:start + len(squares[0])] == UNKNOWN)[0]
+            index = start + selected
+            squares = [sq[selected] for sq in squares]
+
+            occupied = self.Occupied(squares)
+            has_move = np.zeros(len(index), dtype=bool)
+            counts = np.zeros(len(index), dtype=np.uint8)
+
+            base = index + (1 - 2 * side) * self.half # same placement, other side to move
+
+            for i in self.OWN[colour]:
+                promotes = None
+
+                for target, ok in self.PieceMoves(i, colour, squares, occupied):
+                    if not ok.any():
+                        continue
+
+                    if self.pieces[i] in 'Pp':
+                        promotes = (target < 8) | (target >= 56)
+
+                    captures = [(m, ok & (target == squares[m])) for m in self.OWN[enemy] if m != self.KINGS[enemy]]
+
+                    quiet = ok.copy()
+
+                    for _, capture in captures:
+                        quiet &= ~capture
+
+                    for m, capture in captures:
+                        if capture.any():
+                            self.AddConversions(index, squares, side, i, target, capture, m, promotes, has_move)
+
+                    if promotes is not None:
+                        self.AddConversions(index, squares, side, i, target, quiet, None, promotes, has_move)
+                        quiet &= ~promotes
+
+                    # moves staying in the table
+                    child = base[quiet] + (target[quiet] - squares[i][quiet]) * self.STRIDES[i]
+                    legal = self.value[child] != INVALID
+                    counts[np.nonzero(quiet)[0][legal]] += 1
+
+            # a draw by capture or promotion has already set the counter to 100
+            self.counter[index] += counts
+            has_move |= counts > 0
+
+            # no moves at all: checkmate or stalemate
+            stuck = ~has_move
+            in_check = self.InCheck(colour, squares, occupied)
+
+            self.value[index[stuck & in_check]] = LOSS
+            self.value[index[stuck & ~in_check]] = DRAW
+
+            # every move is a capture or promotion, and they all lose
+            lost = has_move & (counts == 0) & (self.counter[index] < 100) & (self.win_seed[index] == MAX_LEVEL)
+            self.loss_level[index[lost]] = self.conversion_loss[index[lost]]
+
+    def Decode(self, index):
+        # (side, squares) of an array of indexes
+        side = index // self.half
+        rest = index % self.half
+
+        return side, [(rest // stride) % 64 for stride in self.STRIDES]
+
+    def Predecessors(self, index):
+        """
+        Unsolved legal positions one quiet move (not a capture or promotion) before the positions at index, which all
+        have the same side to move. Each appears once for every move leading to index
+        """
+        side, squares = self.Decode(index)
+        side = int(side[0])
+        mover = 'b' if side == 0 else 'w' # the side that made the last move
+        occupied = self.Occupied(squares)
+
+        base = index + (1 - 2 * side) * self.half
+        found = []
+
+        def Add(i, ok, from_sq):
+            for j in range(self.n):
+                ok &= from_sq != squares[j]
+
+            previous = base[ok] + (from_sq[ok] - squares[i][ok]) * self.STRIDES[i]
+            found.append(previous[self.value[previous] == UNKNOWN])
+
+        for i in self.OWN[mover]:
+            piece = self.pieces[i]
+            target = squares[i]
+
+            if piece in 'Pp':
+                # a pawn came from one square back, or two from its starting rank
+                step = 8 if piece == 'P' else -8
+                one_back = target + step
+                ok = (one_back >= 8) & (one_back < 56)
+                Add(i, ok, np.clip(one_back, 0, 63))
+
+                two_back = np.clip(target + 2 * step, 0, 63)
+                double = (target // 8 == 4) if piece == 'P' else (target // 8 == 3)
+                double &= (occupied & SQUARE_BB[np.clip(one_back, 0, 63)]) == 0
+                Add(i, double, two_back)
+
+                continue
+
+            sliding = piece.upper() in SLIDERS
+
+            for targets in TARGETS[piece.upper()]:
+                from_sq = targets[target]
+                ok = from_sq >= 0
+                from_sq = np.where(ok, from_sq, 0)
+
+                if sliding:
+                    ok &= (BETWEEN[target, from_sq] & occupied) == 0
+
+                Add(i, ok, from_sq)
+
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def AllPredecessors(self, index):
+        # predecessors of positions with either side to move
+        sides = index // self.half
+        parts = [self.Predecessors(index[sides == side]) for side in (0, 1) if (sides == side).any()]
+
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def Solve(self):
+        self.FindLegal()
+        self.CountMoves()
+
+        last_seed = max(int(self.win_seed[self.win_seed < MAX_LEVEL].max(initial=0)),
+                        int(self.conversion_loss.max(initial=0)))
+
+        # checkmates
+        level = 0
+        losses = np.nonzero(self.value == LOSS)[0]
+        wins = np.zeros(0, dtype=np.int64)
+
+        while len(losses) or len(wins) or level < last_seed:
+            # one move before a loss is a win
+            won = np.unique(self.AllPredecessors(losses))
+            won = won[self.value[won] == UNKNOWN]
+            self.value[won] = WIN
+            self.dtm[won] = level + 1
+
+            # one move before a win uses up a move, positions with none left are lost
+            previous, moves = np.unique(self.AllPredecessors(wins), return_counts=True)
+            unsolved = self.value[previous] == UNKNOWN
+            previous, moves = previous[unsolved], moves[unsolved]
+
+            self.counter[previous] -= moves.astype(np.uint8)
+
+            lost = previous[(self.counter[previous] == 0) & (self.win_seed[previous] == MAX_LEVEL)]
+            self.loss_level[lost] = np.maximum(level + 1, self.conversion_loss[lost])
+
+            level += 1
+
+            seeded = np.nonzero((self.win_seed == level) & (self.value == UNKNOWN))[0]
+            self.value[seeded] = WIN
+            self.dtm[seeded] = level
+
+            wins = np.concatenate((won, seeded))
+
+            losses = np.nonzero((self.loss_level == level) & (self.value == UNKNOWN))[0]
+            self.value[losses] = LOSS
+            self.dtm[losses] = level
+
+        self.value[self.value == UNKNOWN] = DRAW
+
+    def Write(self, path, dtm):
+        codes = self.value.reshape(-1, 4)
+        packed = codes[:, 0] | (codes[:, 1] << 2) | (codes[:, 2] << 4) | (codes[:, 3] << 6)
+
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, self.pieces.encode(), self.n, DTM_FLAG if dtm else 0))
+            file.write(packed.astype(np.uint8).tobytes())
+
+            if dtm:
+                file.write(np.minimum(self.dtm, 255).astype(np.uint8).tobytes())
+
+
+def Generate(signature, directory=BITBASE_DIRECTORY, dtm=False, report=print):
+    """
+    Solve the table of signature (like 'KRKP') and write it to directory, solving any table it converts into that isn't
+    there yet first. Returns the path of the table
+    """
+    pieces = ParseSignature(signature)
+    path = TablePath(directory, pieces)
+
+    if os.path.exists(path) and (not dtm or Bitbase(path).has_dtm):
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+
+    subtables = {}
+
+    for child in Conversions(pieces):
+        subtables[child] = Bitbase(Generate(child, directory, dtm, report))
+
+    solver = BitbaseSolver(pieces, subtables)
+    solver.Solve()
+    solver.Write(path, dtm)
+
+    counts = np.bincount(solver.value, minlength=4)
+    report(f'{pieces.upper()}: {counts[WIN]} won, {counts[DRAW]} drawn, {counts[LOSS]} lost, {counts[INVALID]} invalid, '
+           f'longest mate {int(solver.dtm.max())} plies')
+
+    return path
+
+
+class Bitbases:
+    """
+    The tables in a directory, opened when first probed
+    """
+    def __init__(self, directory=BITBASE_DIRECTORY):
+        self.directory = directory
+        self.tables = {}
+
+    def Table(self, pieces):
+        if pieces not in self.tables:
+            path = TablePath(self.directory, pieces)
+            self.tables[pieces] = Bitbase(path) if os.path.exists(path) else None
+
+        return self.tables[pieces]
+
+    def Probe(self, board):
+        """
+        (result, distance to mate in plies) for the side to move on board, result 1 for a win, 0 a draw and -1 a loss.
+        The distance is None for tables without DTM. None if there's no table for the position
+        """
+        canonical, swapped, order = Canonical(''.join(piece for piece, _ in board.pieces))
+        table = self.Table(canonical)
+
+        if table is None:
+            return None
+
+        side = 1 if board.active_piece == 'b' else 0
+
+        if swapped:
+            side = 1 - side
+            squares = [board.pieces[i][1] ^ 56 for i in order]
+        else:
+            squares = [board.pieces[i][1] for i in order]
+
+        code, dtm = table.Lookup(table.Index(squares, side))
+
+        if code == INVALID:
+            return None
+
+        return RESULTS[int(code)], int(dtm) if table.has_dtm else None
+
+    def BestMove(self, board, moveGen=None):
+        """
+        (move, result, distance to mate) of the best move by the tables for the side to move on board: the quickest win,
+        else a draw, else the slowest loss. None if any position after a move isn't in the tables
+        """
+        moveGen = moveGen or GenerateMoves(board)
+        moveGen.board = board
+
+        best = None
+
+        for move in list(moveGen.GenerateAllPossibleMoves()):
+            board.MakeMove(move)
+            table = self.Table(Canonical(''.join(piece for piece, _ in board.pieces))[0])
+            probe = None if table is None else self.Probe(board)
+            board.UnmakeMove()
+
+            if probe is None:
+                return None
+
+            result, dtm = -probe[0], probe[1] or 0
+            key = (result, -dtm if result > 0 else dtm)
+
+            if best is None or key > best[0]:
+                best = (key, move, result, None if probe[1] is None else dtm + 1)
+
+        return best[1:] if best else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve endgame bitbases, or probe them')
+    parser.add_argument('signatures', nargs='*', help='material signatures to solve, like KPK or KRKP')
+    parser.add_argument('--dtm', action='store_true', help='store the distance to mate as well as win/draw/loss')
+    parser.add_argument('-d', '--directory', default=BITBASE_DIRECTORY, help='directory of the tables')
+    parser.add_argument('--probe', metavar='FEN', help='look a position up in the tables')
+    args = parser.parse_args(argv)
+
+    for signature in args.signatures:
+        Generate(signature, args.directory, args.dtm)
+
+    if args.probe:
+        board = Board('int')
+        board.LoadFen(args.probe)
+
+        bitbases = Bitbases(args.directory)
+        probe = bitbases.Probe(board)
+
+        if probe is None:
+            print('not in the tables')
+            return 1
+
+        result, dtm = probe
+        print({1 : 'win', 0 : 'draw', -1 : 'loss'}[result] + (f' mate in {dtm} plies' if dtm else ''))
+
+        best = bitbases.BestMove(board)
+
+        if best is not None:
+            print(f'best move {MoveToUci(best[0])}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
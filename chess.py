@@ -1,6 +1,7 @@
 import pygame
 from classicalBitboard import Board
 from moveGeneration import GenerateMoves
+from moveEncoding import TupleToMove
 import numpy as np
 
 WIDTH = 650
@@ -45,14 +46,9 @@ SPRITES = {'K_w':pygame.image.load('./pieces/K_w.png'),
 class Chess:
     def __init__(self):
         self.board = Board()
-        self.board.ParseFen('4R3/1k6/1p2P1p1/p7/4r3/1P1r4/2bK4/2R5 w - - 0 0')
-        self.board.FenToBitboards()
-        self.board.SetUpBitboards()
-        self.board.SetBoard()
+        self.board.LoadFen('4R3/1k6/1p2P1p1/p7/4r3/1P1r4/2bK4/2R5 w - - 0 0')
 
         self.moveGen = GenerateMoves(self.board)
-        self.moveGen.PopulateAttackTables()
-        self.moveGen.PopulateRayTable()
 
         self.win = pygame.display.set_mode((WIDTH, HEIGHT))
         self.run = True
@@ -183,19 +179,9 @@ class Chess:
             return None
 
     def MakeMove(self, move):
-        self.board.MakeMove(move)
-        # add ply, add moves, save game state, save move in move history
-
-        self.board.ply += 1
-        self.board.moves = self.board.ply // 2
-
-        self.SwitchActivePiece()
-
-    def SwitchActivePiece(self):
-        if self.board.active_piece == 'w':
-            self.board.active_piece = 'b'
-        else:
-            self.board.active_piece = 'w'
+        # the GUI and console work with move tuples, the board takes packed moves.
+        # board updates side to move, castling rights, en-passant square and move counters itself
+        self.board.MakeMove(TupleToMove(move, self.board.console_board))
 
     @staticmethod
     def AlgebraicToNumber(square):
@@ -229,12 +215,12 @@ class Chess:
             dest_sq = self.AlgebraicToNumber(move[2])
             move_type = move[3]
 
-            self.moveGen.GenerateAllPossibleMoves()
+            possible_moves = self.moveGen.GenerateAllPossibleMoves().Tuples()
 
-            self.board.possible_moves = list(filter(lambda move : move[1] == initial_sq, self.moveGen.possible_moves))
+            self.board.possible_moves = list(filter(lambda move : move[1] == initial_sq, possible_moves))
 
             the_move = list(filter(lambda move: move[0] == piece_type and self.IsAllyPiece(piece_type) and move[1] == initial_sq and 
-            move[2] == dest_sq and move[3] == move_type, self.moveGen.possible_moves))
+            move[2] == dest_sq and move[3] == move_type, possible_moves))
  
             while len(the_move) == 0 and move != 'Q':
                 # is the entered move valid?
@@ -250,12 +236,12 @@ class Chess:
                     dest_sq = self.AlgebraicToNumber(move[2])
                     move_type = move[3]
 
-                    self.moveGen.GenerateAllPossibleMoves()
+                    possible_moves = self.moveGen.GenerateAllPossibleMoves().Tuples()
 
-                    # self.possible_drag_piece_moves = list(filter(lambda move : move[1] == initial_sq, self.moveGen.possible_moves))
+                    # self.possible_drag_piece_moves = list(filter(lambda move : move[1] == initial_sq, possible_moves))
         
                     the_move = list(filter(lambda move: move[0] == piece_type and self.IsAllyPiece(piece_type) and move[1] == initial_sq and 
-                    move[2] == dest_sq and move[3] == move_type, self.moveGen.possible_moves))
+                    move[2] == dest_sq and move[3] == move_type, possible_moves))
             
             if move == 'Q':
                 self.console_based_run = False
@@ -270,7 +256,7 @@ class Chess:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if self.GetPieceUnderMouse() is not None:
                     if not self.dragging:
-                        self.moveGen.GenerateAllPossibleMoves()
+                        possible_moves = self.moveGen.GenerateAllPossibleMoves().Tuples()
                         self.drag_piece = self.GetPieceUnderMouse()
 
                         drag_piece_type, drag_piece_square = self.drag_piece
@@ -278,7 +264,7 @@ class Chess:
                         """
                         which of the possible moves are possible for the piece being dragged?
                         """
-                        self.possible_drag_piece_moves = list(filter(lambda move : move[1] == drag_piece_square, self.moveGen.possible_moves))
+                        self.possible_drag_piece_moves = list(filter(lambda move : move[1] == drag_piece_square, possible_moves))
                         
                     if self.IsAllyPiece(self.drag_piece[0]):
                         self.dragging = True
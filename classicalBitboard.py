@@ -1,8 +1,77 @@
 import numpy as np
 
+from bitOperations import SQUARE_BBS, Squares
+from moveEncoding import PIECES, FINAL_PIECES, EN_PASSANT, CASTLE, DOUBLE_PUSH, MoveToUci
+from zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, CastlingKey, EnPassantKey
+from attackMaps import AttackMap
+from evaluation import MG_SCORES, EG_SCORES, PIECE_PHASES, ComputeEvaluation
+
+EMPTY_BOARD = ['.'] * 64
+NO_PIECE_INDEXES = [None] * 64
+
+# runs of empty squares on a rank and their FEN digit, longest first so ToFen replaces '........' before '.'
+EMPTY_RUNS = [('.' * run, str(run)) for run in range(8, 0, -1)]
+FEN_DIGITS = {str(run) : run for run in range(1, 9)}
+
+
+def ParsePlacement(placement):
+    """
+    {piece : bitboard} for the piece placement field of a FEN, ranks from 8 down to 1 and files from a to h.
+    Raises ValueError unless there are 8 ranks of 8 squares
+    """
+    bbs = dict.fromkeys(PIECES, 0)
+
+    sq = 0
+    rank_end = 8
+
+    for char in placement:
+        if char == '/':
+            if sq != rank_end or rank_end == 64:
+                raise ValueError(f"FEN placement '{placement}' should have 8 ranks of 8 squares")
+
+            rank_end += 8
+        elif char in FEN_DIGITS:
+            sq += FEN_DIGITS[char]
+        elif char in bbs:
+            if sq < rank_end:
+                bbs[char] |= SQUARE_BBS[sq]
+
+            sq += 1
+        else:
+            raise ValueError(f"unknown piece '{char}' in FEN placement '{placement}'")
+
+        if sq > rank_end:
+            raise ValueError(f"FEN placement '{placement}' should have 8 ranks of 8 squares")
+
+    if sq != 64:
+        raise ValueError(f"FEN placement '{placement}' should have 8 ranks of 8 squares")
+
+    return bbs
+
 
 class Board:
-    def __init__(self):
+    def __init__(self, backend='numpy', debug=False):
+        """
+        backend chooses the type used for every bitboard:
+            'numpy' - np.uint64 scalars
+            'int'   - plain python ints, masked to 64 bits. Much cheaper per operation than numpy scalars
+
+        debug recomputes incrementally updated state (the zobrist key and evaluation) from scratch after every move and
+        checks it
+        """
+        if backend == 'numpy':
+            self.U64 = np.uint64
+        elif backend == 'int':
+            self.U64 = int
+        else:
+            raise ValueError(f"Unknown bitboard backend '{backend}', expected 'numpy' or 'int'")
+
+        self.backend = backend
+        self.debug = debug
+
+        # all 64 bits set. python ints have no fixed width, so ~x is written as x ^ FULL everywhere
+        self.FULL = self.U64(0xFFFFFFFFFFFFFFFF)
+
         # bitboards
         self.all_whites = 0
         self.all_blacks = 0
@@ -22,27 +91,40 @@ class Board:
         self.occupied = 0
         self.empty = 0
 
-        self.attackers = 0 # bitboard of pieces giving check
-        self.king_danger_squares = np.uint64(0)
+        self.attackers = 0 # bitboard of pieces giving check, set by GenerateMoves
+
+        # AttackMap of the position, built by GetAttackMap on first use
+        self.attack_map = None
 
-        self.CENTRE = np.uint64(103481868288)
-        self.EXTENDED_CENTRE = np.uint64(66229406269440)
-        self.A_FILE = np.uint64(9259542123273814144)
-        self.H_FILE = np.uint64(72340172838076673)
+        self.CENTRE = self.U64(103481868288)
+        self.EXTENDED_CENTRE = self.U64(66229406269440)
+        self.A_FILE = self.U64(9259542123273814144)
+        self.H_FILE = self.U64(72340172838076673)
+        self.NOT_A_FILE = self.A_FILE ^ self.FULL
+        self.NOT_H_FILE = self.H_FILE ^ self.FULL
 
-        self.FILES = {1 : self.A_FILE, 2 : np.uint64(4629771061636907072), 3 : np.uint64(2314885530818453536), 4 : np.uint64(1157442765409226768),
-                      5 : np.uint64(578721382704613384), 6 : np.uint64(289360691352306692), 7 : np.uint64(144680345676153346), 8 : self.H_FILE}
+        self.FILES = {1 : self.A_FILE, 2 : self.U64(4629771061636907072), 3 : self.U64(2314885530818453536), 4 : self.U64(1157442765409226768),
+                      5 : self.U64(578721382704613384), 6 : self.U64(289360691352306692), 7 : self.U64(144680345676153346), 8 : self.H_FILE}
 
         self.AB_FILE = self.FILES[1] | self.FILES[2]
         self.GH_FILE = self.FILES[7] | self.FILES[8]
 
-        self.RANKS = lambda rank_number : np.uint64(255 << (rank_number-1) * 8)
+        # rank masks are built once, RANKS(n) and NOT_RANKS(n) are just lookups
+        self.RANK_MASKS = {rank_number : self.U64(255 << (rank_number-1) * 8) for rank_number in range(1, 9)}
+        self.NOT_RANK_MASKS = {rank_number : mask ^ self.FULL for rank_number, mask in self.RANK_MASKS.items()}
+
+        self.RANKS = self.RANK_MASKS.__getitem__
+        self.NOT_RANKS = self.NOT_RANK_MASKS.__getitem__
+
+        # square 0 is a8, the most significant bit
+        self.SQUARE_BBS = [self.U64(bb) for bb in SQUARE_BBS]
         
         # board_repr
         self.console_board = None
 
         #pieces
         self.pieces = []
+        self.piece_list_index = [None] * 64 # index in self.pieces of the piece on each square
 
         # from FEN
         self.position_fen = ''
@@ -52,54 +134,42 @@ class Board:
         self.ply = ''
         self.moves = ''
 
-        # history
-        self.move_history = []
+        # castling: squares whose king or rook moving (or rook being captured) loses castling rights,
+        # and the rook move made for a king moving to each castling square
+        self.CASTLING_SQUARES = {60 : 'KQ', 63 : 'K', 56 : 'Q', 4 : 'kq', 7 : 'k', 0 : 'q'}
+        self.CASTLING_ROOK_MOVES = {62 : (63, 61), 58 : (56, 59), 6 : (7, 5), 2 : (0, 3)}
 
-        # attack tables for knights and kings
+        # history, packed moves
+        self.move_history = []
 
-        """
-        Kings, pawns* and knights move in very predictable ways. These lookup tables are pre-calculated with each square and possible squares piece can land on.
-        Finding actual moves is a matter of making 
-        """
-        self.KING_TABLE = {}
-        self.KNIGHT_TABLE = {}
-        self.RAYS = {}
-        
-        for sq in range(0, 64):
-            # each square key stores bitboard of attack set
-            self.KING_TABLE[sq] = 0
-            self.KNIGHT_TABLE[sq] = 0
-            
-    def FenToBitboards(self):
-        # bitboards setup
-        bbs = {'P':['0']*64, 'N':['0']*64, 'B':['0']*64, 'R':['0']*64, 'Q':['0']*64, 'K':['0']*64, 'p':['0']*64, 'n':['0']*64, 'b':['0']*64, 'r':['0']*64, 'q':['0']*64, 'k':['0']*64}
+        # one (move, captured_piece, captured_sq, captured_index, castling_rights, en_passant, ply, hash_key, attack_map)
+        # tuple per move made
+        self.undo_stack = []
 
-        # On start of game, parse fen string to setup starting bitboards
-        ranks = self.position_fen.split('/')
+        # zobrist key of the position, always a python int whatever the backend
+        self.hash_key = 0
 
-        sq = 0
+        # running evaluation totals, white's point of view, see evaluation
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
 
-        for rank in ranks:
-            if rank == '8':
-                sq += 8
-            else:
-                for file in rank:
-                    if file.isdigit():
-                        sq += int(file)
-                    else:
-                        bbs[file][sq] = '1'
-                        sq += 1
-                        
-        for p_type, bb in bbs.items():
-            binary = ''
-            for line in [bb[i:i+8] for i in range(0, 64, 8)]:
-                binary += ''.join(line)
+    def FenToBitboards(self):
+        # set the piece bitboards straight from the placement field of the FEN
+        bbs = ParsePlacement(self.position_fen)
 
-            bit_board = int(binary, 2)
+        self.SetPieceBitboards([bbs[piece] for piece in PIECES])
 
-            bit_board = np.uint64(bit_board)
+    def PieceBitboards(self):
+        # the twelve piece bitboards in PIECES order
+        return (self.white_pawns, self.white_knights, self.white_bishops, self.white_rooks, self.white_queen,
+                self.white_king, self.black_pawns, self.black_knights, self.black_bishops, self.black_rooks,
+                self.black_queen, self.black_king)
 
-            self.SetBitboard(p_type, bit_board)
+    def SetPieceBitboards(self, bbs):
+        (self.white_pawns, self.white_knights, self.white_bishops, self.white_rooks, self.white_queen, self.white_king,
+         self.black_pawns, self.black_knights, self.black_bishops, self.black_rooks, self.black_queen,
+         self.black_king) = [self.U64(bb) for bb in bbs]
 
     @staticmethod
     def ArrayToBitboard(array):
@@ -119,18 +189,62 @@ class Board:
             print(line)
 
     def SetBoard(self):
-        self.pieces = []
-        # for rendering
-        self.console_board = ['.'] * 64
-        piece_str = {self.white_pawns: 'P', self.white_knights: 'N', self.white_bishops: 'B',
-                          self.white_rooks: 'R', self.white_queen: 'Q', self.white_king: 'K', self.black_pawns: 'p',
-                          self.black_knights: 'n', self.black_bishops: 'b', self.black_rooks: 'r',
-                          self.black_queen: 'q', self.black_king: 'k'}
-
-        for bb, string in piece_str.items():
-            for sq in self.BBToSquares(bb):
-                self.console_board[sq] = string
-                self.pieces.append((string, sq))
+        # piece list and console board from the bitboards. The lists are refilled rather than replaced, so loading a
+        # new position into a Board doesn't allocate them again
+        if self.console_board is None:
+            self.console_board = ['.'] * 64
+        else:
+            self.console_board[:64] = EMPTY_BOARD
+
+        self.pieces.clear()
+        self.piece_list_index[:] = NO_PIECE_INDEXES
+
+        for piece, bb in zip(PIECES, self.PieceBitboards()):
+            for sq in Squares(int(bb)):
+                self.console_board[sq] = piece
+                self.piece_list_index[sq] = len(self.pieces)
+                self.pieces.append((piece, sq))
+
+        self.hash_key = self.ComputeHash()
+        self.mg_score, self.eg_score, self.phase = ComputeEvaluation(self)
+
+        self.attack_map = None
+
+    def GetAttackMap(self):
+        """
+        AttackMap of the position, worked out on the first call and kept until a move is made. The map of the
+        position before a move is kept on the undo stack, so it comes back with UnmakeMove
+        """
+        if self.attack_map is None:
+            self.attack_map = AttackMap([int(bb) for bb in self.PieceBitboards()])
+
+        return self.attack_map
+
+    def ComputeHash(self):
+        """
+        Zobrist key of the position from scratch. MakeMove keeps self.hash_key up to date with XORs, this is for setting
+        it up and for checking it in debug mode
+        """
+        key = 0
+
+        for piece, sq in self.pieces:
+            key ^= PIECE_KEYS[piece][sq]
+
+        if self.active_piece == 'b':
+            key ^= SIDE_KEY
+
+        key ^= CastlingKey(self.castling_rights)
+        key ^= EnPassantKey(self.en_passant)
+
+        return key
+
+    def CheckHash(self, move):
+        if self.hash_key != self.ComputeHash():
+            raise RuntimeError(f'Zobrist key out of sync with the position after {MoveToUci(move)}')
+
+    def CheckEvaluation(self, move):
+        if (self.mg_score, self.eg_score, self.phase) != ComputeEvaluation(self):
+            raise RuntimeError(f'Evaluation out of sync with the position after {MoveToUci(move)}')
 
     def PrintAllBitboards(self):
         for piece_type in ['R', 'N', 'B', 'Q', 'K', 'r', 'n', 'b', 'q', 'k', 'P', 'p']:
@@ -200,60 +314,97 @@ class Board:
             return self.black_bishops
 
     def ParseFen(self, full_fen):
-        self.position_fen, self.active_piece, self.castling_rights, self.en_passant, self.ply, self.moves = full_fen.split(
-            ' ')
+        """
+        Read the fields of a FEN, the placement is only stored here and turned into bitboards by FenToBitboards. The
+        halfmove clock and move number can be left out, as in EPD. Raises ValueError for malformed FENs
+        """
+        fields = full_fen.split()
 
-        self.ply = int(self.ply)
-        self.moves = int(self.moves)
+        if len(fields) == 4:
+            fields += ['0', '1']
+        elif len(fields) != 6:
+            raise ValueError(f'FEN has {len(fields)} fields, expected 4 or 6')
 
-    def SetUpBitboards(self):
-        # do not consider kings to prevent illegal captures
-        self.all_whites = self.white_pawns | self.white_rooks | self.white_bishops | self.white_queen | self.white_knights
-        self.all_blacks = self.black_pawns | self.black_rooks | self.black_bishops | self.black_queen | self.black_knights
+        position_fen, active_piece, castling_rights, en_passant, ply, moves = fields
 
-        # occupied means there's any piece on the square therefore kings considered
-        self.occupied = self.all_blacks | self.all_whites | self.black_king | self.white_king
-        # empty is inverse of occupied
-        self.empty = ~ self.occupied
+        if active_piece not in ('w', 'b'):
+            raise ValueError(f"side to move '{active_piece}' should be w or b")
 
-    def BBToSquares(self, bb):
+        if castling_rights != '-' and (len(set(castling_rights)) != len(castling_rights) or
+                                       not set(castling_rights) <= set('KQkq')):
+            raise ValueError(f"castling rights '{castling_rights}' should be - or some of KQkq")
 
-        bb = np.binary_repr(bb, width=64)
-        squares = []
+        if en_passant != '-' and (len(en_passant) != 2 or en_passant[0] not in 'abcdefgh' or en_passant[1] not in '36'):
+            raise ValueError(f"en-passant square '{en_passant}' should be - or on the third or sixth rank")
 
-        for rank_ind, line in enumerate([bb[i:i + 8] for i in range(0, 64, 8)]):
-            for file_ind, c in enumerate(line):
-                if c == '1':
-                    squares.append(8*rank_ind + file_ind)
+        self.ply = int(ply)
+        self.moves = int(moves)
+        self.position_fen, self.active_piece, self.castling_rights, self.en_passant = (position_fen, active_piece,
+                                                                                         castling_rights, en_passant)
 
-        return squares
+    def LoadFen(self, full_fen):
+        """
+        Set the board up from a FEN, replacing whatever position it had, so one Board can be reused for many
+        positions without allocating a new one
+        """
+        self.ParseFen(full_fen)
+        self.FenToBitboards()
+        self.SetUpBitboards()
+        self.SetBoard()
 
-    def SquareToBB(self, square):
-        binary = ['0']*64
-        bb = ''
+        self.undo_stack.clear()
+        self.move_history.clear()
+
+    def LoadPosition(self, bbs, active_piece, castling_rights, en_passant, ply, moves):
+        """
+        Set the board up from the twelve piece bitboards (in PIECES order) and the other FEN fields, without any FEN
+        parsing. Used to load the binary records of positionDatabase
+        """
+        self.SetPieceBitboards(bbs)
+        self.active_piece, self.castling_rights, self.en_passant, self.ply, self.moves = (active_piece, castling_rights,
+                                                                                        en_passant, ply, moves)
+        self.position_fen = ''
+
+        self.SetUpBitboards()
+        self.SetBoard()
+
+        self.undo_stack.clear()
+        self.move_history.clear()
+
+    def ToFen(self):
+        # the position as a FEN, LoadFen(board.ToFen()) gives back the same position
+        placement = '/'.join(''.join(self.console_board[sq:sq + 8]) for sq in range(0, 64, 8))
 
-        try:
-            binary[square] = '1'
-        except TypeError:
-            x = ord(square[0])-97
-            y = 8 - int(square[1])
+        for run, digit in EMPTY_RUNS:
+            placement = placement.replace(run, digit)
 
-            binary[8*y+x] = '1'
+        return f'{placement} {self.active_piece} {self.castling_rights} {self.en_passant} {self.ply} {self.moves}'
 
-        for rank in [binary[i:i+8] for i in range(0, 64, 8)]:
-            bb += ''.join(rank)
+    def SetUpBitboards(self):
+        # do not consider kings to prevent illegal captures
+        self.all_whites = self.white_pawns | self.white_rooks | self.white_bishops | self.white_queen | self.white_knights
+        self.all_blacks = self.black_pawns | self.black_rooks | self.black_bishops | self.black_queen | self.black_knights
 
-        bit_board = int(bb, 2)
+        # occupied means there's any piece on the square therefore kings considered
+        self.occupied = self.all_blacks | self.all_whites | self.black_king | self.white_king
+        # empty is inverse of occupied
+        self.empty = self.occupied ^ self.FULL
 
-        bit_board = np.uint64(bit_board)
+    def BBToSquares(self, bb):
+        # squares of all set bits, in ascending order
+        return Squares(int(bb))
 
-        return bit_board
+    def SquareToBB(self, square):
+        # square is a square number or an algebraic square like 'e4'
+        if isinstance(square, str):
+            square = 8 * (8 - int(square[1])) + ord(square[0]) - 97
 
+        return self.SQUARE_BBS[square]
 
     def IsSquareOccupied(self, square):
         square_mask = self.SquareToBB(square)
 
-        if square_mask & self.occupied == np.uint64(0):
+        if square_mask & self.occupied == 0:
             return False
         else:
             return True
@@ -275,68 +426,220 @@ class Board:
         self.black_pawns,
         self.empty]
 
+    @staticmethod
+    def SquareToAlgebraic(square):
+        return chr(97 + square % 8) + str(8 - square // 8)
+
+    def ToggleBitboards(self, piece, sq_bb):
+        # flip the square(s) in the piece's bitboard and in the combined bitboards, kings are not in all_whites/all_blacks
+        self.SetBitboard(piece, self.GetBitboard(piece) ^ sq_bb)
+
+        if piece == 'K' or piece == 'k':
+            pass
+        elif piece.isupper():
+            self.all_whites ^= sq_bb
+        else:
+            self.all_blacks ^= sq_bb
+
+        self.occupied ^= sq_bb
+
+    def AddPiece(self, piece, square, index=None):
+        """
+        Put a piece on an empty square. index is where to put it back in the piece list when undoing a capture, so the
+        piece list (and therefore move generation order) is exactly restored
+        """
+        self.ToggleBitboards(piece, self.SQUARE_BBS[square])
+        self.console_board[square] = piece
+        self.hash_key ^= PIECE_KEYS[piece][square]
+
+        self.mg_score += MG_SCORES[piece][square]
+        self.eg_score += EG_SCORES[piece][square]
+        self.phase += PIECE_PHASES[piece]
+
+        if index is None or index == len(self.pieces):
+            self.piece_list_index[square] = len(self.pieces)
+            self.pieces.append((piece, square))
+        else:
+            # move the piece that took this index to the end of the list
+            displaced = self.pieces[index]
+            self.piece_list_index[displaced[1]] = len(self.pieces)
+            self.pieces.append(displaced)
+
+            self.pieces[index] = (piece, square)
+            self.piece_list_index[square] = index
+
+    def RemovePiece(self, piece, square):
+        """
+        Take a piece off the board. The last piece in the piece list takes its place. Returns the index the piece had
+        """
+        self.ToggleBitboards(piece, self.SQUARE_BBS[square])
+        self.console_board[square] = '.'
+        self.hash_key ^= PIECE_KEYS[piece][square]
+
+        self.mg_score -= MG_SCORES[piece][square]
+        self.eg_score -= EG_SCORES[piece][square]
+        self.phase -= PIECE_PHASES[piece]
+
+        index = self.piece_list_index[square]
+        self.piece_list_index[square] = None
+
+        last = self.pieces.pop()
+
+        if index < len(self.pieces):
+            self.pieces[index] = last
+            self.piece_list_index[last[1]] = index
+
+        return index
+
+    def MovePiece(self, piece, initial_sq, final_sq, final_piece):
+        # final_piece differs from piece for promotions
+        if piece == final_piece:
+            self.ToggleBitboards(piece, self.SQUARE_BBS[initial_sq] | self.SQUARE_BBS[final_sq])
+        else:
+            self.ToggleBitboards(piece, self.SQUARE_BBS[initial_sq])
+            self.ToggleBitboards(final_piece, self.SQUARE_BBS[final_sq])
+
+        self.console_board[initial_sq] = '.'
+        self.console_board[final_sq] = final_piece
+        self.hash_key ^= PIECE_KEYS[piece][initial_sq] ^ PIECE_KEYS[final_piece][final_sq]
+
+        self.mg_score += MG_SCORES[final_piece][final_sq] - MG_SCORES[piece][initial_sq]
+        self.eg_score += EG_SCORES[final_piece][final_sq] - EG_SCORES[piece][initial_sq]
+
+        if piece != final_piece:
+            self.phase += PIECE_PHASES[final_piece] - PIECE_PHASES[piece]
+
+        index = self.piece_list_index[initial_sq]
+        self.piece_list_index[initial_sq] = None
+        self.piece_list_index[final_sq] = index
+        self.pieces[index] = (final_piece, final_sq)
+
+    def UpdateCastlingRights(self, initial_sq, final_sq):
+        # a king or rook leaving its square, or a rook being captured on its square, loses that castling right
+        for sq in (initial_sq, final_sq):
+            lost = self.CASTLING_SQUARES.get(sq)
+
+            if lost is not None:
+                for right in lost:
+                    if right in self.castling_rights:
+                        self.castling_rights = self.castling_rights.replace(right, '')
+                        self.hash_key ^= CASTLING_KEYS[right]
+
+        if self.castling_rights == '':
+            self.castling_rights = '-'
+
     def MakeMove(self, move):
-        piece, initial_sq, final_sq, move_type = move
+        """
+        Make a packed move (see moveEncoding), updating only the bitboards, console board and piece list entries it
+        touches. Everything needed to take it back is pushed onto the undo stack, see UnmakeMove
+        """
+        initial_sq = move & 63
+        final_sq = (move >> 6) & 63
+        piece = PIECES[(move >> 12) & 15]
+        final_piece = FINAL_PIECES[(move >> 12) & 127] # differs from piece for promotions
 
-        # remove piece from initial square
-        drag_piece_bitboard = self.GetBitboard(piece)
-        drag_piece_bitboard &= ~self.SquareToBB(initial_sq)
-        self.SetBitboard(piece, drag_piece_bitboard)
+        captured_sq = final_sq
+
+        if move & EN_PASSANT:
+            # the captured pawn is behind the final square
+            if piece == 'P':
+                captured_sq = final_sq + 8
+            else:
+                captured_sq = final_sq - 8
 
-        if self.console_board[final_sq] != '.':
+        captured_piece = self.console_board[captured_sq]
+
+        captured_index = None
+        hash_key = self.hash_key
+
+        if captured_piece != '.':
             # remove captured piece from final square
-            captured_piece = self.console_board[final_sq]
-            captured_piece_bitboard = self.GetBitboard(captured_piece)
-            captured_piece_bitboard &= ~self.SquareToBB(final_sq)
-            self.SetBitboard(captured_piece, captured_piece_bitboard)
+            captured_index = self.RemovePiece(captured_piece, captured_sq)
+
+        self.undo_stack.append((move, captured_piece, captured_sq, captured_index, self.castling_rights, self.en_passant, self.ply, hash_key, self.attack_map))
+        self.attack_map = None
+
+        self.MovePiece(piece, initial_sq, final_sq, final_piece)
+
+        if move & CASTLE:
+            # move the rook over the king
+            rook_initial_sq, rook_final_sq = self.CASTLING_ROOK_MOVES[final_sq]
+            self.MovePiece(self.console_board[rook_initial_sq], rook_initial_sq, rook_final_sq, self.console_board[rook_initial_sq])
+
+        if self.castling_rights != '-':
+            self.UpdateCastlingRights(initial_sq, final_sq)
+
+        self.hash_key ^= EnPassantKey(self.en_passant)
+
+        if move & DOUBLE_PUSH:
+            # en-passant target is the square the pawn skipped
+            self.en_passant = self.SquareToAlgebraic((initial_sq + final_sq) // 2)
+            self.hash_key ^= EnPassantKey(self.en_passant)
+        else:
+            self.en_passant = '-'
+
+        if piece == 'P' or piece == 'p' or captured_piece != '.':
+            self.ply = 0
+        else:
+            self.ply += 1
 
+        if self.active_piece == 'w':
+            self.active_piece = 'b'
         else:
-            if move_type == 'EP' and piece in ['P', 'p']:
-                # en-passant capture
-
-                captured_piece = ''
-                captured_final_square = 0
-
-                if piece == 'P':
-                    # white pawn performs EP capture, black pawn is below final square
-                    captured_piece = self.console_board[final_sq + 8]
-                    captured_final_square = final_sq + 8
-
-                elif piece == 'p':
-                    # black pawn performs EP capture, white pawn is above final square
-                    captured_piece = self.console_board[final_sq - 8]
-                    captured_final_square = final_sq - 8
-
-                captured_piece_bitboard = self.GetBitboard(captured_piece)
-                captured_piece_bitboard &= ~self.SquareToBB(captured_final_square)
-                self.SetBitboard(captured_piece, captured_piece_bitboard)
-
-        if move_type != '_' and move_type != 'EP':
-            # promotion
-            promotion_piece_bitboard = self.GetBitboard(move_type)
-            promotion_piece_bitboard |= self.SquareToBB(final_sq)
-            self.SetBitboard(move_type, promotion_piece_bitboard)
-
-        if move_type == '_' or move_type == 'EP':
-            # move piece to final square in its bitboard
-            drag_piece_bitboard = self.GetBitboard(piece)
-            drag_piece_bitboard |= self.SquareToBB(final_sq)
-            self.SetBitboard(piece, drag_piece_bitboard)
+            self.active_piece = 'w'
+            self.moves += 1
+
+        self.hash_key ^= SIDE_KEY
+
+        self.empty = self.occupied ^ self.FULL
 
         self.move_history.append(move)
 
-        # after move is made, bitboards have changed, so update all bitboard variables. 
-        # update ascii board, this is used for rendering
-        self.SetUpBitboards()
-        self.SetBoard()
+        if self.debug:
+            self.CheckHash(move)
+            self.CheckEvaluation(move)
+
+    def UnmakeMove(self):
+        """
+        Take back the last move made with MakeMove
+        """
+        (move, captured_piece, captured_sq, captured_index, self.castling_rights, self.en_passant, self.ply, hash_key,
+         self.attack_map) = self.undo_stack.pop()
+        initial_sq = move & 63
+        final_sq = (move >> 6) & 63
+        piece = PIECES[(move >> 12) & 15]
+        final_piece = FINAL_PIECES[(move >> 12) & 127]
+
+        self.move_history.pop()
+
+        if self.active_piece == 'w':
+            self.active_piece = 'b'
+            self.moves -= 1
+        else:
+            self.active_piece = 'w'
+
+        if move & CASTLE:
+            rook_initial_sq, rook_final_sq = self.CASTLING_ROOK_MOVES[final_sq]
+            self.MovePiece(self.console_board[rook_final_sq], rook_final_sq, rook_initial_sq, self.console_board[rook_final_sq])
+
+        self.MovePiece(final_piece, final_sq, initial_sq, piece)
+
+        if captured_piece != '.':
+            self.AddPiece(captured_piece, captured_sq, captured_index)
+
+        # the piece moves above XOR the key back as well, but castling, en-passant and side keys are simplest restored whole
+        self.hash_key = hash_key
+
+        self.empty = self.occupied ^ self.FULL
+
+        if self.debug:
+            self.CheckHash(move)
+            self.CheckEvaluation(move)
         
 
 if __name__=='__main__':
     board = Board()
-    board.ParseFen('R7/8/5rk1/5p2/7P/1p3KP1/P7/8 b - - 0 0')
-    board.FenToBitboards()
-    board.SetBoard()
-    board.SetUpBitboards()
+    board.LoadFen('R7/8/5rk1/5p2/7P/1p3KP1/P7/8 b - - 0 0')
 
     board.PrintBoard()
 
@@ -0,0 +1,387 @@
+"""
+Tapered material and piece-square table evaluation.
+
+Every piece on a square is worth a middlegame and an endgame score (material plus piece-square bonus). The two totals
+are blended by the game phase, worked out from the remaining knights, bishops, rooks and queens, so a king heads for
+the centre as the pieces come off.
+
+Board keeps the totals up to date as pieces are added, removed and moved (mg_score, eg_score and phase), so they cost
+nothing to evaluate. ComputeEvaluation works them out from scratch, to check the incremental ones.
+
+Mobility (squares attacked by each side's knights, bishops, rooks and queens that aren't its own pieces) and attacks on
+the squares next to each king are read off the position's AttackMap (Board.GetAttackMap), which move generation and
+SEE use too, so a node works its attacks out once.
+
+Pawn structure (doubled, isolated, backward and passed pawns, and the pawn shields in front of a castled king) only
+depends on where the pawns are, so PawnStructure works it out from the two pawn bitboards alone and a PawnHashTable
+(pawnHashTable.py) can keep the result for the next position with the same pawns.
+
+The values are the PeSTO tables (Ronald Friederich). Tables are laid out as seen from white's side, a8 first, which is
+Board's square numbering, so white pieces index them directly and black pieces by the square mirrored vertically.
+"""
+
+from attackTables import KING_ATTACKS
+from bitOperations import FULL, PopCount
+
+MG_VALUES = {'P' : 82, 'N' : 337, 'B' : 365, 'R' : 477, 'Q' : 1025, 'K' : 0}
+EG_VALUES = {'P' : 94, 'N' : 281, 'B' : 297, 'R' : 512, 'Q' : 936, 'K' : 0}
+
+# pawn structure (middlegame, endgame)
+DOUBLED_PAWN = (-10, -20) # per pawn more than one on a file
+ISOLATED_PAWN = (-10, -15)
+BACKWARD_PAWN = (-8, -10) # can't be supported by a neighbour and can't safely step forward
+
+# by rank counted from the pawn's own side, index 1 is the second rank
+PASSED_PAWN_MG = (0, 5, 10, 15, 30, 50, 80, 0)
+PASSED_PAWN_EG = (0, 10, 15, 25, 50, 90, 140, 0)
+
+# middlegame only, per pawn on the second and third rank in front of a king on the queen or king side (files a-c or
+# f-h) of its first two ranks
+SHIELD_PAWN = (12, 6)
+
+# (middlegame, endgame) per attacked square that isn't one of the side's own pieces, squares attacked by more than one
+# piece of a type only count once
+MOBILITY_WEIGHTS = {'N' : (4, 4), 'B' : (5, 5), 'R' : (2, 4), 'Q' : (1, 2)}
+
+KING_ZONE_ATTACK = (-7, 0) # per square next to the king the enemy attacks
+
+PHASE_WEIGHTS = {'P' : 0, 'N' : 1, 'B' : 1, 'R' : 2, 'Q' : 4, 'K' : 0}
+MAX_PHASE = 24 # all pieces on the board
+
+MG_PST = {
+    'P' : (
+          0,   0,   0,   0,   0,   0,   0,   0,
+         98, 134,  61,  95,  68, 126,  34, -11,
+         -6,   7,  26,  31,  65,  56,  25, -20,
+        -14,  13,   6,  21,  23,  12,  17, -23,
+        -27,  -2,  -5,  12,  17,   6,  10, -25,
+        -26,  -4,  -4, -10,   3,   3,  33, -12,
+        -35,  -1, -20, -23, -15,  24,  38, -22,
+          0,   0,   0,   0,   0,   0,   0,   0),
+    'N' : (
+        -167, -89, -34, -49,  61, -97, -15, -107,
+         -73, -41,  72,  36,  23,  62,   7,  -17,
+         -47,  60,  37,  65,  84, 129,  73,   44,
+          -9,  17,  19,  53,  37,  69,  18,   22,
+         -13,   4,  16,  13,  28,  19,  21,   -8,
+         -23,  -9,  12,  10,  19,  17,  25,  -16,
+         -29, -53, -12,  -3,  -1,  18, -14,  -19,
+        -105, -21, -58, -33, -17, -28, -19,  -23),
+    'B' : (
+        -29,   4, -82, -37, -25, -42,   7,  -8,
+        -26,  16, -18, -13,  30,  59,  18, -47,
+        -16,  37,  43,  40,  35,  50,  37,  -2,
+         -4,   5,  19,  50,  37,  37,   7,  -2,
+         -6,  13,  13,  26,  34,  12,  10,   4,
+          0,  15,  15,  15,  14,  27,  18,  10,
+          4,  15,  16,   0,   7,  21,  33,   1,
+        -33,  -3, -14, -21, -13, -12, -39, -21),
+    'R' : (
+         32,  42,  32,  51,  63,   9,  31,  43,
+         27,  32,  58,  62,  80,  67,  26,  44,
+         -5,  19,  26,  36,  17,  45,  61,  16,
+        -24, -11,   7,  26,  24,  35,  -8, -20,
+        -36, -26, -12,  -1,   9,  -7,   6, -23,
+        -45, -25, -16, -17,   3,   0,  -5, -33,
+        -44, -16, -20,  -9,  -1,  11,  -6, -71,
+        -19, -13,   1,  17,  16,   7, -37, -26),
+    'Q' : (
+        -28,   0,  29,  12,  59,  44,  43,  45,
+        -24, -39,  -5,   1, -16,  57,  28,  54,
+        -13, -17,   7,   8,  29,  56,  47,  57,
+        -27, -27, -16, -16,  -1,  17,  -2,   1,
+         -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+        -14,   2, -11,  -2,  -5,   2,  14,   5,
+        -35,  -8,  11,   2,   8,  15,  -3,   1,
+         -1, -18,  -9,  10, -15, -25, -31, -50),
+    'K' : (
+        -65,  23,  16, -15, -56, -34,   2,  13,
+         29,  -1, -20,  -7,  -8,  -4, -38, -29,
+         -9,  24,   2, -16, -20,   6,  22, -22,
+        -17, -20, -12, -27, -30, -25, -14, -36,
+        -49,  -1, -27, -39, -46, -44, -33, -51,
+        -14, -14, -22, -46, -44, -30, -15, -27,
+          1,   7,  -8, -64, -43, -16,   9,   8,
+        -15,  36,  12, -54,   8, -28,  24,  14),
+}
+
+EG_PST = {
+    'P' : (
+          0,   0,   0,   0,   0,   0,   0,   0,
+        178, 173, 158, 134, 147, 132, 165, 187,
+         94, 100,  85,  67,  56,  53,  82,  84,
+         32,  24,  13,   5,  -2,   4,  17,  17,
+         13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+          4,   7,  -6,   1,   0,  -5,  -1,  -8,
+         13,   8,   8,  10,  13,   0,   2,  -7,
+          0,   0,   0,   0,   0,   0,   0,   0),
+    'N' : (
+        -58, -38, -13, -28, -31, -27, -63, -99,
+        -25,  -8, -25,  -2,  -9, -25, -24, -52,
+        -24, -20,  10,   9,  -1,  -9, -19, -41,
+        -17,   3,  22,  22,  22,  11,   8, -18,
+        -18,  -6,  16,  25,  16,  17,   4, -18,
+        -23,  -3,  -1,  15,  10,  -3, -20, -22,
+        -42, -20, -10,  -5,  -2, -20, -23, -44,
+        -29, -51, -23, -15, -22, -18, -50, -64),
+    'B' : (
+        -14, -21, -11,  -8,  -7,  -9, -17, -24,
+         -8,  -4,   7, -12,  -3, -13,  -4, -14,
+          2,  -8,   0,  -1,  -2,   6,   0,   4,
+         -3,   9,  12,   9,  14,  10,   3,   2,
+         -6,   3,  13,  19,   7,  10,  -3,  -9,
+        -12,  -3,   8,  10,  13,   3,  -7, -15,
+        -14, -18,  -7,  -1,   4,  -9, -15, -27,
+        -23,  -9, -23,  -5,  -9, -16,  -5, -17),
+    'R' : (
+         13,  10,  18,  15,  12,  12,   8,   5,
+         11,  13,  13,  11,  -3,   3,   8,   3,
+          7,   7,   7,   5,   4,  -3,  -5,  -3,
+          4,   3,  13,   1,   2,   1,  -1,   2,
+          3,   5,   8,   4,  -5,  -6,  -8, -11,
+         -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+         -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+         -9,   2,   3,  -1,  -5, -13,   4, -20),
+    'Q' : (
+         -9,  22,  22,  27,  27,  19,  10,  20,
+        -17,  20,  32,  41,  58,  25,  30,   0,
+        -20,   6,   9,  49,  47,  35,  19,   9,
+          3,  22,  24,  45,  57,  40,  57,  36,
+        -18,  28,  19,  47,  31,  34,  39,  23,
+        -16, -27,  15,   6,   9,  17,  10,   5,
+        -22, -23, -30, -16, -16, -23, -36, -32,
+        -33, -28, -22, -43,  -5, -32, -20, -41),
+    'K' : (
+        -74, -35, -18, -18, -11,  15,   4, -17,
+        -12,  17,  14,  17,  17,  38,  23,  11,
+         10,  17,  23,  15,  20,  45,  44,  13,
+         -8,  22,  24,  27,  26,  33,  26,   3,
+        -18,  -4,  21,  24,  27,  23,   9, -11,
+        -19,  -3,  11,  21,  23,  16,   7,  -9,
+        -27, -11,   4,  13,  14,   4,  -5, -17,
+        -53, -34, -21, -11, -28, -14, -24, -43),
+}
+
+
+def BuildScoreTables():
+    """
+    MG_SCORES[piece][square] and EG_SCORES[piece][square]: material plus piece-square bonus, from white's point of
+    view (black pieces score negative)
+    """
+    mg_scores, eg_scores = {}, {}
+
+    for piece in 'PNBRQK':
+        mg_scores[piece] = [MG_VALUES[piece] + MG_PST[piece][sq] for sq in range(64)]
+        eg_scores[piece] = [EG_VALUES[piece] + EG_PST[piece][sq] for sq in range(64)]
+
+        # sq ^ 56 mirrors the square vertically
+        mg_scores[piece.lower()] = [-(MG_VALUES[piece] + MG_PST[piece][sq ^ 56]) for sq in range(64)]
+        eg_scores[piece.lower()] = [-(EG_VALUES[piece] + EG_PST[piece][sq ^ 56]) for sq in range(64)]
+
+    return mg_scores, eg_scores
+
+
+MG_SCORES, EG_SCORES = BuildScoreTables()
+
+PIECE_PHASES = {piece : PHASE_WEIGHTS[piece.upper()] for piece in 'PNBRQKpnbrqk'}
+
+
+NOT_A_FILE = 0x7F7F7F7F7F7F7F7F
+NOT_H_FILE = 0xFEFEFEFEFEFEFEFE
+RANK_1 = 0xFF
+
+# shield squares by side, then wing (queen side, king side)
+QUEENSIDE = 0xE0E0E0E0E0E0E0E0
+KINGSIDE = 0x0707070707070707
+SHIELD_RANKS = (((0xFF << 8) & QUEENSIDE, (0xFF << 16) & QUEENSIDE, (0xFF << 8) & KINGSIDE, (0xFF << 16) & KINGSIDE),
+                ((0xFF << 48) & QUEENSIDE, (0xFF << 40) & QUEENSIDE, (0xFF << 48) & KINGSIDE, (0xFF << 40) & KINGSIDE))
+
+# wing of each file, a file first, None for the centre files which have no shield
+WING_OF_FILE = (0, 0, 0, None, None, 1, 1, 1)
+
+
+def FileFill(bb):
+    # every square on a file with a set bit in bb
+    for shift in (8, 16, 32):
+        bb |= (bb << shift) | (bb >> shift)
+
+    return bb & FULL
+
+
+def NorthFill(bb):
+    # bb and every square in front of it from white's side
+    for shift in (8, 16, 32):
+        bb |= bb << shift
+
+    return bb & FULL
+
+
+def SouthFill(bb):
+    for shift in (8, 16, 32):
+        bb |= bb >> shift
+
+    return bb
+
+
+def Neighbours(bb):
+    # squares one file either side of bb
+    return ((bb << 1) & NOT_H_FILE) | ((bb >> 1) & NOT_A_FILE)
+
+
+def PawnStructure(white_pawns, black_pawns):
+    """
+    Pawn terms of the position with these pawns (python ints), as
+        (middlegame score, endgame score, shields, white passed pawns, black passed pawns, white pawn attacks,
+         black pawn attacks)
+    Scores are from white's point of view. The king shields depend on where the kings are, so shields holds the score
+    of every wing packed a byte each (white queen side, white king side, black queen side, black king side) for
+    KingShields to pick from
+    """
+    white_attacks = ((white_pawns << 9) & NOT_H_FILE | (white_pawns << 7) & NOT_A_FILE) & FULL
+    black_attacks = (black_pawns >> 7) & NOT_H_FILE | (black_pawns >> 9) & NOT_A_FILE
+
+    # squares in front of each side's pawns and on the files next to them, where an enemy pawn is not passed
+    white_span = NorthFill(white_pawns << 8)
+    white_span |= Neighbours(white_span)
+    black_span = SouthFill(black_pawns >> 8)
+    black_span |= Neighbours(black_span)
+
+    white_passed = white_pawns & ~black_span
+    black_passed = black_pawns & ~white_span
+
+    mg, eg = 0, 0
+
+    for pawns, neighbour_span, stop_attacks, sign in (
+            (white_pawns, NorthFill(Neighbours(white_pawns)), black_attacks >> 8, 1),
+            (black_pawns, SouthFill(Neighbours(black_pawns)), (white_attacks << 8) & FULL, -1)):
+        files = FileFill(pawns)
+        doubled = PopCount(pawns) - PopCount(files & RANK_1)
+        isolated = pawns & ~Neighbours(files)
+
+        # no pawn beside or behind on the next files to come up in support, and the square in front is attacked
+        backward = pawns & ~neighbour_span & ~isolated & stop_attacks
+
+        for count, (term_mg, term_eg) in ((doubled, DOUBLED_PAWN), (PopCount(isolated), ISOLATED_PAWN),
+                                          (PopCount(backward), BACKWARD_PAWN)):
+            mg += sign * count * term_mg
+            eg += sign * count * term_eg
+
+    passed = white_passed
+
+    while passed:
+        bit = passed.bit_length() - 1
+        passed ^= 1 << bit
+        mg += PASSED_PAWN_MG[bit >> 3]
+        eg += PASSED_PAWN_EG[bit >> 3]
+
+    passed = black_passed
+
+    while passed:
+        bit = passed.bit_length() - 1
+        passed ^= 1 << bit
+        mg -= PASSED_PAWN_MG[7 - (bit >> 3)]
+        eg -= PASSED_PAWN_EG[7 - (bit >> 3)]
+
+    shields = 0
+
+    for side, pawns in enumerate((white_pawns, black_pawns)):
+        for wing in range(2):
+            second_rank, third_rank = SHIELD_RANKS[side][2 * wing:2 * wing + 2]
+            score = PopCount(pawns & second_rank) * SHIELD_PAWN[0] + PopCount(pawns & third_rank) * SHIELD_PAWN[1]
+            shields |= score << (8 * (2 * side + wing))
+
+    return mg, eg, shields, white_passed, black_passed, white_attacks, black_attacks
+
+
+def KingShields(shields, white_king, black_king):
+    """
+    Middlegame score from white's point of view of the pawns in front of each king, shields as from PawnStructure
+    """
+    score = 0
+    bit = white_king.bit_length() - 1
+
+    # on its first two ranks
+    if bit < 16:
+        wing = WING_OF_FILE[7 - (bit & 7)]
+
+        if wing is not None:
+            score += (shields >> (8 * wing)) & 0xFF
+
+    bit = black_king.bit_length() - 1
+
+    if bit >= 48:
+        wing = WING_OF_FILE[7 - (bit & 7)]
+
+        if wing is not None:
+            score -= (shields >> (8 * (2 + wing))) & 0xFF
+
+    return score
+
+
+def AttackScores(attack_map):
+    """
+    (middlegame, endgame) mobility and king zone attack scores of an AttackMap, from white's point of view
+    """
+    mg, eg = 0, 0
+    by_piece = attack_map.by_piece
+
+    for side, sign in ((0, 1), (1, -1)):
+        offset = 6 * side
+        own = attack_map.pieces[side]
+
+        for index, piece in enumerate('NBRQ', 1):
+            count = sign * PopCount(by_piece[offset + index] & ~own)
+            mg += count * MOBILITY_WEIGHTS[piece][0]
+            eg += count * MOBILITY_WEIGHTS[piece][1]
+
+        king = attack_map.bitboards[offset + 5]
+
+        if king:
+            count = sign * PopCount(KING_ATTACKS[64 - king.bit_length()] & attack_map.attacked[1 - side])
+            mg += count * KING_ZONE_ATTACK[0]
+            eg += count * KING_ZONE_ATTACK[1]
+
+    return mg, eg
+
+
+def ComputeEvaluation(board):
+    """
+    (middlegame score, endgame score, phase) of the position from scratch
+    """
+    mg_score, eg_score, phase = 0, 0, 0
+
+    for piece, square in board.pieces:
+        mg_score += MG_SCORES[piece][square]
+        eg_score += EG_SCORES[piece][square]
+        phase += PIECE_PHASES[piece]
+
+    return mg_score, eg_score, phase
+
+
+def Evaluate(board, pawn_table=None):
+    """
+    Score of the position in centipawns, from the side to move's point of view. The pawn structure is looked up in
+    pawn_table (a PawnHashTable) if one is given, otherwise worked out
+    """
+    attack_map = board.GetAttackMap()
+    bitboards = attack_map.bitboards
+
+    if pawn_table is None:
+        pawn_mg, pawn_eg, shields = PawnStructure(bitboards[0], bitboards[6])[:3]
+    else:
+        pawn_mg, pawn_eg, shields = pawn_table.Probe(bitboards[0], bitboards[6])[:3]
+
+    attack_mg, attack_eg = AttackScores(attack_map)
+
+    mg_score = board.mg_score + pawn_mg + KingShields(shields, bitboards[5], bitboards[11]) + attack_mg
+    eg_score = board.eg_score + pawn_eg + attack_eg
+
+    # phase can go over the maximum after promotions
+    phase = min(board.phase, MAX_PHASE)
+    score = mg_score * phase + eg_score * (MAX_PHASE - phase)
+
+    # turned round before dividing, so a position and its colour-flipped mirror get exactly the same score
+    if board.active_piece == 'b':
+        score = -score
+
+    return score // MAX_PHASE
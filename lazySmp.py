@@ -0,0 +1,173 @@
+"""
+Lazy SMP: several processes search the same position at the same time and share one transposition table in shared
+memory (see SharedTranspositionTable). They don't split the work between them. Each one fills the table with results
+the others pick up as hash moves and cutoffs, so between them they get deeper than one process would in the same time.
+
+Worker 0 is the main search and runs with the given limits. The helpers skip some iteration depths, each in a different
+pattern, so they are spread over the depths around the main search instead of all searching the same tree in lockstep.
+They search until the main search finishes, then all are stopped and the best result is taken.
+
+Workers are started once and kept for every search, since starting a process and attaching to the table costs far
+more than a short search.
+"""
+import multiprocessing
+import queue
+
+from classicalBitboard import Board
+from moveEncoding import MAX_PLY
+from search import Search, SearchResult
+from transpositionTable import SharedTranspositionTable
+
+# helper i skips the depths where ((depth + SKIP_PHASE[i]) // SKIP_SIZE[i]) is odd (the pattern Stockfish used)
+SKIP_SIZE = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE = (0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6, 7)
+
+
+class HelperSearch(Search):
+    def __init__(self, board, tt, helper_index):
+        super().__init__(board, tt)
+        self.helper_index = helper_index
+
+    def IterationDepths(self, max_depth):
+        i = (self.helper_index - 1) % len(SKIP_SIZE)
+        depths = [depth for depth in range(1, max_depth + 1) if ((depth + SKIP_PHASE[i]) // SKIP_SIZE[i]) % 2 == 0]
+
+        # always finish on max_depth, a helper limited by depth shouldn't stop short of the main search
+        if not depths or depths[-1] != max_depth:
+            depths.append(max_depth)
+
+        return depths
+
+
+def SetUpBoard(fen, moves, backend):
+    board = Board(backend)
+    board.LoadFen(fen)
+
+    # the moves are made rather than just setting up the final position, so repetitions of earlier positions are seen
+    for move in moves:
+        board.MakeMove(move)
+
+    return board
+
+
+def SearchWorker(index, tt_name, size_mb, backend, commands, results, stop_event):
+    """
+    Worker process: searches each (fen, moves, depth, nodes, movetime) command it is sent and puts ('done', index,
+    SearchResult) on results, until it gets None. The main worker (index 0) also puts ('info', 0, SearchResult) after
+    each iteration
+    """
+    tt = SharedTranspositionTable(size_mb, name=tt_name)
+
+    try:
+        while True:
+            command = commands.get()
+
+            if command is None:
+                break
+
+            fen, moves, depth, nodes, movetime = command
+            board = SetUpBoard(fen, moves, backend)
+
+            if index == 0:
+                search = Search(board, tt)
+                report = lambda result: results.put(('info', index, result))
+            else:
+                search = HelperSearch(board, tt, index)
+                report = None
+
+            search.stop_event = stop_event
+            results.put(('done', index, search.Think(depth, nodes, movetime, report)))
+    finally:
+        tt.Close()
+
+
+class LazySmp:
+    """
+    Searches with workers processes sharing a size_mb transposition table. Call Close (or use it in a with block) to
+    stop the workers and free the table
+    """
+    def __init__(self, workers=None, size_mb=16, backend='int'):
+        self.number_of_workers = workers or multiprocessing.cpu_count()
+        self.tt = SharedTranspositionTable(size_mb)
+
+        self.stop_event = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.commands = [multiprocessing.Queue() for _ in range(self.number_of_workers)]
+
+        self.processes = [multiprocessing.Process(target=SearchWorker, daemon=True,
+                                                  args=(index, self.tt.name, size_mb, backend, commands, self.results,
+                                                        self.stop_event))
+                          for index, commands in enumerate(self.commands)]
+
+        for process in self.processes:
+            process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    def Stop(self):
+        # can be called from another thread, the workers stop at their next limit check. Called between searches it
+        # stops the next one straight away
+        self.stop_event.set()
+
+    def Think(self, fen, moves=(), depth=None, nodes=None, movetime=None, report=None):
+        """
+        Search the position reached by playing the packed moves from fen, with the same limits as Search.Think, which
+        apply to the main worker. report is called with the main worker's SearchResult after each iteration.
+        Returns the SearchResult with the deepest completed iteration of any worker, the main worker's on a tie, with
+        nodes counted over all workers
+        """
+        if depth is None and nodes is None and movetime is None:
+            raise ValueError('Search needs a depth, node or time limit')
+
+        for index, commands in enumerate(self.commands):
+            if index == 0:
+                commands.put((fen, tuple(moves), depth, nodes, movetime))
+            else:
+                # helpers only stop when the main worker is done
+                commands.put((fen, tuple(moves), depth if depth is not None else MAX_PLY - 1, None, None))
+
+        finished = {}
+
+        while len(finished) < self.number_of_workers:
+            try:
+                kind, index, result = self.results.get(timeout=0.1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.processes):
+                    self.stop_event.set()
+                    raise RuntimeError('A search worker exited during the search')
+
+                continue
+
+            if kind == 'info':
+                if report is not None:
+                    report(result)
+            else:
+                finished[index] = result
+
+                if index == 0:
+                    self.stop_event.set()
+
+        # cleared once every worker is done rather than at the start, so a Stop sent before the search gets going
+        # still stops it
+        self.stop_event.clear()
+
+        best = max(finished.items(), key=lambda item: (item[1].depth, -item[0]))[1]
+
+        return SearchResult(best.best_move, best.score, best.pv, best.depth,
+                            sum(result.nodes for result in finished.values()), finished[0].seconds)
+
+    def Close(self):
+        self.stop_event.set()
+
+        for commands in self.commands:
+            commands.put(None)
+
+        for process in self.processes:
+            process.join()
+
+        self.tt.Close()
+        self.tt.Unlink()
@@ -0,0 +1,259 @@
+"""
+Magic bitboards for sliding piece attacks.
+
+For each square, the squares that can block a bishop or rook (the relevant occupancy mask, which leaves out the board
+edges) are multiplied by a 'magic' number. The top bits of the product form a perfect hash of the blockers, which
+indexes a table of precomputed attack sets. An attack lookup is then an AND, a multiply, a shift and a list index.
+
+Squares are numbered as on Board: square 0 is a8 and is the most significant bit, square 63 is h1 and is bit 0.
+The magics below were found for this layout with FindMagics(seed=MAGIC_SEED), run this module to find them again, or
+with --verify to check every table entry against a ray walk.
+The tables are built on first import and cached on disk, see tableCache.
+"""
+import argparse
+import random
+
+from tableCache import CacheKey, LoadTable
+
+FULL = 0xFFFFFFFFFFFFFFFF
+
+MAGIC_SEED = 1111
+
+# (file step, rank step), rank step is +1 towards rank 1, same as square numbers
+BISHOP_DIRECTIONS = ((1, -1), (-1, -1), (1, 1), (-1, 1))
+ROOK_DIRECTIONS = ((0, -1), (1, 0), (-1, 0), (0, 1))
+
+BISHOP_MAGICS = [
+    0x0020025C18088010, 0x0200220810210050, 0x0800000810018200, 0x2228002020204100,
+    0x0100040000420200, 0x8004A00020841000, 0x001201040201048A, 0x8048928888201014,
+    0x0920020429002000, 0x0442040104110012, 0x89A9200421021000, 0x004A412821044200,
+    0x1280201104880882, 0x0004011090900020, 0x0804310802100100, 0x8004410820120008,
+    0x0404C48202001042, 0x0002489A04022080, 0x0140210040800101, 0x9000410214012200,
+    0x8008110411000804, 0x2001002101085008, 0x4204010190040800, 0x00010402C1002008,
+    0x001410821008804C, 0x0004081042020120, 0x0018500240408800, 0x0801020200140104,
+    0x0020020080880080, 0x8804044400080028, 0x1581482002088100, 0x2010101000492200,
+    0x0000520484490400, 0x08010A0029080104, 0x0400490036010102, 0x0001004004004040,
+    0x8081080001004300, 0x0000900202002600, 0x0008080404010840, 0x0050406448020C80,
+    0x1002000021010809, 0x4004000A2C824801, 0x1400400808080440, 0x0108200402080103,
+    0x4408000082004080, 0x0104020E08220200, 0x4005002001020202, 0x1440153404041469,
+    0x426104410098A008, 0x0840009410021100, 0x1008482444200400, 0x00400D1040C80008,
+    0x0420040400840000, 0x00041081020C2440, 0x0048081828008224, 0x2000090810008200,
+    0x8000110108224000, 0x2010442444402300, 0x0002021004580002, 0x2004042000041000,
+    0x1004040695000A40, 0xA008220400280009, 0x22200802004050CA, 0x0002200200810B00,
+]
+
+ROOK_MAGICS = [
+    0x00008A2900C40882, 0x2010408110280214, 0x0802000804100102, 0x8402012088100402,
+    0xA0862101280C9001, 0x2000102000090241, 0x022106014020B282, 0x0011148000422105,
+    0x0001000092004100, 0x0104010208700400, 0x8034000480020080, 0x0104018005080080,
+    0x0081000810022500, 0x0400182001024100, 0x0008882209004200, 0xB000822055020200,
+    0x0609000040810002, 0x0800040200010100, 0x0002020004008080, 0x3043000800050011,
+    0x4080080010008080, 0x4011004020010014, 0x8020004000208080, 0x0000802040108000,
+    0x10C1104286000C11, 0x0400011004000882, 0x0041000823000400, 0x6108008048800400,
+    0x0000800800801000, 0xB010002000808010, 0x0050004000402002, 0x5200804202002100,
+    0x00180982003300C4, 0x1400040101000200, 0x8402040080800200, 0x0000040080080080,
+    0x0018002101001000, 0x0008150100200041, 0x4810004040002000, 0x0000400380028064,
+    0x0208020011004094, 0x0000240011180250, 0x4046008080040002, 0x0A00050008001100,
+    0xA800828050000800, 0x8021010040102000, 0x0410210040008100, 0x044000800A4382A0,
+    0x0002000220408104, 0x0001000200040100, 0x2144808004000200, 0x0000808008000400,
+    0x2002001202082040, 0x0080801000802000, 0x2820804000200084, 0x68218001C0008024,
+    0x01000A0084472900, 0x1080010000800200, 0xA100080100040002, 0x0A00020010082004,
+    0x0100040900201000, 0x0100082000104104, 0x0040400010002000, 0x0080002080400014,
+]
+
+
+def SquareBB(square):
+    return 1 << (63 - square)
+
+
+def SlidingAttacks(square, occupancy, directions):
+    """
+    Attack set of a slider on square, walking each direction until the edge of the board or the first blocker,
+    which is included in the attack set
+    """
+    attacks = 0
+    file, rank = square % 8, square // 8
+
+    for file_step, rank_step in directions:
+        f, r = file + file_step, rank + rank_step
+
+        while 0 <= f < 8 and 0 <= r < 8:
+            sq_bb = SquareBB(8 * r + f)
+            attacks |= sq_bb
+
+            if occupancy & sq_bb:
+                break
+
+            f, r = f + file_step, r + rank_step
+
+    return attacks
+
+
+def RelevantMask(square, directions):
+    """
+    Squares whose occupancy changes the attack set. The last square in each direction never does, it is attacked
+    whether or not it's occupied
+    """
+    mask = 0
+    file, rank = square % 8, square // 8
+
+    for file_step, rank_step in directions:
+        f, r = file + file_step, rank + rank_step
+
+        while 0 <= f + file_step < 8 and 0 <= r + rank_step < 8:
+            mask |= SquareBB(8 * r + f)
+            f, r = f + file_step, r + rank_step
+
+    return mask
+
+
+def Subsets(mask):
+    # every subset of the mask (carry-rippler trick)
+    subset = 0
+
+    while True:
+        yield subset
+
+        subset = (subset - mask) & mask
+
+        if subset == 0:
+            break
+
+
+def BuildSquareTable(square, directions, magic):
+    mask = RelevantMask(square, directions)
+    bits = bin(mask).count('1')
+    shift = 64 - bits
+
+    table = [0] * (1 << bits)
+
+    for occupancy in Subsets(mask):
+        table[((occupancy * magic) & FULL) >> shift] = SlidingAttacks(square, occupancy, directions)
+
+    return mask, shift, table
+
+
+def FindMagic(square, directions, rng, tries=100000000):
+    """
+    Random search for a magic for one square: a number whose product with every blocker subset puts the subsets with
+    different attack sets in different table slots
+    """
+    mask = RelevantMask(square, directions)
+    bits = bin(mask).count('1')
+    shift = 64 - bits
+
+    occupancies = list(Subsets(mask))
+    attacks = [SlidingAttacks(square, occupancy, directions) for occupancy in occupancies]
+
+    for _ in range(tries):
+        # numbers with few bits set make good magics
+        magic = rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+
+        if bin(((mask * magic) & FULL) >> 56).count('1') < 6:
+            continue
+
+        used = {}
+
+        for occupancy, attack in zip(occupancies, attacks):
+            index = ((occupancy * magic) & FULL) >> shift
+
+            if used.setdefault(index, attack) != attack:
+                break
+        else:
+            return magic
+
+    raise RuntimeError(f'No magic found for square {square}')
+
+
+def FindMagics(seed=MAGIC_SEED):
+    rng = random.Random(seed)
+
+    bishop_magics = [FindMagic(sq, BISHOP_DIRECTIONS, rng) for sq in range(64)]
+    rook_magics = [FindMagic(sq, ROOK_DIRECTIONS, rng) for sq in range(64)]
+
+    return bishop_magics, rook_magics
+
+
+def BuildTables(name, directions, magics):
+    """
+    Masks, shifts and attack tables for every square. The tables are the slow part, so they come from the table cache
+    (see tableCache) when there is a valid one for these magics
+    """
+    masks = [RelevantMask(sq, directions) for sq in range(64)]
+    shifts = [64 - bin(mask).count('1') for mask in masks]
+
+    def BuildFlatTable():
+        values = []
+
+        for sq in range(64):
+            values += BuildSquareTable(sq, directions, magics[sq])[2]
+
+        return values
+
+    values = LoadTable(name, CacheKey(directions, magics), BuildFlatTable)
+
+    tables = []
+    offset = 0
+
+    for shift in shifts:
+        size = 1 << (64 - shift)
+        tables.append(values[offset:offset + size])
+        offset += size
+
+    return masks, shifts, tables
+
+
+BISHOP_MASKS, BISHOP_SHIFTS, BISHOP_TABLES = BuildTables('bishop_magics', BISHOP_DIRECTIONS, BISHOP_MAGICS)
+ROOK_MASKS, ROOK_SHIFTS, ROOK_TABLES = BuildTables('rook_magics', ROOK_DIRECTIONS, ROOK_MAGICS)
+
+
+def BishopAttacks(square, occupancy):
+    """
+    Bishop attack set from square, stopping at (and including) the first blocker in each direction.
+    occupancy and the result are python ints
+    """
+    return BISHOP_TABLES[square][(((occupancy & BISHOP_MASKS[square]) * BISHOP_MAGICS[square]) & FULL) >> BISHOP_SHIFTS[square]]
+
+
+def RookAttacks(square, occupancy):
+    return ROOK_TABLES[square][(((occupancy & ROOK_MASKS[square]) * ROOK_MAGICS[square]) & FULL) >> ROOK_SHIFTS[square]]
+
+
+def QueenAttacks(square, occupancy):
+    return BishopAttacks(square, occupancy) | RookAttacks(square, occupancy)
+
+
+def VerifyTables():
+    """
+    (piece, square, occupancy) of every blocker set on which BishopAttacks or RookAttacks differs from SlidingAttacks.
+    Empty when the magics and the (possibly cached) tables are right
+    """
+    mismatches = []
+
+    for piece, directions, masks, attacks in (('bishop', BISHOP_DIRECTIONS, BISHOP_MASKS, BishopAttacks),
+                                              ('rook', ROOK_DIRECTIONS, ROOK_MASKS, RookAttacks)):
+        for sq in range(64):
+            for occupancy in Subsets(masks[sq]):
+                if attacks(sq, occupancy) != SlidingAttacks(sq, occupancy, directions):
+                    mismatches.append((piece, sq, occupancy))
+
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find magics for this board layout, or check the attack tables')
+    parser.add_argument('--verify', action='store_true', help='check every table entry against a ray walk instead')
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches = VerifyTables()
+
+        for piece, sq, occupancy in mismatches[:10]:
+            print(f'{piece} on square {sq} wrong for occupancy {occupancy:#018x}')
+
+        print(f'{len(mismatches)} mismatches')
+    else:
+        bishop_magics, rook_magics = FindMagics()
+
+        print('BISHOP_MAGICS =', [hex(magic) for magic in bishop_magics])
+        print('ROOK_MAGICS =', [hex(magic) for magic in rook_magics])
@@ -0,0 +1,188 @@
+"""
+Moves packed into a single int, so they are cheap to generate, store in hash tables and keep in history:
+
+    bits  0-5   initial square
+    bits  6-11  final square
+    bits 12-15  moving piece, index into PIECES
+    bits 16-18  promotion piece type, 0 for none (see PROMOTION_TYPES)
+    bit  19     capture
+    bit  20     en-passant
+    bit  21     castle
+    bit  22     double pawn push
+
+0 is never a valid move (a8 to a8), so it is used for 'no move'.
+
+The GUI and console work with (piece_type, initial_sq, final_sq, move_type) tuples, where move_type is '_' for a
+normal move, 'EP' for en-passant and the promotion piece for promotions. TupleToMove and MoveToTuple convert.
+"""
+from array import array
+from itertools import islice
+
+PIECES = 'PNBRQKpnbrqk'
+PIECE_INDEX = {piece : index for index, piece in enumerate(PIECES)}
+PIECE_BITS = {piece : index << 12 for index, piece in enumerate(PIECES)}
+
+# promotion type index -> piece, for each colour
+PROMOTION_TYPES = '.NBRQ'
+WHITE_PROMOTIONS = PROMOTION_TYPES
+BLACK_PROMOTIONS = PROMOTION_TYPES.lower()
+
+KNIGHT_PROMOTION = 1 << 16
+BISHOP_PROMOTION = 2 << 16
+ROOK_PROMOTION = 3 << 16
+QUEEN_PROMOTION = 4 << 16
+
+# order promotions are generated in, the GUI relies on this when the player picks a piece
+PROMOTION_ORDER = (QUEEN_PROMOTION, KNIGHT_PROMOTION, ROOK_PROMOTION, BISHOP_PROMOTION)
+
+# piece standing on the final square after a move, indexed by (move >> 12) & 127, the moving piece and promotion type
+FINAL_PIECES = [''] * 128
+
+for index, piece in enumerate(PIECES):
+    FINAL_PIECES[index] = piece
+
+    for promotion in range(1, 5):
+        FINAL_PIECES[index | (promotion << 4)] = (WHITE_PROMOTIONS if piece.isupper() else BLACK_PROMOTIONS)[promotion]
+
+CAPTURE = 1 << 19
+EN_PASSANT = 1 << 20
+CASTLE = 1 << 21
+DOUBLE_PUSH = 1 << 22
+
+NO_MOVE = 0
+
+MAX_MOVES = 256 # more than the most legal moves in any position
+MAX_PLY = 128
+
+
+def EncodeMove(piece, initial_sq, final_sq, promotion=0, flags=0):
+    # promotion is one of the *_PROMOTION constants, flags any of CAPTURE, EN_PASSANT, CASTLE, DOUBLE_PUSH
+    return initial_sq | (final_sq << 6) | PIECE_BITS[piece] | promotion | flags
+
+
+def InitialSquare(move):
+    return move & 63
+
+
+def FinalSquare(move):
+    return (move >> 6) & 63
+
+
+def MovingPiece(move):
+    return PIECES[(move >> 12) & 15]
+
+
+def PromotionPiece(move):
+    """
+    Piece a pawn promotes to, with the mover's case, or '' for moves that aren't promotions
+    """
+    promotion = (move >> 16) & 7
+
+    if promotion == 0:
+        return ''
+
+    if (move >> 12) & 15 < 6:
+        return WHITE_PROMOTIONS[promotion]
+
+    return BLACK_PROMOTIONS[promotion]
+
+
+def IsCapture(move):
+    return move & CAPTURE != 0
+
+
+def IsPromotion(move):
+    return (move >> 16) & 7 != 0
+
+
+def MoveToTuple(move):
+    move_type = PromotionPiece(move)
+
+    if not move_type:
+        move_type = 'EP' if move & EN_PASSANT else '_'
+
+    return MovingPiece(move), move & 63, (move >> 6) & 63, move_type
+
+
+def TupleToMove(move_tuple, console_board):
+    """
+    Pack a move tuple. The flags depend on the position, so the board it is played on is needed too
+    """
+    piece, initial_sq, final_sq, move_type = move_tuple
+
+    promotion = 0
+    flags = 0
+
+    if move_type == 'EP':
+        flags |= EN_PASSANT | CAPTURE
+    elif move_type != '_':
+        promotion = PROMOTION_TYPES.index(move_type.upper()) << 16
+
+    if console_board[final_sq] != '.':
+        flags |= CAPTURE
+
+    if piece in 'Pp' and abs(final_sq - initial_sq) == 16:
+        flags |= DOUBLE_PUSH
+
+    if piece in 'Kk' and abs(final_sq - initial_sq) == 2:
+        flags |= CASTLE
+
+    return EncodeMove(piece, initial_sq, final_sq, promotion, flags)
+
+
+def MoveToUci(move):
+    # long algebraic notation, as used by UCI and perft 'divide' output, e.g. e2e4, e7e8q
+    initial_sq, final_sq = move & 63, (move >> 6) & 63
+
+    return (chr(97 + initial_sq % 8) + str(8 - initial_sq // 8) + chr(97 + final_sq % 8) + str(8 - final_sq // 8) +
+            PromotionPiece(move).lower())
+
+
+def UciToMove(uci, console_board):
+    """
+    Pack a move in long algebraic notation (e2e4, e7e8q, e1g1 for castling), as GUIs send them. Like TupleToMove the
+    piece and flags come from the position, so the move isn't checked for being possible
+    """
+    initial_sq = 8 * (8 - int(uci[1])) + ord(uci[0]) - 97
+    final_sq = 8 * (8 - int(uci[3])) + ord(uci[2]) - 97
+    piece = console_board[initial_sq]
+
+    if piece == '.':
+        raise ValueError(f"No piece to move in '{uci}'")
+
+    if len(uci) > 4:
+        move_type = uci[4].upper() if piece.isupper() else uci[4].lower()
+    elif piece in 'Pp' and initial_sq % 8 != final_sq % 8 and console_board[final_sq] == '.':
+        # a pawn capturing onto an empty square
+        move_type = 'EP'
+    else:
+        move_type = '_'
+
+    return TupleToMove((piece, initial_sq, final_sq, move_type), console_board)
+
+
+class MoveList:
+    """
+    Preallocated buffer of packed moves. The generator keeps one per ply and reuses it, so generating moves does not
+    allocate a new list every time
+    """
+    __slots__ = ('moves', 'count')
+
+    def __init__(self, size=MAX_MOVES):
+        self.moves = array('I', bytes(4 * size))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return islice(self.moves, self.count)
+
+    def __getitem__(self, index):
+        if index >= self.count:
+            raise IndexError('move list index out of range')
+
+        return self.moves[index]
+
+    def Tuples(self):
+        return [MoveToTuple(move) for move in self]
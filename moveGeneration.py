@@ -1,1009 +1,343 @@
-import numpy as np
-from typing import Any
+"""
+Strictly legal move generation. Nothing is made and taken back to test a move: before any moves are generated, one
+pass along the lines out from the side to move's king finds
+
+    checkers     - the pieces giving check
+    pinned       - our pieces standing alone between the king and an enemy slider, each with its pin ray (the squares
+                   between the king and the pinner, and the pinner), the only squares it can move to
+    capture_mask - the pieces a move has to capture to get out of check (the checker), every square when not in check
+    push_mask    - the squares a move can block a check on (between the king and a checking slider)
+
+Every piece's destinations are masked with these, in double check only the king moves, and the king only goes to
+squares the enemy doesn't attack. Those come from the position's AttackMap (Board.GetAttackMap), which also says
+whether the king is in check at all, plus the squares behind the king on the line of a checking slider, which the map
+doesn't see through the king.
+
+The generator works on python ints whatever the Board backend, taking them from the attack map.
+"""
+from attackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BISHOP_RAYS, ROOK_RAYS, BETWEEN
+from bitOperations import FULL, SQUARE_BBS, PopCount, Squares
+from magicBitboards import BishopAttacks, RookAttacks
+from moveEncoding import PIECE_BITS, PROMOTION_ORDER, CAPTURE, EN_PASSANT, CASTLE, DOUBLE_PUSH, MAX_PLY, MoveList
+
+NOT_A_FILE = 0x7F7F7F7F7F7F7F7F
+NOT_H_FILE = 0xFEFEFEFEFEFEFEFE
+RANK_1 = 0xFF
+RANK_3 = 0xFF << 16
+RANK_6 = 0xFF << 40
+RANK_8 = 0xFF << 56
+
+# castling right : (king square, king final square, squares that must be empty, squares the king crosses that mustn't
+# be attacked)
+CASTLING = {
+    'K' : (60, 62, SQUARE_BBS[61] | SQUARE_BBS[62], SQUARE_BBS[61] | SQUARE_BBS[62]),
+    'Q' : (60, 58, SQUARE_BBS[57] | SQUARE_BBS[58] | SQUARE_BBS[59], SQUARE_BBS[59] | SQUARE_BBS[58]),
+    'k' : (4, 6, SQUARE_BBS[5] | SQUARE_BBS[6], SQUARE_BBS[5] | SQUARE_BBS[6]),
+    'q' : (4, 2, SQUARE_BBS[1] | SQUARE_BBS[2] | SQUARE_BBS[3], SQUARE_BBS[3] | SQUARE_BBS[2]),
+}
+
+# rook squares of each right, the rook has to be there
+CASTLING_ROOKS = {'K' : 63, 'Q' : 56, 'k' : 7, 'q' : 0}
+
 
 class GenerateMoves:
     def __init__(self, board_object):
-        self.possible_moves = [] # stores moves for all pieces expect kings
+        # one reusable move list per ply, so a search can hold the moves of every ply it is on without allocating
+        self.move_lists = [MoveList() for _ in range(MAX_PLY)]
+        self.move_list = self.move_lists[0] # list the generator is currently filling
 
-        self.ally_king = None
-                     
         self.board = board_object
 
-        """
-        Kings, pawns* and knights move in very predictable ways. These lookup tables are pre-calculated with each square and possible squares piece can land on.
-        Finding actual moves is a matter of making 
-        """
-        self.KING_TABLE : dict[int, Any] = {}
-        self.KNIGHT_TABLE : dict[int, Any] = {}
-        self.RAYS : dict[str, dict[int, Any]] = {}
-
-        for sq in range(0, 64):
-            # each square key stores bitboard of attack set
-            self.KING_TABLE[sq] = 0
-            self.KNIGHT_TABLE[sq] = 0
-
-        # legal move filtration
-        self.capture_mask = 0 # bitboard of all squares we can possibly capture to
-        self.push_mask = 0 # bitboard of all squares we can popssibly move to
+        # legal move filtration, see the module docstring
+        self.checkers = 0
+        self.pinned = 0
+        self.pin_rays = {} # pinned piece's square : squares it can move to
+        self.capture_mask = 0
+        self.push_mask = 0
         self.number_of_attackers = 0
 
-    def PossibleWhitePawnMoves(self):
-        rank_8 = self.board.RANKS(8)
-        rank_4 = self.board.RANKS(4)
-        rank_5 = self.board.RANKS(5)
-
-        # right captures
-        r_captures = (self.board.white_pawns << np.uint64(7)) & ~rank_8 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= r_captures
-
-        else:
-            dest_squares = self.board.BBToSquares(r_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                self.possible_moves.append(('P', sq + 7, sq, '_'))
-
-        # left_captures
-        l_captures = (self.board.white_pawns << np.uint64(9)) & ~rank_8 & ~self.board.H_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= l_captures
-
-        else:
-            dest_squares = self.board.BBToSquares(l_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                self.possible_moves.append(('P', sq + 9, sq, '_'))
-
-        # forward by 1
-        if self.board.active_piece == 'w':
-            forward_1 = (self.board.white_pawns << np.uint(8)) & self.board.empty & ~rank_8 & self.push_mask
-
-            dest_squares = self.board.BBToSquares(forward_1)
-
-            for sq in dest_squares:
-                self.possible_moves.append(('P', sq + 8, sq, '_'))
-
-        # forward by 2
-        if self.board.active_piece == 'w':
-            forward_2 = (self.board.white_pawns << np.uint64(16)) & self.board.empty & (self.board.empty << np.uint64(8)) & ~rank_8 & rank_4 & self.push_mask
-            dest_squares = self.board.BBToSquares(forward_2)
-
-            for sq in dest_squares:
-                self.possible_moves.append(('P', sq + 16, sq, '_'))
-
-        # promotion by right captures
-        promo_r_captures = (self.board.white_pawns << np.uint64(7)) & rank_8 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= promo_r_captures
-        else:
-            dest_squares = self.board.BBToSquares(promo_r_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    self.possible_moves.append(('P', sq + 7, sq, promotes_to))
-
-        # promotion by left captures
-        promo_l_captures = (self.board.white_pawns << np.uint64(9)) & rank_8 & ~self.board.H_FILE 
-
-        if self.board.active_piece == 'b':
-            self.board.king_danger_squares |= promo_l_captures
-        else:
-            dest_squares = self.board.BBToSquares(promo_l_captures & self.board.all_blacks & self.capture_mask)
-
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    self.possible_moves.append(('P', sq + 9, sq, promotes_to))
-
-        # promotion by forward 1
-        if self.board.active_piece == 'w':
-            promo_forward_1 = (self.board.white_pawns << np.uint(8)) & self.board.empty & rank_8 & self.push_mask
-
-            dest_squares = self.board.BBToSquares(promo_forward_1)
-
-            for sq in dest_squares:
-                for promotes_to in ['Q', 'N', 'R', 'B']:
-                    self.possible_moves.append(('P', sq + 8, sq, promotes_to))
-
-        # en-passant
-        if len(self.board.move_history) >= 1:
-            last_move = self.board.move_history[-1]
-
-            piece_type, initial_sq, final_sq, move_type = last_move
-
-            if piece_type == 'p' and abs(initial_sq-final_sq) == 2*8:
-                ep_file = final_sq%8 + 1
-                # move by black pawn 2 up
-
-                # en-passant right
-                if (self.board.white_pawns >> np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.A_FILE & rank_5 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_right = (self.board.white_pawns << np.uint64(7))  & ~self.board.A_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'b':
-                        self.board.king_danger_squares |= ep_right
-                    else:
-                        captured_piece = (self.board.white_pawns >> np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.A_FILE & rank_5
+        # the side to move's pieces in PIECES order (pawns, knights, bishops, rooks, queens, king), the enemy's, and
+        # the occupancy of each side, as ints, set for each generation
+        self.own = ()
+        self.enemy = ()
+        self.own_pieces = 0
+        self.enemy_pieces = 0
+        self.occupied = 0
+        self.enemy_attacks = 0
 
-                        if (captured_piece | ep_right) & (self.capture_mask | self.push_mask) == (captured_piece | ep_right):
-                            dest_squares = self.board.BBToSquares(ep_right)
+        # only generate captures and promotions, for quiescence search
+        self.captures_only = False
 
-                            for sq in dest_squares:
-                                self.possible_moves.append(('P', sq + 7, sq, 'EP'))
-
-                # en-passant left
-                if (self.board.white_pawns << np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.H_FILE & rank_5 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_left = (self.board.white_pawns << np.uint64(9))  & ~self.board.H_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'b':
-                        self.board.king_danger_squares |= ep_left
-                    else:
-                        captured_piece = (self.board.white_pawns << np.uint64(1)) & self.board.black_pawns & self.board.FILES[ep_file] & ~self.board.H_FILE & rank_5
-
-                        if (captured_piece | ep_left) & (self.capture_mask | self.push_mask) == (captured_piece | ep_left):
-                            dest_squares = self.board.BBToSquares(ep_left)
-
-                            for sq in dest_squares:
-                                self.possible_moves.append(('P', sq + 7, sq, 'EP'))
-                    
-    def PossibleBlackPawnMoves(self):
-        rank_1 = self.board.RANKS(1)
-        rank_5 = self.board.RANKS(5)
-        rank_4 = self.board.RANKS(4)
-
-        # right captures
-        r_captures = (self.board.black_pawns >> np.uint64(9)) & ~rank_1 & ~self.board.A_FILE
-
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= r_captures
-        else:
-            dest_squares = self.board.BBToSquares(r_captures & self.board.all_whites & self.capture_mask)
-
-            for sq in dest_squares:
-                self.possible_moves.append(('p', sq - 9, sq, '_'))
-
-        # left_captures
-        l_captures = (self.board.black_pawns >> np.uint64(7)) & ~rank_1 & ~self.board.H_FILE
-
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= l_captures
-        else:
-        
-            dest_squares = self.board.BBToSquares(l_captures & self.board.all_whites & self.capture_mask)
+    def AddPieceMoves(self, piece_type, initial_sq, dest_squares_bb):
+        """
+        Append a move to each square of dest_squares_bb to the current move list, see moveEncoding.
+        dest_squares_bb must only hold empty squares and enemy pieces, the enemy ones are flagged as captures
+        """
+        enemies = self.enemy_pieces
 
-            for sq in dest_squares:
-                self.possible_moves.append(('p', sq - 7, sq, '_'))
+        base = PIECE_BITS[piece_type] | initial_sq
+        move_list = self.move_list
+        moves = move_list.moves
+        n = move_list.count
 
-        # forward by 1
-        if self.board.active_piece == 'b':
-            forward_1 = (self.board.black_pawns >> np.uint(8)) & self.board.empty & ~rank_1 & self.push_mask
+        for sq in Squares(dest_squares_bb & enemies):
+            moves[n] = base | CAPTURE | (sq << 6)
+            n += 1
 
-            dest_squares = self.board.BBToSquares(forward_1)
+        if not self.captures_only:
+            for sq in Squares(dest_squares_bb & ~enemies):
+                moves[n] = base | (sq << 6)
+                n += 1
 
-            for sq in dest_squares:
-                self.possible_moves.append(('p', sq - 8, sq, '_'))
+        move_list.count = n
 
-        # forward by 2
-        if self.board.active_piece == 'b':
-            forward_2 = (self.board.black_pawns >> np.uint64(16)) & self.board.empty & (
-                        self.board.empty >> np.uint64(8)) & ~rank_1 & rank_5 & self.push_mask
+    def AddPawnMoves(self, dest_squares_bb, offset, base):
+        # pawns are moved set-wise, so each move's initial square is its final square + offset
+        move_list = self.move_list
+        moves = move_list.moves
+        n = move_list.count
 
-            dest_squares = self.board.BBToSquares(forward_2)
+        for sq in Squares(dest_squares_bb):
+            moves[n] = base | (sq + offset) | (sq << 6)
+            n += 1
 
-            for sq in dest_squares:
-                self.possible_moves.append(('p', sq - 16, sq, '_'))
+        move_list.count = n
 
-        # promotion by right captures
-        promo_r_captures = (self.board.black_pawns >> np.uint64(9)) & rank_1 & ~self.board.A_FILE
+    def AddPromotions(self, dest_squares_bb, offset, base):
+        move_list = self.move_list
+        moves = move_list.moves
+        n = move_list.count
 
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= promo_r_captures
-        else:
+        for sq in Squares(dest_squares_bb):
+            move = base | (sq + offset) | (sq << 6)
 
-            dest_squares = self.board.BBToSquares(promo_r_captures & self.board.all_whites & self.capture_mask)
+            for promotion in PROMOTION_ORDER:
+                moves[n] = move | promotion
+                n += 1
 
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    self.possible_moves.append(('p', sq - 9, sq, promotes_to))
+        move_list.count = n
 
-        # promotion by left captures
-        promo_l_captures = (self.board.black_pawns >> np.uint64(7)) & rank_1 & ~self.board.H_FILE
+    def PossibleWhitePawnMoves(self, pawns, capture_mask, push_mask):
+        """
+        Moves of the white pawns in pawns, captures only to capture_mask and pushes only to push_mask
+        """
+        empty = ~self.occupied & FULL
+        captures = self.enemy_pieces & capture_mask
 
-        if self.board.active_piece == 'w':
-            self.board.king_danger_squares |= promo_l_captures
-        else:
+        # right and left captures, a pawn moving up the board goes towards the most significant bit
+        for shift, file_mask in ((7, NOT_A_FILE), (9, NOT_H_FILE)):
+            targets = (pawns << shift) & file_mask & captures
 
-            dest_squares = self.board.BBToSquares(promo_l_captures & self.board.all_whites & self.capture_mask)
+            self.AddPawnMoves(targets & ~RANK_8, shift, PIECE_BITS['P'] | CAPTURE)
+            self.AddPromotions(targets & RANK_8, shift, PIECE_BITS['P'] | CAPTURE)
 
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    self.possible_moves.append(('p', sq - 7, sq, promotes_to))
+        forward_1 = (pawns << 8) & empty
 
         # promotion by forward 1
-        if self.board.active_piece == 'b':
-            promo_forward_1 = (self.board.black_pawns >> np.uint(8)) & self.board.empty & rank_1 & self.push_mask
+        self.AddPromotions(forward_1 & RANK_8 & push_mask, 8, PIECE_BITS['P'])
 
-            dest_squares = self.board.BBToSquares(promo_forward_1)
+        if not self.captures_only:
+            self.AddPawnMoves(forward_1 & ~RANK_8 & push_mask, 8, PIECE_BITS['P'])
 
-            for sq in dest_squares:
-                for promotes_to in ['q', 'n', 'r', 'b']:
-                    self.possible_moves.append(('p', sq - 8, sq, promotes_to))
+            # forward by 2, from the second rank through an empty third one
+            forward_2 = ((forward_1 & RANK_3) << 8) & empty & push_mask
+            self.AddPawnMoves(forward_2, 16, PIECE_BITS['P'] | DOUBLE_PUSH)
 
-        # en-passant
-        if len(self.board.move_history) >= 1:
-            last_move = self.board.move_history[-1]
+    def PossibleBlackPawnMoves(self, pawns, capture_mask, push_mask):
+        empty = ~self.occupied & FULL
+        captures = self.enemy_pieces & capture_mask
 
-            piece_type, initial_sq, final_sq, move_type = last_move
+        for shift, file_mask in ((9, NOT_A_FILE), (7, NOT_H_FILE)):
+            targets = (pawns >> shift) & file_mask & captures
 
-            if piece_type == 'P' and abs(initial_sq - final_sq) == 2 * 8:
-                ep_file = final_sq % 8 + 1
-                # move by white pawn 2 up
+            self.AddPawnMoves(targets & ~RANK_1, -shift, PIECE_BITS['p'] | CAPTURE)
+            self.AddPromotions(targets & RANK_1, -shift, PIECE_BITS['p'] | CAPTURE)
 
-                # en-passant right
-                if (self.board.black_pawns >> np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.A_FILE & rank_4 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
+        forward_1 = (pawns >> 8) & empty
 
-                    ep_right = (self.board.black_pawns >> np.uint64(9)) & ~self.board.A_FILE & self.board.FILES[ep_file]
+        self.AddPromotions(forward_1 & RANK_1 & push_mask, -8, PIECE_BITS['p'])
 
-                    if self.board.active_piece == 'w':
-                        self.board.king_danger_squares |= ep_right
-                    else:
-                        captured_piece = (self.board.black_pawns >> np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.A_FILE & rank_4
+        if not self.captures_only:
+            self.AddPawnMoves(forward_1 & ~RANK_1 & push_mask, -8, PIECE_BITS['p'])
 
-                        if (ep_right | captured_piece) & (self.capture_mask | self.push_mask) == (ep_right | captured_piece):
-                            dest_squares = self.board.BBToSquares(ep_right)
+            forward_2 = ((forward_1 & RANK_6) >> 8) & empty & push_mask
+            self.AddPawnMoves(forward_2, -16, PIECE_BITS['p'] | DOUBLE_PUSH)
 
-                            for sq in dest_squares:
-                                self.possible_moves.append(('p', sq - 9, sq, 'EP'))
-
-                # en-passant left
-                if (self.board.black_pawns << np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.H_FILE & rank_4 != np.uint64(0):
-                    # if there's a black pawn next to white pawn that isn't on the A file as this is right captures
-                    # and is on the file on the en-passant pawn(last move)
-                    # both pawns must be on rank 5 (this implies black pawn must've moved 2 down)
-
-                    ep_left = (self.board.black_pawns >> np.uint64(7)) & ~self.board.H_FILE & self.board.FILES[ep_file]
-
-                    if self.board.active_piece == 'w':
-                        self.board.king_danger_squares |= ep_left
-                    else:
-                        captured_piece = (self.board.black_pawns << np.uint64(1)) & self.board.white_pawns & self.board.FILES[
-                    ep_file] & ~self.board.H_FILE & rank_4
-
-                        if (ep_left | captured_piece) & (self.capture_mask | self.push_mask) == (ep_left | captured_piece):
-                            dest_squares = self.board.BBToSquares(ep_left)
-
-                            for sq in dest_squares:
-                                self.possible_moves.append(('p', sq - 7, sq, 'EP'))
-        
-    def PossibleWhitePawnCaptures(self, square):
+    def PossibleEnPassant(self, king_sq, white):
         """
-        get possible attacks for a white pawn at a given square
-
-        this function checks specifically for possible captures moves of a given pawn
+        En-passant captures. Taking the pawn can uncover a check along the rank both pawns leave (or any line the
+        capturing pawn was pinned on), so each one is checked by looking for sliders from the king with the three
+        squares changed
         """
-        pawn_bitboard = self.board.SquareToBB(square)
-        result = np.uint64(0)
+        en_passant = self.board.en_passant
 
-        rank_8 = self.board.RANKS(8)
-  
-        # right captures
-        r_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(7)) & ~rank_8 & ~self.board.A_FILE
+        # the en-passant square is the one an enemy pawn just skipped
+        if en_passant == '-' or en_passant[1] != ('6' if white else '3'):
+            return
 
-        result |= (r_captures & self.board.all_blacks)
+        ep_sq = 8 * (8 - int(en_passant[1])) + ord(en_passant[0]) - 97
+        captured_sq = ep_sq + 8 if white else ep_sq - 8
 
-        # left_captures
-        l_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(9)) & ~rank_8 & ~self.board.H_FILE
+        # it has to take the checking pawn or block the check
+        if not (SQUARE_BBS[captured_sq] & self.capture_mask or SQUARE_BBS[ep_sq] & self.push_mask):
+            return
 
-        result |= (l_captures & self.board.all_blacks)
+        pawns = self.own[0]
+        enemy_pawns, _, enemy_bishops, enemy_rooks, enemy_queens, _ = self.enemy
+        piece = 'P' if white else 'p'
 
-        # promotion by right captures
-        promo_r_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(7)) & rank_8 & ~self.board.A_FILE
+        # our pawns that attack the en-passant square are where an enemy pawn on it would attack
+        for initial_sq in Squares(PAWN_ATTACKS['b' if white else 'w'][ep_sq] & pawns):
+            occupied = self.occupied ^ SQUARE_BBS[initial_sq] ^ SQUARE_BBS[captured_sq] ^ SQUARE_BBS[ep_sq]
 
-        result |= (promo_r_captures & self.board.all_blacks)
+            if (BishopAttacks(king_sq, occupied) & (enemy_bishops | enemy_queens) or
+                    RookAttacks(king_sq, occupied) & (enemy_rooks | enemy_queens)):
+                continue
 
-        # promotion by left captures
-        promo_l_captures = ((self.board.white_pawns & pawn_bitboard) << np.uint64(9)) & rank_8 & ~self.board.H_FILE
+            move_list = self.move_list
+            move_list.moves[move_list.count] = PIECE_BITS[piece] | CAPTURE | EN_PASSANT | initial_sq | (ep_sq << 6)
+            move_list.count += 1
 
-        result |= (promo_l_captures & self.board.all_blacks)
-    
-        return result
-
-    def PossibleBlackPawnCaptures(self, square):
+    def FindCheckersAndPins(self, king_sq, white):
         """
-        get possible attacks for a white pawn at a given square
-
-        this function checks specifically for possible captures moves of a given pawn
+        One pass out from the king square: knights and pawns that attack it are checkers, and for every enemy slider
+        on one of its lines, the squares between are either empty (a check, to capture or block) or hold exactly one
+        of our pieces (pinned to that line). Sets checkers, pinned, pin_rays, capture_mask and push_mask
         """
-        pawn_bitboard = self.board.SquareToBB(square)
-        result = np.uint64(0)
-
-        rank_1 = self.board.RANKS(1)
-    
-        # right captures
-        r_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(9)) & ~rank_1 & ~self.board.A_FILE
-
-        result |= (r_captures & self.board.all_whites)
-
-        # left_captures
-        l_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(7)) & ~rank_1 & ~self.board.H_FILE
-
-        result |= (l_captures & self.board.all_whites)
-
-        # promotion by right captures
-        promo_r_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(9)) & rank_1 & ~self.board.A_FILE
-
-        result |= (promo_r_captures & self.board.all_whites)
-
-        # promotion by left captures
-        promo_l_captures = ((self.board.black_pawns & pawn_bitboard) >> np.uint64(7)) & rank_1 & ~self.board.H_FILE
-
-        result |= (promo_l_captures & self.board.all_whites)
-
-        return result
-
-    def GetKnightAttackSet(self, bitboard):
-        rank_8 = self.board.RANKS(8)
-        rank_7 =  self.board.RANKS(7)
-        rank_1 = self.board.RANKS(1)
-        rank_2 = self.board.RANKS(2)
-        rank_78 = rank_7 | rank_8
-        rank_12 = rank_1 | rank_2
-
-        knight_attack_set = np.uint64(0)
-        
-        nne = (bitboard & ~(self.board.H_FILE | rank_78)) << np.uint64(15)
-
-        knight_attack_set |= nne
-
-        ne = (bitboard & ~(self.board.GH_FILE | rank_8)) << np.uint64(6)
-        
-        knight_attack_set |= ne
-
-        nnw = (bitboard & ~(self.board.A_FILE | rank_78)) << np.uint64(17)
-
-        knight_attack_set |= nnw
-
-        nw = (bitboard & ~(self.board.AB_FILE | rank_8)) << np.uint64(10)
-
-        knight_attack_set |= nw
-
-        sse = (bitboard & ~(self.board.H_FILE | rank_12)) >> np.uint64(17)
-
-        knight_attack_set |= sse
-
-        se = (bitboard & ~(self.board.GH_FILE | rank_1)) >> np.uint64(10)
-
-        knight_attack_set |= se
-        
-        ssw = (bitboard & ~(self.board.A_FILE | rank_12)) >> np.uint64(15)
-
-        knight_attack_set |= ssw
-
-        sw = (bitboard & ~(self.board.AB_FILE | rank_1)) >> np.uint64(6)
-
-        knight_attack_set |= sw
-
-        return knight_attack_set
-
-    def GetKingAttackSet(self, bitboard):
-        rank_8 = self.board.RANKS(8)
-        rank_1 = self.board.RANKS(1)
-    
-        king_attack_set = np.uint64(0)
-
-        n = (bitboard & ~rank_8) << np.uint64(8)
-        king_attack_set |= n
-
-        e = (bitboard & ~self.board.H_FILE) >> np.uint64(1)
-        king_attack_set |= e
-
-        w = (bitboard & ~self.board.A_FILE) << np.uint64(1)
-        king_attack_set |= w
-
-        s = (bitboard & ~rank_1) >> np.uint(8)
-        king_attack_set |= s
-
-        ne = (bitboard & ~(rank_8 | self.board.H_FILE)) << np.uint64(7)
-        king_attack_set |= ne
-
-        nw = (bitboard & ~(rank_8 | self.board.A_FILE)) << np.uint64(9)
-        king_attack_set |= nw
-
-        se = (bitboard & ~(rank_1 | self.board.H_FILE)) >> np.uint64(9)
-        king_attack_set |= se
-
-        sw = (bitboard & ~(rank_1 | self.board.A_FILE)) >> np.uint64(7)
-        king_attack_set |= sw
-
-        return king_attack_set
-
-    def PopulateAttackTables(self):
-        for sq, _ in self.KNIGHT_TABLE.items():
-            initial_bitboard = self.board.SquareToBB(sq)
-
-            self.KNIGHT_TABLE[sq] = self.GetKnightAttackSet(initial_bitboard)
-
-        for sq, _ in self.KING_TABLE.items():
-            initial_bitboard = self.board.SquareToBB(sq)
-
-            self.KING_TABLE[sq] = self.GetKingAttackSet(initial_bitboard)
-    
-    @staticmethod
-    def GreaterThanDiagonal(square, dir):
-        x, y  = square % 8, square // 8
-
-        if dir == 'NE' or dir == 'SW':
-            return (x + y) >= 7
-
-        elif dir == 'NW' or dir == 'SE':
-            return (x - y) >= 0 
-
-    def GetNumberOfShifts(self, square, dir):
-        x, y  = square % 8, square // 8
-
-        if dir == 'NE':
-            if self.GreaterThanDiagonal(square, 'NE'):
-                return 7 - x
-            else:
-                return y
-
-        elif dir == 'SW':
-            if self.GreaterThanDiagonal(square, 'SW'):
-                return 7 - y
-            else:
-                return x
-
-        elif dir == 'NW':
-            if self.GreaterThanDiagonal(square, 'NW'):
-                return y
-            else:
-                return x
-
-        elif dir == 'SE':
-            if self.GreaterThanDiagonal(square, 'SE'):
-                return 7 - x
-            else:
-                return 7 - y
-
-        elif dir == 'N':
-            return  y
-
-        elif dir == 'E':
-            return 7 - x
-
-        elif dir == 'W':
-            return x
-
-        elif dir == 'S':
-            return 7 - y
-
-    def PopulateRayTable(self):
-        shift_by = {'N':8, 'E':1, 'W':1, 'S':8, 'NE':7, 'NW':9, 'SE':9, 'SW':7}
-        #restrictions = {'N':self.board.RANKS(8), 'E':self.board.H_FILE, 'W':self.board.A_FILE, 'S':self.board.RANKS(1), 'NE':self.board.RANKS(8), 'NW':self.board.RANKS(8), 'SE':self.board.RANKS(1), 'SW':self.board.RANKS(1)}
-
-        for dir in ['N','E','W','S','NE','NW','SE','SW']:
-            self.RAYS[dir] = {}
-
-            for sq in range(64):
-                ray = np.uint64(0)
-                sq_bitboard = self.board.SquareToBB(sq)
-
-                for shift in range(self.GetNumberOfShifts(sq, dir)):
-                    if dir in ['NE', 'NW', 'W', 'N']:
-                        # left shift
-                        ray |= sq_bitboard << np.uint64((shift + 1) * shift_by[dir])
-
-                    else:
-                        # right shift
-                        ray |= sq_bitboard >> np.uint64((shift + 1) * shift_by[dir])
-
-                self.RAYS[dir][sq] = ray
-    
-    @staticmethod
-    def BitscanForward(number):
-        # return number of trailing zeroes
-
-        if number==0:
-            trail_zeros = 1
-        else:
-            a = (2**np.arange(64, dtype = np.uint64) & number)
-            trail_zeros = (a==0).argmin()
-
-        return trail_zeros
-
-    @staticmethod
-    def BitscanReverse(number):
-        # return number of leading zeroes
-        a = (np.uint64(2)**np.arange(64, dtype=np.uint64) & number)
-        
-        return 64-a.argmax()-1
-
-    def PossibleBishopMoves(self, piece_type, square):
-        # blockers is all other pieces except itself
-        blockers = self.board.occupied & ~self.board.SquareToBB(square)
-
-        #setup result
-        result = np.uint64(0)
-
-        # NE
-        ray = self.RAYS['NE'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-                
-        else:
-            n = np.uint64(1) << np.uint64(self.BitscanForward(masked_blockers))
-
-            r = ray & ~self.RAYS['NE'][self.board.BBToSquares(n)[0]]
-
-            result |= r
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['NE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['NE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        # NW        
-        ray = self.RAYS['NW'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-        else:
-            n = np.uint64(1) << np.uint64(self.BitscanForward(masked_blockers))
-
-            r = ray & ~self.RAYS['NW'][self.board.BBToSquares(n)[0]]
-
-            result |= r 
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['NW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type  == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['NW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        #SE
-        ray = self.RAYS['SE'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-        else:
-            n = 2**64 >> np.uint64(self.BitscanReverse(masked_blockers) + 1)
-
-            r = ray & ~self.RAYS['SE'][self.board.BBToSquares(n)[0]]
-
-            result |= r
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['SE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares|= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['SE'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        #SW
-        ray = self.RAYS['SW'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'B' and self.board.active_piece == 'b') or (piece_type == 'b' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-        else:
-            n = 2**64 >> np.uint64(self.BitscanReverse(masked_blockers) + 1)
-
-            r = ray & ~self.RAYS['SW'][self.board.BBToSquares(n)[0]]
-
-            result |= r 
-
-            if piece_type == 'B' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['SW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'b' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['SW'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        return result
-        
-
-    def PossibleRookMoves(self, piece_type, square):
-        # blockers is all other pieces except itself
-        blockers = self.board.occupied & ~self.board.SquareToBB(square)
-
-        #setup result
-        result = np.uint64(0)
-
-        # N
-        ray = self.RAYS['N'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-        else:
-            n = np.uint64(1) << np.uint64(self.BitscanForward(masked_blockers))
-
-            r = ray & ~self.RAYS['N'][self.board.BBToSquares(n)[0]]
-
-            result |= r 
-
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['N'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['N'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        # E        
-        ray = self.RAYS['E'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
+        enemy_pawns, enemy_knights, enemy_bishops, enemy_rooks, enemy_queens, _ = self.enemy
+        occupied = self.occupied
+        between = BETWEEN[king_sq]
+
+        # the attack map says whether there is a check to find
+        if self.enemy_attacks & SQUARE_BBS[king_sq]:
+            checkers = ((KNIGHT_ATTACKS[king_sq] & enemy_knights) |
+                        (PAWN_ATTACKS['w' if white else 'b'][king_sq] & enemy_pawns))
         else:
-            n = 2**64 >> np.uint64(self.BitscanReverse(masked_blockers) + 1)
-
-            r = ray & ~self.RAYS['E'][self.board.BBToSquares(n)[0]]
-            
-            result |= r 
-
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['E'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['E'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-
-        #W
-        ray = self.RAYS['W'][square]
-        masked_blockers = ray & blockers
-
-        if masked_blockers == 0:
-            result |= ray
-
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
-
+            checkers = 0
+
+        push_mask = 0
+        pinned = 0
+        pin_rays = {}
+
+        snipers = ((BISHOP_RAYS[king_sq] & (enemy_bishops | enemy_queens)) |
+                   (ROOK_RAYS[king_sq] & (enemy_rooks | enemy_queens)))
+
+        for sq in Squares(snipers):
+            blockers = between[sq] & occupied
+
+            if not blockers:
+                checkers |= SQUARE_BBS[sq]
+                push_mask |= between[sq]
+            elif blockers & (blockers - 1) == 0 and blockers & self.own_pieces:
+                pinned |= blockers
+                pin_rays[64 - blockers.bit_length()] = between[sq] | SQUARE_BBS[sq]
+
+        self.checkers = checkers
+        self.pinned = pinned
+        self.pin_rays = pin_rays
+        self.number_of_attackers = PopCount(checkers)
+
+        if self.number_of_attackers == 0:
+            self.capture_mask = FULL
+            self.push_mask = FULL
+        elif self.number_of_attackers == 1:
+            self.capture_mask = checkers
+            self.push_mask = push_mask
         else:
-            n = np.uint64(1) << np.uint64(self.BitscanForward(masked_blockers))
+            self.capture_mask = 0
+            self.push_mask = 0
 
-            r = ray & ~self.RAYS['W'][self.board.BBToSquares(n)[0]]
+        self.board.attackers = self.board.U64(checkers)
 
-            result |= r
+    def PossibleKingMoves(self, king_sq, white):
+        king = 'K' if white else 'k'
+        targets = KING_ATTACKS[king_sq] & ~self.own_pieces & ~self.enemy_attacks
 
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['W'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = np.uint64(1) << np.uint64(self.BitscanForward(msbs_without_king))
-                r_prime = ray & ~self.RAYS['W'][self.board.BBToSquares(n_prime)[0]]
-
-                self.board.king_danger_squares |= r_prime
+        # a checking slider also attacks the squares behind the king, which the attack map has it stopping at
+        for sq in Squares(self.checkers & (self.enemy[2] | self.enemy[3] | self.enemy[4])):
+            if ROOK_RAYS[sq] & SQUARE_BBS[king_sq]:
+                targets &= ~RookAttacks(sq, self.occupied ^ SQUARE_BBS[king_sq])
+            else:
+                targets &= ~BishopAttacks(sq, self.occupied ^ SQUARE_BBS[king_sq])
 
-        #S
-        ray = self.RAYS['S'][square]
-        masked_blockers = ray & blockers
+        self.AddPieceMoves(king, king_sq, targets)
 
-        if masked_blockers == 0:
-            result |= ray
-            
-            if (piece_type == 'R' and self.board.active_piece == 'b') or (piece_type == 'r' and self.board.active_piece == 'w'):
-                self.board.king_danger_squares |= ray
+        if self.number_of_attackers or self.captures_only or self.board.castling_rights == '-':
+            return
 
-        else:
-            n = 2**64 >> np.uint64(self.BitscanReverse(masked_blockers) + 1)
+        rooks = self.own[3]
 
-            r = ray & ~self.RAYS['S'][self.board.BBToSquares(n)[0]]
+        for right in self.board.castling_rights:
+            if right.isupper() != white:
+                continue
 
-            result |= r 
+            initial_sq, final_sq, empty_squares, crossed_squares = CASTLING[right]
 
-            if piece_type == 'R' and self.board.active_piece == 'b':
-                msbs_without_king = masked_blockers & ~self.board.black_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['S'][self.board.BBToSquares(n_prime)[0]]
+            if (initial_sq == king_sq and rooks & SQUARE_BBS[CASTLING_ROOKS[right]] and
+                    not self.occupied & empty_squares and not self.enemy_attacks & crossed_squares):
+                move_list = self.move_list
+                move_list.moves[move_list.count] = PIECE_BITS[king] | CASTLE | initial_sq | (final_sq << 6)
+                move_list.count += 1
 
-                self.board.king_danger_squares |= r_prime
-                
-            elif piece_type == 'r' and self.board.active_piece == 'w':
-                msbs_without_king = masked_blockers & ~self.board.white_king
-                n_prime = 2**64 >> np.uint64(self.BitscanReverse(msbs_without_king) + 1)
-                r_prime = ray & ~self.RAYS['S'][self.board.BBToSquares(n_prime)[0]]
+    def GenerateAllPossibleMoves(self, ply=0, captures_only=False):
+        """
+        Fill the move list for ply with the legal moves (packed, see moveEncoding) and return it.
+        The list is reused the next time moves are generated at the same ply.
+        captures_only leaves out quiet moves (promotions are kept), without building them first
+        """
+        self.captures_only = captures_only
 
-                self.board.king_danger_squares |= r_prime
+        self.move_list = self.move_lists[ply]
+        self.move_list.count = 0
 
-        return result
+        white = self.board.active_piece == 'w'
+        attack_map = self.board.GetAttackMap()
+        bitboards = attack_map.bitboards
+        us, them = (0, 1) if white else (1, 0)
 
+        self.own, self.enemy = bitboards[6 * us:6 * us + 6], bitboards[6 * them:6 * them + 6]
+        self.own_pieces = attack_map.pieces[us]
+        self.enemy_pieces = attack_map.pieces[them]
+        self.occupied = attack_map.occupied
+        self.enemy_attacks = attack_map.attacked[them]
 
-    def GetPossibleMoves(self, piece_type, initial_sq):
-        """
-        For a given piece type and square, the function appends to the list of all possible moves, all moves for given piece at given square
-        Attacked squares bitboard is also calculated
-        """ 
-        if piece_type  == 'N':
-            attack_set = self.KNIGHT_TABLE[initial_sq] & (self.board.all_blacks | self.board.empty)
+        pawns, knights, bishops, rooks, queens, king = self.own
+        king_sq = 64 - king.bit_length()
 
-            if self.board.active_piece == 'b':
-                self.board.king_danger_squares |= attack_set
+        self.FindCheckersAndPins(king_sq, white)
 
-            elif self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                # filter ally move
-                attack_set = attack_set & (self.capture_mask | self.push_mask)
+        if self.number_of_attackers < 2:
+            pinned = self.pinned
+            capture_mask = self.capture_mask
+            push_mask = self.push_mask
+            # anything but our own pieces, limited to the squares that deal with a check
+            targets = (capture_mask & self.enemy_pieces) | (push_mask & ~self.occupied)
 
-                for dest_sq in self.board.BBToSquares(attack_set):
-                    self.possible_moves.append((piece_type, initial_sq, dest_sq, '_'))
+            # pawns are moved set-wise, apart from pinned ones which each keep to their pin ray
+            PawnMoves = self.PossibleWhitePawnMoves if white else self.PossibleBlackPawnMoves
+            PawnMoves(pawns & ~pinned, capture_mask, push_mask)
 
-        elif piece_type == 'n':
-            attack_set = self.KNIGHT_TABLE[initial_sq] & (self.board.all_whites | self.board.empty)
+            for sq in Squares(pawns & pinned):
+                PawnMoves(SQUARE_BBS[sq], capture_mask & self.pin_rays[sq], push_mask & self.pin_rays[sq])
 
-            if self.board.active_piece == 'w':
-                self.board.king_danger_squares |= attack_set
-            elif self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                # filter ally move
-                attack_set = attack_set & (self.capture_mask | self.push_mask)
+            self.PossibleEnPassant(king_sq, white)
 
-                for dest_sq in self.board.BBToSquares(attack_set):
-                    self.possible_moves.append((piece_type, initial_sq, dest_sq, '_'))
+            # a pinned knight can never move
+            for sq in Squares(knights & ~pinned):
+                self.AddPieceMoves('N' if white else 'n', sq, KNIGHT_ATTACKS[sq] & targets)
 
-        elif piece_type == 'K':
-            attack_set = self.KING_TABLE[initial_sq] & (self.board.all_blacks | self.board.empty)
+            for piece_type, sliders, Attacks in (('B', bishops, BishopAttacks), ('R', rooks, RookAttacks),
+                                                 ('Q', queens, BishopAttacks), ('Q', queens, RookAttacks)):
+                piece_type = piece_type if white else piece_type.lower()
 
-            if self.board.active_piece == 'w':
-                self.king_pseudo_legal_bitboard = attack_set
-            
-            else:
-                self.board.king_danger_squares |= self.KING_TABLE[initial_sq]
+                for sq in Squares(sliders):
+                    dest_squares = Attacks(sq, self.occupied) & targets
 
-        elif piece_type == 'k':
-            attack_set = self.KING_TABLE[initial_sq] & (self.board.all_whites | self.board.empty)
+                    if pinned & SQUARE_BBS[sq]:
+                        dest_squares &= self.pin_rays[sq]
 
-            if self.board.active_piece == 'b':
-                self.king_pseudo_legal_bitboard = attack_set
-            else:
-                self.board.king_danger_squares |= self.KING_TABLE[initial_sq]
-        
-        elif piece_type == 'B':
-            result = self.PossibleBishopMoves(piece_type, initial_sq)
+                    self.AddPieceMoves(piece_type, sq, dest_squares)
 
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
+        self.PossibleKingMoves(king_sq, white)
 
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('B', initial_sq, dest_sq, '_'))
-
-        elif piece_type == 'b':
-            result = self.PossibleBishopMoves(piece_type, initial_sq)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                result &= (self.board.all_whites | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('b', initial_sq, dest_sq, '_'))
-            
-        elif piece_type == 'R':
-            result = self.PossibleRookMoves(piece_type, initial_sq)
-
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('R', initial_sq, dest_sq, '_'))
-
-        elif piece_type == 'r':
-            result = self.PossibleRookMoves(piece_type, initial_sq)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                result &= (self.board.all_whites | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('r', initial_sq, dest_sq, '_'))
-            
-        elif piece_type == 'Q':
-            result = self.PossibleBishopMoves('B', initial_sq) | self.PossibleRookMoves('R', initial_sq)
-
-            if self.board.active_piece == 'w' and self.number_of_attackers <= 1:
-                result &= (self.board.all_blacks | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('Q', initial_sq, dest_sq, '_'))
-
-        elif piece_type == 'q':
-            result = self.PossibleBishopMoves('b', initial_sq) | self.PossibleRookMoves('r', initial_sq)
-
-            if self.board.active_piece == 'b' and self.number_of_attackers <= 1:
-                result &= (self.board.all_whites | self.board.empty)
-                result &= (self.capture_mask | self.push_mask)
-
-                for dest_sq in self.board.BBToSquares(result):
-                    self.possible_moves.append(('q', initial_sq, dest_sq, '_'))
-    
-
-    def FilterKingMoves(self):
-        filtered = self.king_pseudo_legal_bitboard & ~self.board.king_danger_squares
-
-        for dest_sq in self.board.BBToSquares(filtered):
-            self.possible_moves.append((self.ally_king[0], self.ally_king[1], dest_sq, '_'))
-
-    def GetAttackers(self):
-        ally_king_square = self.ally_king[1]
-        self.board.attackers = np.uint64(0)
-
-        for piece in self.board.pieces:
-            piece_type, piece_square = piece
-            if ((piece_type.isupper() and self.board.active_piece == 'b') or (piece_type.islower() and self.board.active_piece == 'w')) and (piece_type != 'K' or piece_type != 'k'):
-                # is enemy piece and not king
-
-                if piece_type == 'N':
-                    self.board.attackers |= (self.KNIGHT_TABLE[ally_king_square] & self.board.white_knights)
-                
-                elif piece_type == 'n':
-                    self.board.attackers |= (self.KNIGHT_TABLE[ally_king_square] & self.board.black_knights)
-
-                elif piece_type == 'B':
-                    self.board.attackers |= (self.PossibleBishopMoves('B', ally_king_square) & self.board.white_bishops)
-
-                elif piece_type == 'b':
-                    self.board.attackers |= (self.PossibleBishopMoves('b', ally_king_square) & self.board.black_bishops)
-
-                elif piece_type == 'R':
-                    self.board.attackers |= (self.PossibleRookMoves('R', ally_king_square) & self.board.white_rooks)
-
-                elif piece_type == 'r':
-                    self.board.attackers |= (self.PossibleRookMoves('r', ally_king_square) & self.board.black_rooks)
-
-                elif piece_type == 'Q':
-                    queen_moves = self.PossibleBishopMoves('B', ally_king_square) | self.PossibleRookMoves('R', ally_king_square)
-                    self.board.attackers |= (queen_moves & self.board.white_queen)
-                
-                elif piece_type == 'q':
-                    queen_moves = self.PossibleBishopMoves('b', ally_king_square) | self.PossibleRookMoves('r', ally_king_square)
-                    self.board.attackers |= (queen_moves & self.board.black_queen)
-
-                elif piece_type == 'P':
-                    if (self.PossibleWhitePawnCaptures(piece_square) & self.board.black_king) != 0:
-                        self.board.attackers |= self.board.SquareToBB(piece_square)
-
-                elif piece_type == 'p':
-                    if (self.PossibleBlackPawnCaptures(piece_square) & self.board.white_king) != 0:
-                        self.board.attackers |= self.board.SquareToBB(piece_square)
-        
-        if self.board.attackers in (2**np.arange(64)):
-            self.number_of_attackers = 1
-        
-        elif self.board.attackers == 0:
-            self.number_of_attackers = 0
-  
-    def SetMoveFilters(self):
-        # set capture and push masks
-        if self.number_of_attackers == 1:
-            self.capture_mask = self.board.attackers
-
-            # setup push mask....
-        
-        elif self.number_of_attackers == 0:
-            self.capture_mask = (2**64) - 1
-            self.push_mask = (2**64) - 1
-
-                  
-    def GenerateAllPossibleMoves(self):
-        # reset attacked squares bitboard, and possible moves list
-        self.board.attacked_squares = np.uint64(0)
-        self.king_pseudo_legal_bitboard = np.uint64(0)
-
-        self.capture_mask = np.uint(0)
-        self.push_mask = np.uint64(0)
-
-        self.possible_moves = []
-
-        self.ally_king = list(filter(lambda piece : ((piece[0] == 'K' and self.board.active_piece == 'w') or (piece[0] == 'k' and self.board.active_piece == 'b')), self.board.pieces))[0]
-        
-        self.GetAttackers()
-        self.SetMoveFilters()  
-
-        # THIS MUST STAY HERE ****************************
-                                                        
-        self.board.king_danger_squares = np.uint64(0)  
-
-        #*************************************************
-
-        # pawn moves, pawns code does all possible moves for all pawns on board in one go, so doesn't go into for loop
-        self.PossibleWhitePawnMoves()
-        self.PossibleBlackPawnMoves()
-
-        for piece_type, initial_sq in self.board.pieces:
-            if piece_type != 'P' and piece_type != 'p':
-                self.GetPossibleMoves(piece_type, initial_sq)
-    
-        self.FilterKingMoves()
-    
-if __name__ == "main":
-    moveGen = GenerateMoves()
-
-
-        
\ No newline at end of file
+        return self.move_list
@@ -0,0 +1,124 @@
+"""
+Move ordering for alpha-beta search. The earlier the best move is searched the more of the tree is cut off, so every
+move in a ply's move list gets a score and moves are picked best first:
+
+    hash move (best move stored in the transposition table)
+    captures, most valuable victim first, then least valuable attacker first (MVV-LVA)
+    promotions
+    killer moves (quiet moves that caused a cutoff at the same ply)
+    other quiet moves, by history score (how often the move caused a cutoff anywhere in the tree)
+
+Moves are picked with one step of selection sort at a time instead of a full sort, as most nodes cut off after a move
+or two.
+"""
+from array import array
+
+from moveEncoding import PIECE_INDEX, CAPTURE, EN_PASSANT, MAX_MOVES, MAX_PLY
+
+HASH_MOVE_SCORE = 1000000
+CAPTURE_SCORE = 100000
+PROMOTION_SCORE = 90000
+KILLER_SCORES = (80000, 79000)
+HISTORY_MAX = 50000 # quiet moves never outscore killers
+
+# by piece index in moveEncoding.PIECES, colour doesn't matter
+PIECE_VALUES = (1, 3, 3, 5, 9, 20) * 2
+PROMOTION_VALUES = (0, 3, 3, 5, 9)
+
+
+class MoveOrderer:
+    def __init__(self):
+        # scores[ply][i] is the score of move i in that ply's move list
+        self.scores = [array('i', bytes(4 * MAX_MOVES)) for _ in range(MAX_PLY)]
+
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+
+        # history[piece index][final square]
+        self.history = [[0] * 64 for _ in range(12)]
+
+    def Clear(self):
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+
+        for piece_history in self.history:
+            piece_history[:] = [0] * 64
+
+    def NewSearch(self):
+        # keep what was learnt in the last search, but let this one's cutoffs count for more
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+
+        for piece_history in self.history:
+            piece_history[:] = [score // 2 for score in piece_history]
+
+    def ScoreMoves(self, move_list, ply, hash_move, console_board):
+        scores = self.scores[ply]
+        moves = move_list.moves
+        killer_1, killer_2 = self.killers[ply]
+
+        for i in range(move_list.count):
+            move = moves[i]
+
+            if move == hash_move:
+                score = HASH_MOVE_SCORE
+
+            elif move & CAPTURE:
+                if move & EN_PASSANT:
+                    victim = 1
+                else:
+                    victim = PIECE_VALUES[PIECE_INDEX[console_board[(move >> 6) & 63]]]
+
+                score = CAPTURE_SCORE + 100 * victim - PIECE_VALUES[(move >> 12) & 15] + PROMOTION_VALUES[(move >> 16) & 7]
+
+            elif (move >> 16) & 7:
+                score = PROMOTION_SCORE + PROMOTION_VALUES[(move >> 16) & 7]
+
+            elif move == killer_1:
+                score = KILLER_SCORES[0]
+
+            elif move == killer_2:
+                score = KILLER_SCORES[1]
+
+            else:
+                score = self.history[(move >> 12) & 15][(move >> 6) & 63]
+
+            scores[i] = score
+
+    def NextMove(self, move_list, ply, index):
+        """
+        Swap the best scoring move from index onwards into index and return it
+        """
+        scores = self.scores[ply]
+        moves = move_list.moves
+
+        best = index
+        best_score = scores[index]
+
+        for i in range(index + 1, move_list.count):
+            if scores[i] > best_score:
+                best = i
+                best_score = scores[i]
+
+        if best != index:
+            moves[index], moves[best] = moves[best], moves[index]
+            scores[index], scores[best] = scores[best], scores[index]
+
+        return moves[index]
+
+    def UpdateCutoff(self, move, ply, depth):
+        # a quiet move caused a beta cutoff
+        if move & CAPTURE or (move >> 16) & 7:
+            return
+
+        killers = self.killers[ply]
+
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        piece_history = self.history[(move >> 12) & 15]
+        piece_history[(move >> 6) & 63] += depth * depth
+
+        if piece_history[(move >> 6) & 63] > HISTORY_MAX:
+            for piece_history in self.history:
+                piece_history[:] = [score // 2 for score in piece_history]
@@ -0,0 +1,96 @@
+"""
+Fixed size hash table of pawn structure evaluations, keyed only by the two pawn bitboards.
+
+Pawns move far less often than pieces, so most positions in a search share their pawns with many others and the pawn
+terms (evaluation.PawnStructure) only need working out once for each pawn structure.
+
+One entry is 8 uint64 words, 64 bytes:
+    white_pawns, black_pawns  - the key, so a hit is always for exactly these pawns
+    scores                    - middlegame and endgame scores, 32 bit two's complement each, middlegame low
+    shields                   - king shield scores by wing, as packed by PawnStructure
+    white_passed, black_passed, white_attacks, black_attacks
+
+An empty (zeroed) entry is the entry of a position without pawns, which is also all zeroes, so it needs no flag.
+"""
+import numpy as np
+
+from bitOperations import FULL
+from evaluation import PawnStructure
+
+ENTRY_WORDS = 8
+ENTRY_SIZE = 8 * ENTRY_WORDS
+
+SCORE_MASK = (1 << 32) - 1
+SCORE_HALF = 1 << 31
+
+# odd 64 bit constants mixing the two bitboards into an index (golden ratio and splitmix64)
+BLACK_MULTIPLIER = 0x9E3779B97F4A7C15
+INDEX_MULTIPLIER = 0xBF58476D1CE4E5B9
+
+PAWN_HASH_ENTRIES = 1 << 14 # 1MB
+
+
+class PawnHashTable:
+    """
+    Pawn structure results by white_pawns and black_pawns. entries is rounded down to a power of two and the table is
+    allocated up front. Each index holds one entry, always replaced, since an entry is cheap to work out again
+    """
+    def __init__(self, entries=PAWN_HASH_ENTRIES):
+        entries = max(1, int(entries))
+        index_bits = entries.bit_length() - 1
+
+        self.entries = 1 << index_bits
+        self.index_shift = 64 - index_bits
+        self.table = np.zeros((self.entries, ENTRY_WORDS), dtype=np.uint64)
+
+        # statistics
+        self.probes = 0
+        self.hits = 0
+
+    def Clear(self):
+        self.table.fill(0)
+        self.probes = 0
+        self.hits = 0
+
+    def Index(self, white_pawns, black_pawns):
+        # high bits of a multiplicative hash, the low bits of the bitboards are mostly the same
+        key = (white_pawns ^ black_pawns * BLACK_MULTIPLIER) & FULL
+
+        return ((key * INDEX_MULTIPLIER) & FULL) >> self.index_shift
+
+    def Probe(self, white_pawns, black_pawns):
+        """
+        (middlegame score, endgame score, shields, white passed pawns, black passed pawns, white pawn attacks, black
+        pawn attacks) for the pawns, as from evaluation.PawnStructure. Worked out and stored on a miss
+        """
+        self.probes += 1
+        index = self.Index(white_pawns, black_pawns)
+        entry = self.table[index].tolist()
+
+        if entry[0] == white_pawns and entry[1] == black_pawns:
+            self.hits += 1
+            scores = entry[2]
+
+            return (((scores + SCORE_HALF) & SCORE_MASK) - SCORE_HALF,
+                    (((scores >> 32) + SCORE_HALF) & SCORE_MASK) - SCORE_HALF, *entry[3:])
+
+        result = PawnStructure(white_pawns, black_pawns)
+        mg, eg = result[:2]
+
+        self.table[index] = (white_pawns, black_pawns, (mg & SCORE_MASK) | (eg & SCORE_MASK) << 32, *result[2:])
+
+        return result
+
+    def HitRate(self):
+        if self.probes == 0:
+            return 0
+
+        return self.hits / self.probes
+
+    def Used(self):
+        # entries holding a pawn structure (a position without pawns looks like an empty entry)
+        return int(np.count_nonzero(self.table[:, 0] | self.table[:, 1]))
+
+    def __str__(self):
+        return (f'pawn hash entries {self.entries} used {self.Used()} probes {self.probes} hits {self.hits} '
+                f'hit rate {self.HitRate():.1%}')
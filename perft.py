@@ -0,0 +1,318 @@
+import argparse
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from classicalBitboard import Board
+from moveEncoding import MoveToUci
+from moveGeneration import GenerateMoves
+
+
+class Perft:
+    """
+    Perft (performance test) walks the move generation tree to a fixed depth and counts the leaf nodes.
+    The counts are compared against known values to find move generation bugs, and the time taken is the
+    baseline used to judge every speed change to GenerateMoves and Board.MakeMove
+    """
+    def __init__(self, fen, backend='int', debug=False):
+        self.fen = fen
+
+        self.board = Board(backend, debug)
+        self.board.LoadFen(fen)
+
+        self.moveGen = GenerateMoves(self.board)
+
+    @staticmethod
+    def MoveToString(move):
+        # same format as the 'divide' output of other engines, so results can be diffed line by line
+        return MoveToUci(move)
+
+    def GetMoves(self, board, ply=0):
+        self.moveGen.board = board
+
+        # each ply has its own move list, so the lists of the plies above are untouched while this one is walked
+        return self.moveGen.GenerateAllPossibleMoves(ply)
+
+    def Search(self, board, depth, ply=0):
+        if depth == 0:
+            return 1
+
+        moves = self.GetMoves(board, ply)
+
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+
+        for move in moves:
+            board.MakeMove(move)
+            nodes += self.Search(board, depth - 1, ply + 1)
+            board.UnmakeMove()
+
+        return nodes
+
+    def Split(self, split_depth, ply=0, path=()):
+        """
+        Paths (tuples of packed moves from the root) to every position split_depth plies down, the subtrees a parallel
+        perft hands out to worker processes
+        """
+        if ply == split_depth:
+            return [path]
+
+        paths = []
+
+        for move in self.GetMoves(self.board, ply):
+            self.board.MakeMove(move)
+            paths += self.Split(split_depth, ply + 1, path + (move,))
+            self.board.UnmakeMove()
+
+        return paths
+
+    def Divide(self, depth):
+        """
+        Returns a list of (move, nodes) pairs, one for each root move, with the number of leaf nodes below it
+        """
+        result = []
+
+        for move in self.GetMoves(self.board):
+            self.board.MakeMove(move)
+            result.append((move, self.Search(self.board, depth - 1, 1)))
+            self.board.UnmakeMove()
+
+        return result
+
+    def Run(self, depth, divide=False):
+        """
+        Returns (nodes, seconds taken). Prints per root move counts if divide is set
+        """
+        start = time.perf_counter()
+
+        if divide and depth > 0:
+            nodes = 0
+
+            for move, move_nodes in self.Divide(depth):
+                print(f'{self.MoveToString(move)}: {move_nodes}')
+                nodes += move_nodes
+        else:
+            nodes = self.Search(self.board, depth)
+
+        return nodes, time.perf_counter() - start
+
+
+# one Perft per position in each worker process, reused for every subtree of that position the worker is given
+_worker_perfts = {}
+
+
+def PerftSubtree(fen, path, depth, backend, debug):
+    """
+    Run in a worker process: count the leaf nodes depth plies below the position reached by playing path from fen.
+    path is the packed moves as bytes of an array('I'), much smaller to send than a FEN per subtree.
+    Returns (fen, path, nodes, worker pid, seconds taken)
+    """
+    start = time.perf_counter()
+
+    perft = _worker_perfts.get((fen, backend, debug))
+
+    if perft is None:
+        perft = _worker_perfts[(fen, backend, debug)] = Perft(fen, backend, debug)
+
+    moves = array('I', path)
+
+    for move in moves:
+        perft.board.MakeMove(move)
+
+    nodes = perft.Search(perft.board, depth, len(moves))
+
+    for _ in moves:
+        perft.board.UnmakeMove()
+
+    return fen, path, nodes, os.getpid(), time.perf_counter() - start
+
+
+def ParallelPerft(fens, depth, jobs=None, backend='int', debug=False, split_depth=None):
+    """
+    Perft of every position in fens, split across a pool of jobs worker processes (None for one per core). The first
+    split_depth plies of each tree are expanded here and every subtree below them is counted by whichever worker is
+    free, so all positions share the pool and it stays busy until the last subtree.
+    Returns ({fen : nodes}, {fen : {root move : nodes}}, {worker pid : [subtrees, nodes, seconds]}, seconds taken)
+    """
+    start = time.perf_counter()
+
+    if split_depth is None:
+        # a few thousand subtrees a position for deep runs, enough to balance the load without the pool's overhead
+        # per subtree swamping shallow ones
+        split_depth = 1 if depth < 5 else 2
+
+    split_depth = min(split_depth, depth)
+
+    nodes = {fen : 0 for fen in fens}
+    divide = {fen : {} for fen in fens}
+    workers = {}
+
+    with ProcessPoolExecutor(jobs) as executor:
+        futures = []
+
+        for fen in fens:
+            for path in Perft(fen, backend).Split(split_depth):
+                futures.append(executor.submit(PerftSubtree, fen, array('I', path).tobytes(), depth - split_depth,
+                                               backend, debug))
+
+        for future in as_completed(futures):
+            fen, path, subtree_nodes, pid, seconds = future.result()
+
+            nodes[fen] += subtree_nodes
+
+            if path:
+                root_move = array('I', path)[0]
+                divide[fen][root_move] = divide[fen].get(root_move, 0) + subtree_nodes
+
+            worker = workers.setdefault(pid, [0, 0, 0.0])
+            worker[0] += 1
+            worker[1] += subtree_nodes
+            worker[2] += seconds
+
+    return nodes, divide, workers, time.perf_counter() - start
+
+
+def ReadFens(path):
+    fens = []
+
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+
+            if line and line not in fens:
+                fens.append(line)
+
+    return fens
+
+
+def ReadExpectedCounts(path):
+    """
+    Expected counts are stored one position per line in the EPD perft format:
+        <fen> ;D1 20 ;D2 400 ;D3 8902
+    """
+    expected = {}
+
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+
+            if not line:
+                continue
+
+            fen, *counts = line.split(';')
+            fen = fen.strip()
+            expected[fen] = {}
+
+            for count in counts:
+                depth, nodes = count.split()
+                expected[fen][int(depth[1:])] = int(nodes)
+
+    return expected
+
+
+def FormatNps(nodes, seconds):
+    if seconds == 0:
+        return 'inf'
+
+    return f'{nodes / seconds:.0f}'
+
+
+def CheckCount(expected, fen, depth, nodes):
+    # status shown for a position, and whether it failed
+    expected_nodes = expected.get(fen, {}).get(depth)
+
+    if expected_nodes is None:
+        return 'no expected count', False
+    elif expected_nodes == nodes:
+        return 'OK', False
+    else:
+        return f'FAIL (expected {expected_nodes})', True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run perft over a list of FEN positions')
+    parser.add_argument('fen_files', nargs='*', default=['fens.txt'], help='files with one FEN per line (default: fens.txt)')
+    parser.add_argument('-d', '--depth', type=int, default=3)
+    parser.add_argument('--fen', action='append', default=[], help='extra FEN to run, can be given more than once')
+    parser.add_argument('--divide', action='store_true', help='print node counts for each root move')
+    parser.add_argument('--backend', choices=['int', 'numpy'], default='int', help='bitboard backend used by Board')
+    parser.add_argument('--debug', action='store_true', help='check incrementally updated board state after every move')
+    parser.add_argument('--expected', default='perft_counts.txt', help='file of expected node counts')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='worker processes to split the trees across, 0 for one per core')
+    parser.add_argument('--split-depth', type=int, help='plies expanded before handing subtrees to workers '
+                                                        '(default: 1, or 2 from depth 5)')
+    args = parser.parse_args(argv)
+
+    fens = list(args.fen)
+
+    for path in args.fen_files:
+        for fen in ReadFens(path):
+            if fen not in fens:
+                fens.append(fen)
+
+    try:
+        expected = ReadExpectedCounts(args.expected)
+    except FileNotFoundError:
+        expected = {}
+
+    if args.jobs != 1:
+        return RunParallel(fens, expected, args)
+
+    total_nodes = 0
+    total_time = 0
+    failed = 0
+
+    for fen in fens:
+        print(fen)
+
+        nodes, seconds = Perft(fen, args.backend, args.debug).Run(args.depth, args.divide)
+        total_nodes += nodes
+        total_time += seconds
+
+        status, fen_failed = CheckCount(expected, fen, args.depth, nodes)
+        failed += fen_failed
+
+        print(f'depth {args.depth}  nodes {nodes}  time {seconds:.3f}s  nps {FormatNps(nodes, seconds)}  {status}\n')
+
+    print(f'positions {len(fens)}  failed {failed}')
+    print(f'total nodes {total_nodes}  total time {total_time:.3f}s  nps {FormatNps(total_nodes, total_time)}')
+
+    return 1 if failed else 0
+
+
+def RunParallel(fens, expected, args):
+    # positions run at the same time, so only the totals are timed
+    nodes, divide, workers, seconds = ParallelPerft(fens, args.depth, args.jobs or None, args.backend, args.debug,
+                                                    args.split_depth)
+    failed = 0
+
+    for fen in fens:
+        print(fen)
+
+        if args.divide:
+            for move, move_nodes in sorted(divide[fen].items(), key=lambda item: MoveToUci(item[0])):
+                print(f'{MoveToUci(move)}: {move_nodes}')
+
+        status, fen_failed = CheckCount(expected, fen, args.depth, nodes[fen])
+        failed += fen_failed
+
+        print(f'depth {args.depth}  nodes {nodes[fen]}  {status}\n')
+
+    for pid, (subtrees, worker_nodes, busy) in sorted(workers.items()):
+        print(f'worker {pid}  subtrees {subtrees}  nodes {worker_nodes}  busy {busy:.3f}s  '
+              f'nps {FormatNps(worker_nodes, busy)}')
+
+    total_nodes = sum(nodes.values())
+
+    print(f'positions {len(fens)}  failed {failed}  workers {len(workers)}')
+    print(f'total nodes {total_nodes}  total time {seconds:.3f}s  nps {FormatNps(total_nodes, seconds)}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
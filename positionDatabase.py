@@ -0,0 +1,258 @@
+"""
+Fixed-width binary records of positions, and a file of them read with numpy.memmap:
+
+    python positionDatabase.py fens.txt positions.bin
+    python positionDatabase.py positions.bin --to-fen
+
+A record is RECORD_SIZE (104) bytes, little endian:
+
+    12 x uint64  piece bitboards in PIECES order (PNBRQKpnbrqk), square 0 (a8) is the most significant bit
+    uint16       halfmove clock
+    uint16       fullmove number
+    uint8        side to move, 0 white 1 black
+    uint8        castling rights, K 1  Q 2  k 4  q 8
+    uint8        en-passant square, NO_EN_PASSANT for none
+    1 pad byte
+
+Loading one into a Board is a struct unpack and Board.LoadPosition, no string parsing, and the records of a whole file
+are a structured numpy array (see POSITION_DTYPE), so bulk work like batchEvaluation can use the bitboards directly.
+
+A PositionDB file is HEADER_SIZE bytes of header (MAGIC and the record size) followed by the records.
+"""
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+from classicalBitboard import Board
+
+RECORD = struct.Struct('<12QHHBBBx')
+RECORD_SIZE = RECORD.size
+
+POSITION_DTYPE = np.dtype([('bitboards', '<u8', (12,)), ('halfmove', '<u2'), ('fullmove', '<u2'), ('side', 'u1'),
+                           ('castling', 'u1'), ('en_passant', 'u1'), ('pad', 'V1')])
+
+assert POSITION_DTYPE.itemsize == RECORD_SIZE
+
+MAGIC = b'BBPOSDB1'
+HEADER = struct.Struct('<8sI4x')
+HEADER_SIZE = HEADER.size
+
+CASTLING_BITS = {'K' : 1, 'Q' : 2, 'k' : 4, 'q' : 8}
+NO_EN_PASSANT = 255
+
+# castling rights string of each 4 bit value, always in KQkq order
+CASTLING_STRINGS = [''.join(right for right, bit in CASTLING_BITS.items() if value & bit) or '-' for value in range(16)]
+
+EN_PASSANT_SQUARES = {chr(97 + sq % 8) + str(8 - sq // 8) : sq for sq in range(64)}
+EN_PASSANT_NAMES = {sq : name for name, sq in EN_PASSANT_SQUARES.items()}
+EN_PASSANT_NAMES[NO_EN_PASSANT] = '-'
+
+WRITE_BUFFER = 1 << 20 # bytes of records PositionWriter collects before writing them out
+
+
+def PackPosition(board):
+    """
+    The record of the position on board, as bytes
+    """
+    castling = 0
+
+    if board.castling_rights != '-':
+        for right in board.castling_rights:
+            castling |= CASTLING_BITS[right]
+
+    en_passant = NO_EN_PASSANT if board.en_passant == '-' else EN_PASSANT_SQUARES[board.en_passant]
+
+    return RECORD.pack(*map(int, board.PieceBitboards()), board.ply, board.moves, board.active_piece == 'b', castling,
+                       en_passant)
+
+
+def LoadRecord(board, buffer, offset=0):
+    """
+    Set board up from the record at offset in buffer (bytes, a memmap, anything with the buffer protocol)
+    """
+    *bbs, ply, moves, side, castling, en_passant = RECORD.unpack_from(buffer, offset)
+
+    board.LoadPosition(bbs, 'b' if side else 'w', CASTLING_STRINGS[castling], EN_PASSANT_NAMES[en_passant], ply, moves)
+
+
+def FensToRecords(fens, backend='int'):
+    """
+    Structured POSITION_DTYPE array of the positions of an iterable of FENs
+    """
+    board = Board(backend)
+    data = bytearray()
+
+    for fen in fens:
+        board.LoadFen(fen)
+        data += PackPosition(board)
+
+    return np.frombuffer(bytes(data), dtype=POSITION_DTYPE)
+
+
+class PositionWriter:
+    """
+    Writes a PositionDB file a record at a time, buffering them so millions of positions can be written without
+    holding them all. Use in a with block, or call Close
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, RECORD_SIZE))
+
+        self.buffer = bytearray()
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+
+    def Add(self, board):
+        self.AddRecord(PackPosition(board))
+
+    def AddRecord(self, record):
+        # record is the bytes of one or more records, or a POSITION_DTYPE array
+        if isinstance(record, np.ndarray):
+            record = record.tobytes()
+
+        if len(record) % RECORD_SIZE:
+            raise ValueError(f'{len(record)} bytes is not a whole number of {RECORD_SIZE} byte records')
+
+        self.buffer += record
+        self.count += len(record) // RECORD_SIZE
+
+        if len(self.buffer) >= WRITE_BUFFER:
+            self.Flush()
+
+    def Flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def Close(self):
+        if not self.file.closed:
+            self.Flush()
+            self.file.close()
+
+
+class PositionDB:
+    """
+    A file of position records opened with numpy.memmap, so only the records used are read from disk. mode is 'r' or
+    'r+' to change records in place.
+
+        db = PositionDB('positions.bin')
+        db.Load(123456, board)
+        db.records['bitboards'] # (len(db), 12) uint64, in PIECES order
+    """
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError(f"mode should be 'r' or 'r+', not '{mode}'")
+
+        self.path = path
+
+        with open(path, 'rb') as file:
+            header = file.read(HEADER_SIZE)
+
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f'{path} is too short to be a position database')
+
+        magic, record_size = HEADER.unpack(header)
+
+        if magic != MAGIC or record_size != RECORD_SIZE:
+            raise ValueError(f'{path} is not a position database of {RECORD_SIZE} byte records')
+
+        count, extra = divmod(os.path.getsize(path) - HEADER_SIZE, RECORD_SIZE)
+
+        if extra:
+            raise ValueError(f'{path} ends part way through a record')
+
+        # memmap can't map zero bytes
+        if count:
+            self.data = np.memmap(path, dtype=np.uint8, mode=mode, offset=HEADER_SIZE, shape=(count * RECORD_SIZE,))
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+        self.records = self.data.view(POSITION_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        # a record (numpy.void) for an int, a POSITION_DTYPE array view for a slice or index array
+        return self.records[index]
+
+    def Load(self, index, board):
+        """
+        Set board up from record index
+        """
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError(f'position {index} is out of range for {len(self)} records')
+
+        LoadRecord(board, self.data, index * RECORD_SIZE)
+
+    def Record(self, index):
+        # the bytes of record index, for sending to another process
+        return bytes(self.data[index * RECORD_SIZE:(index + 1) * RECORD_SIZE])
+
+    def Fens(self, backend='int'):
+        board = Board(backend)
+
+        for index in range(len(self)):
+            self.Load(index, board)
+            yield board.ToFen()
+
+    def Flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def Close(self):
+        # the map is closed once nothing refers to it
+        self.Flush()
+        self.data = self.records = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert FEN files to position databases and back')
+    parser.add_argument('input', help='file with one FEN per line, or a position database with --to-fen')
+    parser.add_argument('output', nargs='?', default='-', help='file to write, - for stdout (default, --to-fen only)')
+    parser.add_argument('--to-fen', action='store_true', help='write the positions of a database as FENs')
+    args = parser.parse_args(argv)
+
+    if args.to_fen:
+        db = PositionDB(args.input)
+        output_file = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+        try:
+            for fen in db.Fens():
+                output_file.write(fen + '\n')
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+
+        return 0
+
+    if args.output == '-':
+        parser.error('an output file is needed to write a position database')
+
+    board = Board('int')
+
+    with open(args.input) as input_file, PositionWriter(args.output) as writer:
+        for line in input_file:
+            fen = line.split(';')[0].strip()
+
+            if fen and not fen.startswith('#'):
+                board.LoadFen(fen)
+                writer.Add(board)
+
+    print(f'wrote {writer.count} positions to {args.output}', file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
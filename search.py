@@ -0,0 +1,399 @@
+"""
+Iterative deepening negamax alpha-beta search on top of Board and GenerateMoves.
+
+Scores are in centipawns from the side to move's point of view. Mate scores are MATE minus the number of plies to
+mate, so shorter mates score higher.
+"""
+import argparse
+import sys
+import time
+
+from classicalBitboard import Board
+from evaluation import Evaluate
+from moveEncoding import MoveToUci, CAPTURE, MAX_PLY
+from moveGeneration import GenerateMoves
+from moveOrdering import MoveOrderer
+from pawnHashTable import PawnHashTable, PAWN_HASH_ENTRIES
+from staticExchange import SEE
+from transpositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+INFINITY = 32000
+MATE = 30000
+MATE_BOUND = MATE - MAX_PLY # scores beyond this are mates
+DRAW = 0
+
+CHECK_EVERY = 256 # nodes between checks of the time limit and stop event, must be a power of two
+
+
+def ScoreToTT(score, ply):
+    # mate scores are stored relative to the node, not the root, so they stay right when reached through another path
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+
+    return score
+
+
+def ScoreFromTT(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+
+    return score
+
+
+class SearchResult:
+    __slots__ = ('best_move', 'score', 'pv', 'depth', 'nodes', 'seconds')
+
+    def __init__(self, best_move=0, score=0, pv=(), depth=0, nodes=0, seconds=0.0):
+        self.best_move = best_move
+        self.score = score
+        self.pv = list(pv)
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def Nps(self):
+        return int(self.nodes / self.seconds) if self.seconds > 0 else 0
+
+    def MateIn(self):
+        # moves to mate, negative when the side to move is getting mated, or None if the score isn't a mate
+        if self.score >= MATE_BOUND:
+            return (MATE - self.score + 1) // 2
+        if self.score <= -MATE_BOUND:
+            return -(MATE + self.score) // 2
+
+        return None
+
+    def ScoreString(self):
+        # UCI style: 'cp 35', or 'mate 3' / 'mate -2' counted in moves
+        mate_in = self.MateIn()
+
+        if mate_in is not None:
+            return f'mate {mate_in}'
+
+        return f'cp {self.score}'
+
+    def __str__(self):
+        return (f'depth {self.depth} score {self.ScoreString()} nodes {self.nodes} nps {self.Nps()} '
+                f'time {int(self.seconds * 1000)} pv {" ".join(MoveToUci(move) for move in self.pv)}')
+
+
+class Search:
+    """
+    Finds the best move for the side to move on board. Searches deepen one ply at a time until the depth, node or
+    time limit is reached, and the result of the last completed iteration is returned.
+    Results are kept in the transposition table, which can be shared with other searches and outlives this one, and
+    pawn structure evaluations in the pawn hash table
+    """
+    def __init__(self, board, tt=None, move_generator=None, pawn_table=None):
+        self.board = board
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.pawn_table = pawn_table if pawn_table is not None else PawnHashTable()
+        self.moveGen = move_generator if move_generator is not None else GenerateMoves(board)
+        self.orderer = MoveOrderer()
+
+        self.nodes = 0
+        self.start_time = 0
+        self.deadline = None
+        self.node_limit = None
+        self.limits_active = False # the node and time limits only count once an iteration has finished
+        self.stopped = False
+
+        # anything with is_set(), such as a threading or multiprocessing Event, that another thread or process sets to
+        # stop the search
+        self.stop_event = None
+
+        # pv_table[ply] is the principal variation from ply down
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+
+    def Stop(self):
+        # can be called from another thread, the search stops at its next limit check
+        self.stopped = True
+
+    def CheckLimits(self):
+        if self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+        elif not self.limits_active:
+            # until the first iteration has finished there's no move to play, so only a stop can end the search
+            pass
+        elif self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+        return self.stopped
+
+    def FallbackMove(self):
+        """
+        First legal root move in search order (hash move first), for a search stopped before any iteration finished.
+        0 if there are no legal moves
+        """
+        self.moveGen.board = self.board
+        moves = self.moveGen.GenerateAllPossibleMoves(0)
+
+        if len(moves) == 0:
+            return 0
+
+        entry = self.tt.Probe(self.board.hash_key)
+        self.orderer.ScoreMoves(moves, 0, entry[0] if entry is not None else 0, self.board.console_board)
+
+        return self.orderer.NextMove(moves, 0, 0)
+
+    def IsRepetition(self):
+        """
+        Has the current position been seen before? Only positions since the last capture or pawn move can repeat,
+        and only every other one has the same side to move
+        """
+        key = self.board.hash_key
+        undo_stack = self.board.undo_stack
+
+        for i in range(len(undo_stack) - 2, max(-1, len(undo_stack) - 1 - self.board.ply), -2):
+            if undo_stack[i][7] == key:
+                return True
+
+        return False
+
+    def Quiescence(self, alpha, beta, ply):
+        """
+        Search captures (and promotions) only, until the position is quiet, so the evaluation is never taken halfway
+        through an exchange. The side to move can always stand pat on the static evaluation instead of capturing,
+        unless it is in check, when every evasion is searched. Captures that lose material by SEE are skipped
+        """
+        self.nodes += 1
+        self.pv_table[ply] = []
+
+        if self.nodes & (CHECK_EVERY - 1) == 0 and self.CheckLimits():
+            return 0
+
+        # before generating, there's no move list for the ply after the last
+        if ply >= MAX_PLY - 1:
+            return Evaluate(self.board, self.pawn_table)
+
+        # in check from the attack map the generator uses anyway, so the moves are only generated once
+        attack_map = self.board.GetAttackMap()
+        white = self.board.active_piece == 'w'
+        in_check = bool(attack_map.bitboards[5 if white else 11] & attack_map.attacked[1 if white else 0])
+
+        self.moveGen.board = self.board
+        moves = self.moveGen.GenerateAllPossibleMoves(ply, captures_only=not in_check)
+
+        if in_check:
+            if len(moves) == 0:
+                return -MATE + ply
+
+            best_score = -INFINITY
+        else:
+            best_score = Evaluate(self.board, self.pawn_table)
+
+            if best_score >= beta:
+                return best_score
+
+            if best_score > alpha:
+                alpha = best_score
+
+        self.orderer.ScoreMoves(moves, ply, 0, self.board.console_board)
+
+        for i in range(len(moves)):
+            move = self.orderer.NextMove(moves, ply, i)
+
+            if not in_check and move & CAPTURE and SEE(self.board, move) < 0:
+                continue
+
+            self.board.MakeMove(move)
+            score = -self.Quiescence(-beta, -alpha, ply + 1)
+            self.board.UnmakeMove()
+
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+
+                    if score >= beta:
+                        break
+
+        return best_score
+
+    def Negamax(self, depth, alpha, beta, ply):
+        if depth <= 0:
+            return self.Quiescence(alpha, beta, ply)
+
+        self.nodes += 1
+        self.pv_table[ply] = []
+
+        if self.nodes & (CHECK_EVERY - 1) == 0 and self.CheckLimits():
+            return 0
+
+        if ply > 0 and (self.board.ply >= 100 or self.IsRepetition()):
+            return DRAW
+
+        alpha_orig = alpha
+        key = self.board.hash_key
+        entry = self.tt.Probe(key)
+        hash_move = 0
+
+        if entry is not None:
+            hash_move, tt_score, tt_depth, tt_bound = entry
+
+            if tt_depth >= depth and ply > 0:
+                tt_score = ScoreFromTT(tt_score, ply)
+
+                if (tt_bound == EXACT or (tt_bound == LOWER_BOUND and tt_score >= beta) or
+                        (tt_bound == UPPER_BOUND and tt_score <= alpha)):
+                    return tt_score
+
+        if ply >= MAX_PLY - 1:
+            return Evaluate(self.board, self.pawn_table)
+
+        self.moveGen.board = self.board
+        moves = self.moveGen.GenerateAllPossibleMoves(ply)
+        in_check = self.moveGen.number_of_attackers > 0
+
+        if len(moves) == 0:
+            return -MATE + ply if in_check else DRAW
+
+        self.orderer.ScoreMoves(moves, ply, hash_move, self.board.console_board)
+
+        best_score = -INFINITY
+        best_move = 0
+
+        for i in range(len(moves)):
+            move = self.orderer.NextMove(moves, ply, i)
+
+            self.board.MakeMove(move)
+            score = -self.Negamax(depth - 1, -beta, -alpha, ply + 1)
+            self.board.UnmakeMove()
+
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+
+                    if score >= beta:
+                        self.orderer.UpdateCutoff(move, ply, depth)
+                        break
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > alpha_orig:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+
+        self.tt.Store(key, depth, ScoreToTT(best_score, ply), bound, best_move)
+
+        return best_score
+
+    def IterationDepths(self, max_depth):
+        # depths searched by iterative deepening, in order
+        return range(1, max_depth + 1)
+
+    def Think(self, depth=None, nodes=None, movetime=None, report=None):
+        """
+        Search to at most depth plies, nodes nodes and movetime milliseconds (None for no limit, but give at least one).
+        report is called with the SearchResult of each completed iteration. Returns the SearchResult of the last one
+        """
+        if depth is None and nodes is None and movetime is None:
+            raise ValueError('Search needs a depth, node or time limit')
+
+        self.nodes = 0
+        self.stopped = False
+        self.start_time = time.perf_counter()
+        self.deadline = self.start_time + movetime / 1000 if movetime is not None else None
+        self.node_limit = nodes
+        self.limits_active = False
+
+        self.tt.NewSearch()
+        self.orderer.NewSearch()
+
+        max_depth = min(depth, MAX_PLY - 1) if depth is not None else MAX_PLY - 1
+        result = SearchResult()
+
+        for iteration_depth in self.IterationDepths(max_depth):
+            # the limits are only checked every CHECK_EVERY nodes in the tree, so check them between iterations too
+            # rather than starting one with no time or nodes left
+            if self.CheckLimits():
+                break
+
+            score = self.Negamax(iteration_depth, -INFINITY, INFINITY, 0)
+
+            if self.stopped:
+                # the unfinished iteration can't be trusted, keep the last complete one
+                break
+
+            result = SearchResult(self.pv_table[0][0] if self.pv_table[0] else 0, score, self.pv_table[0],
+                                  iteration_depth, self.nodes, time.perf_counter() - self.start_time)
+            self.limits_active = True
+
+            if report is not None:
+                report(result)
+
+            if abs(score) >= MATE_BOUND:
+                break
+
+        if result.depth == 0:
+            # stopped before the first iteration finished, so there's no score, only a move to play
+            result.best_move = self.FallbackMove()
+
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - self.start_time
+
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search a position for the best move')
+    parser.add_argument('--fen', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    parser.add_argument('-d', '--depth', type=int, help='maximum depth in plies')
+    parser.add_argument('-n', '--nodes', type=int, help='maximum number of nodes')
+    parser.add_argument('-t', '--movetime', type=int, help='maximum time in milliseconds')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size in MB')
+    parser.add_argument('--pawn-hash', type=int, default=PAWN_HASH_ENTRIES, help='pawn hash table entries')
+    parser.add_argument('--backend', choices=['int', 'numpy'], default='int', help='bitboard backend used by Board')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='processes searching at once (Lazy SMP), 0 for one per core')
+    args = parser.parse_args(argv)
+
+    if args.depth is None and args.nodes is None and args.movetime is None:
+        args.depth = 4
+
+    report = lambda info: print(f'info {info}')
+
+    if args.workers != 1:
+        from lazySmp import LazySmp
+
+        with LazySmp(args.workers or None, args.hash, args.backend) as smp:
+            result = smp.Think(args.fen, (), args.depth, args.nodes, args.movetime, report)
+
+        print(f'info {result}')
+        print(f'bestmove {MoveToUci(result.best_move) if result.best_move else "0000"}')
+
+        return 0
+
+    board = Board(args.backend)
+    board.LoadFen(args.fen)
+
+    search = Search(board, TranspositionTable(args.hash), pawn_table=PawnHashTable(args.pawn_hash))
+    result = search.Think(args.depth, args.nodes, args.movetime, report)
+
+    print(f'info string {search.pawn_table}')
+
+    print(f'bestmove {MoveToUci(result.best_move) if result.best_move else "0000"}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
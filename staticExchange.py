@@ -0,0 +1,113 @@
+"""
+Static exchange evaluation (SEE): the material a capture wins or loses once every piece attacking the square has
+recaptured, least valuable attacker first, with either side free to stop capturing when it would lose material.
+Sliders behind the capturing pieces (x-rays) join in as the pieces in front of them are used up.
+
+It is worked out on the attack tables alone, without making any moves, so quiescence search can skip losing captures
+before making them. The position's AttackMap (Board.GetAttackMap) gives the piece bitboards, and captures on squares the
+other side doesn't attack are scored without playing out any exchange.
+"""
+from attackTables import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BISHOP_RAYS, ROOK_RAYS, BETWEEN
+from bitOperations import Squares
+from magicBitboards import BishopAttacks, RookAttacks
+from moveEncoding import EN_PASSANT
+
+# by piece index in moveEncoding.PIECES
+SEE_VALUES = (100, 320, 330, 500, 900, 20000) * 2
+
+PROMOTION_GAINS = (0, 220, 230, 400, 800) # promoted piece value less the pawn's
+
+
+def AttackersTo(square, occupancy, bitboards):
+    """
+    Pieces of both sides attacking square, with sliders blocked by occupancy
+    """
+    bishops_queens = bitboards[2] | bitboards[4] | bitboards[8] | bitboards[10]
+    rooks_queens = bitboards[3] | bitboards[4] | bitboards[9] | bitboards[10]
+
+    return ((PAWN_ATTACKS['b'][square] & bitboards[0]) | (PAWN_ATTACKS['w'][square] & bitboards[6]) |
+            (KNIGHT_ATTACKS[square] & (bitboards[1] | bitboards[7])) |
+            (KING_ATTACKS[square] & (bitboards[5] | bitboards[11])) |
+            (BishopAttacks(square, occupancy) & bishops_queens) |
+            (RookAttacks(square, occupancy) & rooks_queens))
+
+
+def SEE(board, move):
+    """
+    Material won by a capture (or any move, a quiet move scores 0 or less) once all exchanges on its final square are
+    played out, in centipawns
+    """
+    initial_sq = move & 63
+    final_sq = (move >> 6) & 63
+    piece_index = (move >> 12) & 15
+    promotion = (move >> 16) & 7
+
+    attack_map = board.GetAttackMap()
+    bitboards = attack_map.bitboards
+    occupancy = attack_map.occupied
+
+    if move & EN_PASSANT:
+        captured_sq = final_sq + 8 if piece_index < 6 else final_sq - 8
+        occupancy ^= 1 << (63 - captured_sq)
+        gain = [SEE_VALUES[0]]
+    elif board.console_board[final_sq] != '.':
+        gain = [SEE_VALUES['PNBRQKpnbrqk'.index(board.console_board[final_sq])]]
+    else:
+        gain = [0]
+
+    gain[0] += PROMOTION_GAINS[promotion]
+
+    # value of the piece now standing on the final square, the next one to be captured
+    on_square = SEE_VALUES[piece_index] + PROMOTION_GAINS[promotion]
+
+    occupancy ^= 1 << (63 - initial_sq)
+
+    # side to recapture, 6 for black pieces, 0 for white
+    side = 6 if piece_index < 6 else 0
+
+    if not attack_map.attacked[side // 6] & (1 << (63 - final_sq)):
+        # nothing recaptures, unless a slider was behind the moving piece (or the pawn taken en-passant), the only
+        # pieces to have left the lines through the square
+        sliders = ((BISHOP_RAYS[final_sq] & (bitboards[side + 2] | bitboards[side + 4])) |
+                   (ROOK_RAYS[final_sq] & (bitboards[side + 3] | bitboards[side + 4])))
+
+        if not any(BETWEEN[final_sq][sq] & occupancy == 0 for sq in Squares(sliders)):
+            return gain[0]
+
+    bishops_queens = bitboards[2] | bitboards[4] | bitboards[8] | bitboards[10]
+    rooks_queens = bitboards[3] | bitboards[4] | bitboards[9] | bitboards[10]
+
+    attackers = AttackersTo(final_sq, occupancy, bitboards) & occupancy
+
+    while True:
+        # least valuable attacker of the side to recapture
+        for index in range(side, side + 6):
+            from_bb = attackers & bitboards[index]
+
+            if from_bb:
+                break
+        else:
+            break
+
+        gain.append(on_square - gain[-1])
+
+        if max(-gain[-2], gain[-1]) < 0:
+            # this side is worse off for capturing whatever happens next, so it won't, and the rest can't change the result
+            gain.pop()
+            break
+
+        on_square = SEE_VALUES[index]
+
+        occupancy ^= from_bb & -from_bb
+
+        # sliders that were behind the piece just used
+        attackers |= (BishopAttacks(final_sq, occupancy) & bishops_queens) | (RookAttacks(final_sq, occupancy) & rooks_queens)
+        attackers &= occupancy
+
+        side ^= 6
+
+    # each side only recaptures if it gains by it
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+
+    return gain[0]
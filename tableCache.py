@@ -0,0 +1,110 @@
+"""
+On-disk cache for precomputed lookup tables (attack tables, magic bitboard tables), so short-lived processes and pool
+workers map a file instead of rebuilding the tables on startup.
+
+Each table is a flat sequence of 64 bit values in its own file, <name>.bin in CACHE_DIR:
+    magic   - b'CHTB'
+    version - CACHE_VERSION, bump it whenever the way any table is built changes
+    key     - crc32 of whatever else the contents depend on, such as the magic numbers
+    length  - number of values
+    then the values as little-endian uint64s
+
+A file that is missing, stale or unreadable is rebuilt. The cache directory is CACHE_DIR, set from the
+CHESS_TABLE_CACHE environment variable, an empty value turns the cache off.
+"""
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+CACHE_MAGIC = b'CHTB'
+HEADER = struct.Struct('<4sIII')
+
+CACHE_DIR = os.environ.get('CHESS_TABLE_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablecache'))
+
+
+def CacheKey(*parts):
+    return zlib.crc32(repr(parts).encode())
+
+
+def CachePath(name):
+    return os.path.join(CACHE_DIR, name + '.bin')
+
+
+def ReadTable(name, key):
+    """
+    Memory-map a cached table. Returns a read-only uint64 array, or None if there is no valid cache for it
+    """
+    if not CACHE_DIR:
+        return None
+
+    path = CachePath(name)
+
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+
+        if len(header) != HEADER.size:
+            return None
+
+        magic, version, file_key, length = HEADER.unpack(header)
+
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or file_key != key:
+            return None
+
+        if os.path.getsize(path) != HEADER.size + 8 * length:
+            return None
+
+        return np.memmap(path, dtype='<u8', mode='r', offset=HEADER.size, shape=(length,))
+
+    except (OSError, ValueError):
+        return None
+
+
+def WriteTable(name, key, values):
+    """
+    Write a table to the cache. The file is written under a temporary name and renamed into place, so processes
+    starting at the same time never see a half written table. Failing to write (read-only install etc.) is not an error
+    """
+    if not CACHE_DIR:
+        return
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=name, suffix='.tmp')
+
+        try:
+            # mkstemp makes the file private, the cache is meant to be shared
+            os.chmod(temp_path, 0o644)
+
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, key, len(values)))
+                f.write(np.array(values, dtype='<u8').tobytes())
+
+            os.replace(temp_path, CachePath(name))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    except OSError:
+        pass
+
+
+def LoadTable(name, key, build):
+    """
+    List of python ints for a table, from the cache if possible, otherwise from build() (which then gets cached)
+    """
+    cached = ReadTable(name, key)
+
+    if cached is not None:
+        return cached.tolist()
+
+    values = build()
+    WriteTable(name, key, values)
+
+    return values
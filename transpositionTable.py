@@ -0,0 +1,208 @@
+"""
+Transposition table of search results, in a numpy array that can live in shared memory so processes can share it.
+
+One entry is 16 bytes:
+    key   - full zobrist key of the position, to tell apart positions that share a bucket
+    move  - best move in packed integer form, 0 for none
+    score - search score, must fit in an int16
+    depth - depth the score was searched to
+    flags - bound type in the low 2 bits, age (search generation) in the high 6 bits
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# bound types
+EXACT = 1
+LOWER_BOUND = 2 # score is at least this (fail high)
+UPPER_BOUND = 3 # score is at most this (fail low)
+
+TT_ENTRY = np.dtype([('key', np.uint64), ('move', np.uint32), ('score', np.int16), ('depth', np.int8), ('flags', np.uint8)])
+
+ENTRIES_PER_BUCKET = 2 # slot 0 is depth-preferred, slot 1 is always-replace
+BUCKET_SIZE = TT_ENTRY.itemsize * ENTRIES_PER_BUCKET
+
+AGE_MASK = 63
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of search results, keyed by Board.hash_key. All memory is allocated up front from a
+    megabyte budget, so an engine's memory use does not grow during a search.
+
+    Each bucket has two entries. The first keeps the deepest result, unless it is from an older search, the second
+    always takes whatever does not go in the first, so recent results are never lost.
+    """
+    def __init__(self, size_mb=16, buffer=None):
+        """
+        buffer is memory to keep the table in instead of allocating it, at least NumberOfBuckets(size_mb) * BUCKET_SIZE
+        bytes and zeroed for an empty table
+        """
+        number_of_buckets = self.NumberOfBuckets(size_mb)
+
+        self.size_mb = size_mb
+        self.number_of_buckets = number_of_buckets
+        self.index_mask = number_of_buckets - 1
+
+        if buffer is None:
+            self.table = np.zeros((number_of_buckets, ENTRIES_PER_BUCKET), dtype=TT_ENTRY)
+        else:
+            self.table = np.ndarray((number_of_buckets, ENTRIES_PER_BUCKET), dtype=TT_ENTRY, buffer=buffer)
+
+        self.age = 0
+
+        # statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @staticmethod
+    def NumberOfBuckets(size_mb):
+        # rounded down to a power of two, so the index is a mask of the key
+        number_of_buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_SIZE)
+
+        return 1 << (number_of_buckets.bit_length() - 1)
+
+    def Clear(self):
+        self.table.fill(0)
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def NewSearch(self):
+        # entries from previous searches become the first to be replaced
+        self.age = (self.age + 1) & AGE_MASK
+
+    def Probe(self, key):
+        """
+        Returns (move, score, depth, bound) for the position, or None if it is not in the table
+        """
+        self.probes += 1
+        bucket = self.table[key & self.index_mask]
+
+        for slot in range(ENTRIES_PER_BUCKET):
+            entry_key, move, score, depth, flags = bucket[slot].item()
+
+            if entry_key == key and flags != 0:
+                self.hits += 1
+                return move, score, depth, flags & 3
+
+        return None
+
+    def Store(self, key, depth, score, bound, move=0):
+        self.stores += 1
+        index = key & self.index_mask
+        bucket = self.table[index]
+
+        preferred_key, preferred_move, _, preferred_depth, preferred_flags = bucket[0].item()
+        flags = (self.age << 2) | bound
+
+        if preferred_key == key or (preferred_flags >> 2) != self.age or depth >= preferred_depth:
+            slot = 0
+            old_key, old_move = preferred_key, preferred_move
+        else:
+            slot = 1
+            old_key, old_move = bucket[1]['key'], bucket[1]['move']
+
+        if move == 0 and old_key == key:
+            # keep the best move we already had for this position
+            move = old_move
+
+        self.table[index, slot] = (key, move, score, depth, flags)
+
+    def HitRate(self):
+        if self.probes == 0:
+            return 0
+
+        return self.hits / self.probes
+
+    def Hashfull(self):
+        """
+        Permille of entries used by the current search, worked out from the first 1000 entries (as in UCI 'hashfull')
+        """
+        sample = self.table.reshape(-1)[:1000]
+        used = np.count_nonzero((sample['flags'] != 0) & ((sample['flags'] >> 2) == self.age))
+
+        return int(used * 1000 // len(sample))
+
+
+def DataWord(move, score, depth, flags):
+    # move, score, depth and flags of an entry as the little-endian 64 bit word they are stored in
+    return move | (score & 0xFFFF) << 32 | (depth & 0xFF) << 48 | flags << 56
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in a multiprocessing.shared_memory block, so searches in several processes share their results.
+    The block is created when name is None, otherwise the table attaches to the block called name, so the creating
+    process passes .name to the others. The creator unlinks the block when it is done with it.
+
+    Entries are written without any locking. An entry is two 64 bit words, the key and the data (move, score, depth
+    and flags), and another process may read between the two writes or write the same entry at the same time. So the
+    key word holds key XOR data: an entry whose words come from different writes fails the key check and is only a miss
+    (lockless hashing, as in Crafty)
+    """
+    def __init__(self, size_mb=16, name=None):
+        size = self.NumberOfBuckets(size_mb) * BUCKET_SIZE
+
+        if name is None:
+            # new blocks are zeroed, an empty table
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shared_memory = shared_memory.SharedMemory(name=name)
+
+        self.name = self.shared_memory.name
+
+        super().__init__(size_mb, buffer=self.shared_memory.buf)
+
+        # [bucket, slot] is (key ^ data, data)
+        self.words = self.table.view(np.uint64).reshape(self.number_of_buckets, ENTRIES_PER_BUCKET, 2)
+
+    def Close(self):
+        # the table can't be used after this
+        del self.table, self.words
+        self.shared_memory.close()
+
+    def Unlink(self):
+        self.shared_memory.unlink()
+
+    def Probe(self, key):
+        self.probes += 1
+        bucket = self.words[key & self.index_mask].tolist()
+
+        for checked_key, data in bucket:
+            if checked_key ^ data == key and data >> 56 != 0:
+                self.hits += 1
+
+                score = (data >> 32) & 0xFFFF
+                depth = (data >> 48) & 0xFF
+
+                return (data & 0xFFFFFFFF, score - 0x10000 if score & 0x8000 else score,
+                        depth - 0x100 if depth & 0x80 else depth, (data >> 56) & 3)
+
+        return None
+
+    def Store(self, key, depth, score, bound, move=0):
+        self.stores += 1
+        index = key & self.index_mask
+        (preferred_key, preferred_data), (other_key, other_data) = self.words[index].tolist()
+        preferred_key ^= preferred_data
+        flags = (self.age << 2) | bound
+
+        preferred_depth = (preferred_data >> 48) & 0xFF
+        preferred_depth = preferred_depth - 0x100 if preferred_depth & 0x80 else preferred_depth
+
+        if preferred_key == key or (preferred_data >> 58) != self.age or depth >= preferred_depth:
+            slot = 0
+            old_key, old_data = preferred_key, preferred_data
+        else:
+            slot = 1
+            old_key, old_data = other_key ^ other_data, other_data
+
+        if move == 0 and old_key == key:
+            # keep the best move we already had for this position
+            move = old_data & 0xFFFFFFFF
+
+        data = DataWord(move, score, depth, flags)
+        self.words[index, slot] = (key ^ data, data)
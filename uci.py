@@ -0,0 +1,364 @@
+"""
+UCI (Universal Chess Interface) front end, so GUIs, tournament managers and scripts can drive the engine:
+
+    python uci.py
+
+Commands are read from stdin by an asyncio reader and searches run in a worker thread, so 'isready' and 'stop' are
+answered straight away while the engine is thinking. With the Threads option above 1 the worker thread drives a
+LazySmp pool of processes instead of searching itself.
+
+Supported: uci, isready, setoption (Hash, Threads, BookFile), ucinewgame, position (startpos or fen, with moves), go (depth,
+nodes, movetime, wtime, btime, winc, binc, movestogo, infinite), stop and quit. With BookFile set to a Polyglot book,
+positions in the book are answered with a book move straight away instead of a search. Malformed commands, and positions
+with illegal moves, are answered with an 'info string' and otherwise ignored.
+"""
+import argparse
+import asyncio
+import sys
+import threading
+
+from lazySmp import LazySmp, SetUpBoard
+from moveEncoding import MoveToUci, MAX_PLY
+from moveGeneration import GenerateMoves
+from polyglotBook import PolyglotBook
+from search import Search
+from transpositionTable import TranspositionTable
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+ENGINE_NAME = 'Bitboard Chess'
+ENGINE_AUTHOR = 'the Bitboard Chess authors'
+
+# name : (default, min, max)
+SPIN_OPTIONS = {'Hash' : (16, 1, 4096), 'Threads' : (1, 1, 512)}
+STRING_OPTIONS = {'BookFile' : ''}
+
+MOVE_OVERHEAD = 50 # milliseconds kept back on every move for talking to the GUI
+MOVES_TO_GO = 30 # moves the remaining time is shared over when the GUI doesn't say
+
+GO_LIMITS = ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo')
+
+
+def MoveTime(time_left, increment, moves_to_go):
+    """
+    Milliseconds to search for with time_left milliseconds on the clock
+    """
+    budget = time_left // (moves_to_go or MOVES_TO_GO) + increment * 3 // 4
+
+    return max(1, min(budget, time_left - MOVE_OVERHEAD))
+
+
+def ParseGo(tokens):
+    # {limit : value} for every limit in GO_LIMITS given, and {flag : True} for 'infinite' and 'ponder'
+    limits = {}
+    i = 0
+
+    while i < len(tokens):
+        if tokens[i] in GO_LIMITS and i + 1 < len(tokens):
+            limits[tokens[i]] = int(tokens[i + 1])
+            i += 2
+        else:
+            limits[tokens[i]] = True
+            i += 1
+
+    return limits
+
+
+class UciEngine:
+    def __init__(self, backend='int', output=sys.stdout):
+        self.backend = backend
+        self.output = output
+        self.output_lock = threading.Lock()
+
+        self.options = {name : default for name, (default, _, _) in SPIN_OPTIONS.items()}
+        self.options.update(STRING_OPTIONS)
+
+        self.book = None
+
+        # made when first needed, and again after the options they depend on change
+        self.tt = None
+        self.smp = None
+
+        self.fen = START_FEN
+        self.moves = []
+        self.board = SetUpBoard(self.fen, self.moves, backend)
+
+        self.search = None
+        self.search_thread = None
+
+        # set by 'stop': stops a single process search at its next limit check (if Search.Stop comes too early, before
+        # it has started), and lets an infinite search send its best move
+        self.stop_event = threading.Event()
+
+    def Send(self, line):
+        # called from the search thread too
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def Handle(self, line):
+        """
+        Carry out one command. Returns False for 'quit'
+        """
+        tokens = line.split()
+
+        if not tokens:
+            return True
+
+        command, args = tokens[0], tokens[1:]
+
+        # a malformed command is answered and ignored rather than ending the engine, and leaves the position as it was
+        try:
+            return self.Dispatch(command, args)
+        except (ValueError, KeyError, IndexError) as error:
+            self.Send(f'info string could not run {line.strip()}: {error}')
+
+        return True
+
+    def Dispatch(self, command, args):
+        if command == 'uci':
+            self.Send(f'id name {ENGINE_NAME}')
+            self.Send(f'id author {ENGINE_AUTHOR}')
+
+            for name, (default, minimum, maximum) in SPIN_OPTIONS.items():
+                self.Send(f'option name {name} type spin default {default} min {minimum} max {maximum}')
+
+            for name, default in STRING_OPTIONS.items():
+                self.Send(f'option name {name} type string default {default or "<empty>"}')
+
+            self.Send('uciok')
+        elif command == 'isready':
+            self.Send('readyok')
+        elif command == 'setoption':
+            self.SetOption(args)
+        elif command == 'ucinewgame':
+            self.WaitForSearch()
+
+            if self.tt is not None:
+                self.tt.Clear()
+            if self.smp is not None:
+                self.smp.tt.Clear()
+        elif command == 'position':
+            self.SetPosition(args)
+        elif command == 'go':
+            self.Go(ParseGo(args))
+        elif command == 'stop':
+            self.Stop()
+        elif command == 'quit':
+            self.Quit()
+            return False
+        elif command not in ('debug', 'register', 'ponderhit'):
+            self.Send(f'info string unknown command {command}')
+
+        return True
+
+    def SetOption(self, args):
+        # setoption name <name> value <value>, names can have spaces in them
+        if 'name' not in args or 'value' not in args:
+            return
+
+        name = ' '.join(args[args.index('name') + 1:args.index('value')])
+        value = ' '.join(args[args.index('value') + 1:])
+
+        if name in STRING_OPTIONS:
+            self.WaitForSearch()
+            self.SetBook('' if value == '<empty>' else value)
+            return
+
+        if name not in SPIN_OPTIONS:
+            self.Send(f'info string unknown option {name}')
+            return
+
+        _, minimum, maximum = SPIN_OPTIONS[name]
+        self.WaitForSearch()
+        self.options[name] = min(max(int(value), minimum), maximum)
+
+        # both depend on Hash, the pool on Threads too
+        self.tt = None
+        self.ClosePool()
+
+    def SetBook(self, path):
+        if self.book is not None:
+            self.book.Close()
+            self.book = None
+
+        self.options['BookFile'] = path
+
+        if path:
+            try:
+                self.book = PolyglotBook(path)
+            except (OSError, ValueError) as error:
+                self.options['BookFile'] = ''
+                self.Send(f'info string could not open book {path}: {error}')
+
+    def SetPosition(self, args):
+        # position startpos [moves ...] or position fen <fen> [moves ...]
+        if 'moves' in args:
+            position, moves = args[:args.index('moves')], args[args.index('moves') + 1:]
+        else:
+            position, moves = args, []
+
+        if position[:1] == ['startpos']:
+            fen = START_FEN
+        elif position[:1] == ['fen']:
+            fen = ' '.join(position[1:])
+        else:
+            self.Send('info string position needs startpos or fen')
+            return
+
+        self.WaitForSearch()
+
+        board = SetUpBoard(fen, (), self.backend)
+        move_gen = GenerateMoves(board)
+        packed_moves = []
+
+        for uci_move in moves:
+            legal_moves = {MoveToUci(move) : move for move in move_gen.GenerateAllPossibleMoves()}
+
+            # an illegal move would leave the board in a position that can't be reached
+            if uci_move not in legal_moves:
+                self.Send(f'info string illegal move {uci_move}, position not set')
+                return
+
+            board.MakeMove(legal_moves[uci_move])
+            packed_moves.append(legal_moves[uci_move])
+
+        self.fen, self.moves, self.board = fen, packed_moves, board
+
+    def Go(self, limits):
+        self.WaitForSearch()
+
+        depth = limits.get('depth')
+        nodes = limits.get('nodes')
+
+        # there's no move to send without at least one ply
+        if depth is not None:
+            depth = max(1, depth)
+        movetime = limits.get('movetime')
+
+        time_left, increment = ('wtime', 'winc') if self.board.active_piece == 'w' else ('btime', 'binc')
+
+        if movetime is None and time_left in limits:
+            movetime = MoveTime(limits[time_left], limits.get(increment, 0), limits.get('movestogo'))
+
+        infinite = 'infinite' in limits or 'ponder' in limits or (depth is None and nodes is None and movetime is None)
+
+        if infinite:
+            depth, nodes, movetime = MAX_PLY - 1, None, None
+        elif self.book is not None:
+            book_move = self.book.Choose(self.board)
+
+            if book_move is not None:
+                self.Send('info string book move')
+                self.Send(f'bestmove {MoveToUci(book_move)}')
+                return
+
+        self.stop_event.clear()
+
+        if self.options['Threads'] > 1:
+            if self.smp is None:
+                self.smp = LazySmp(self.options['Threads'], self.options['Hash'], self.backend)
+
+            # may still be set by a stop that came after the last search finished
+            self.smp.stop_event.clear()
+            self.search = None
+        else:
+            if self.tt is None:
+                self.tt = TranspositionTable(self.options['Hash'])
+
+            self.search = Search(SetUpBoard(self.fen, self.moves, self.backend), self.tt)
+            self.search.stop_event = self.stop_event
+
+        self.search_thread = threading.Thread(target=self.RunSearch, args=(depth, nodes, movetime, infinite), daemon=True)
+        self.search_thread.start()
+
+    def RunSearch(self, depth, nodes, movetime, infinite):
+        # search thread
+        report = lambda result: self.Send(f'info {result}')
+
+        if self.search is None:
+            result = self.smp.Think(self.fen, self.moves, depth, nodes, movetime, report)
+        else:
+            result = self.search.Think(depth, nodes, movetime, report)
+
+        if infinite:
+            # the best move of an infinite search is only sent once the GUI says stop, even if it finished early
+            self.stop_event.wait()
+
+        self.Send(f'bestmove {MoveToUci(result.best_move) if result.best_move else "0000"}')
+
+    def Stop(self):
+        self.stop_event.set()
+
+        if self.search is not None:
+            self.search.Stop()
+        if self.smp is not None:
+            self.smp.Stop()
+
+    def WaitForSearch(self):
+        # commands that change the position or options are only meant to come while the engine isn't searching, but
+        # if one does the search is stopped first
+        if self.search_thread is not None and self.search_thread.is_alive():
+            self.Stop()
+            self.search_thread.join()
+
+    def ClosePool(self):
+        if self.smp is not None:
+            self.smp.Close()
+            self.smp = None
+
+    def Quit(self):
+        self.WaitForSearch()
+        self.ClosePool()
+        self.SetBook('')
+
+
+async def ReadLines(stream):
+    """
+    Lines of stream as they arrive, without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stream)
+    except (ValueError, OSError, NotImplementedError):
+        # regular files, and consoles on Windows, can't be watched by the event loop, so read them in a thread
+        while True:
+            line = await loop.run_in_executor(None, stream.readline)
+
+            if not line:
+                return
+
+            yield line
+
+    while True:
+        line = await reader.readline()
+
+        if not line:
+            return
+
+        yield line.decode()
+
+
+async def Run(engine, stream):
+    try:
+        async for line in ReadLines(stream):
+            if not engine.Handle(line):
+                break
+    finally:
+        engine.Quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the engine over the UCI protocol on stdin and stdout')
+    parser.add_argument('--backend', choices=['int', 'numpy'], default='int', help='bitboard backend used by Board')
+    args = parser.parse_args(argv)
+
+    asyncio.run(Run(UciEngine(args.backend), sys.stdin))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Zobrist keys: one random 64 bit number for every (piece, square), for black to move, for each castling right and for
+each en-passant file. A position's key is the XOR of the numbers for everything in it, so making a move only needs a
+few XORs to update it.
+
+The keys come from a fixed seed so they are the same in every process and every run, which lets keys be stored or
+shared between workers.
+"""
+import random
+
+ZOBRIST_SEED = 20221226
+
+
+def GenerateKeys(seed):
+    rng = random.Random(seed)
+
+    piece_keys = {piece : [rng.getrandbits(64) for _ in range(64)] for piece in 'PNBRQKpnbrqk'}
+    side_key = rng.getrandbits(64)
+    castling_keys = {right : rng.getrandbits(64) for right in 'KQkq'}
+    en_passant_keys = [rng.getrandbits(64) for _ in range(8)]
+
+    return piece_keys, side_key, castling_keys, en_passant_keys
+
+
+PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS = GenerateKeys(ZOBRIST_SEED)
+
+
+def CastlingKey(castling_rights):
+    key = 0
+
+    for right in castling_rights:
+        if right != '-':
+            key ^= CASTLING_KEYS[right]
+
+    return key
+
+
+def EnPassantKey(en_passant):
+    # en_passant is the FEN field, '-' or a square like 'e3'. Only the file is hashed
+    if en_passant == '-' or en_passant == '':
+        return 0
+
+    return EN_PASSANT_KEYS[ord(en_passant[0]) - 97]